@@ -22,9 +22,9 @@
 
 # Utility functions
 
-import copy
 import hashlib
 import random
+from collections import namedtuple
 
 K_SKIP = [0, 0, 1]
 K_FAIL = [0, 1, 0]
@@ -124,7 +124,13 @@ def get_as_string(input_str):
 
 
 # MoCap Frame Classes
+#
+# The add_* methods take ownership of their argument instead of copying it.
+# Hand them freshly built objects and do not modify those afterwards, use
+# MoCapData.get_snapshot() when an independent copy of a frame is needed.
 class FramePrefixData:
+    __slots__ = "frame_number"
+
     def __init__(self, frame_number):
         self.frame_number = frame_number
 
@@ -135,6 +141,8 @@ class FramePrefixData:
 
 
 class MarkerData:
+    __slots__ = ("model_name", "marker_pos_list")
+
     def __init__(self):
         self.model_name = ""
         self.marker_pos_list = []
@@ -143,7 +151,7 @@ class MarkerData:
         self.model_name = model_name
 
     def add_pos(self, pos):
-        self.marker_pos_list.append(copy.deepcopy(pos))
+        self.marker_pos_list.append(pos)
         return len(self.marker_pos_list)
 
     def get_num_points(self):
@@ -174,13 +182,15 @@ class MarkerData:
 
 
 class MarkerSetData:
+    __slots__ = ("marker_data_list", "unlabeled_markers")
+
     def __init__(self):
         self.marker_data_list = []
         self.unlabeled_markers = MarkerData()
         self.unlabeled_markers.set_model_name("")
 
     def add_marker_data(self, marker_data):
-        self.marker_data_list.append(copy.deepcopy(marker_data))
+        self.marker_data_list.append(marker_data)
         return len(self.marker_data_list)
 
     def add_unlabeled_marker(self, pos):
@@ -214,11 +224,13 @@ class MarkerSetData:
 
 
 class LegacyMarkerData:
+    __slots__ = "marker_pos_list"
+
     def __init__(self):
         self.marker_pos_list = []
 
     def add_pos(self, pos):
-        self.marker_pos_list.append(copy.deepcopy(pos))
+        self.marker_pos_list.append(pos)
         return len(self.marker_pos_list)
 
     def get_marker_count(self):
@@ -243,6 +255,8 @@ class LegacyMarkerData:
 
 
 class RigidBodyMarker:
+    __slots__ = ("pos", "id_num", "size", "error", "marker_num")
+
     def __init__(self):
         self.pos = [0.0, 0.0, 0.0]
         self.id_num = 0
@@ -270,6 +284,16 @@ class RigidBodyMarker:
 
 
 class RigidBody:
+    __slots__ = (
+        "id_num",
+        "pos",
+        "rot",
+        "rb_marker_list",
+        "tracking_valid",
+        "error",
+        "marker_num",
+    )
+
     def __init__(self, new_id, pos, rot):
         self.id_num = new_id
         self.pos = pos
@@ -280,7 +304,7 @@ class RigidBody:
         self.marker_num = -1
 
     def add_rigid_body_marker(self, rigid_body_marker):
-        self.rb_marker_list.append(copy.deepcopy(rigid_body_marker))
+        self.rb_marker_list.append(rigid_body_marker)
         return len(self.rb_marker_list)
 
     # def save_pos_ori(self):
@@ -336,12 +360,14 @@ class RigidBody:
 
 
 class RigidBodyData:
+    __slots__ = ("rigid_body_list", "rb_data")
+
     def __init__(self):
         self.rigid_body_list = []
         self.rb_data = {}  # added
 
     def add_rigid_body(self, rigid_body):
-        self.rigid_body_list.append(copy.deepcopy(rigid_body))
+        self.rigid_body_list.append(rigid_body)
         self.rb_data[rigid_body.id_num] = {}
         self.rb_data[rigid_body.id_num]["pos"] = rigid_body.pos
         self.rb_data[rigid_body.id_num]["rot"] = rigid_body.rot
@@ -377,13 +403,15 @@ class RigidBodyData:
 
 
 class Skeleton:
+    __slots__ = ("id_num", "rigid_body_list", "rb_data")
+
     def __init__(self, new_id=0):
         self.id_num = new_id
         self.rigid_body_list = []
         self.rb_data = {}  # added
 
     def add_rigid_body(self, rigid_body):
-        self.rigid_body_list.append(copy.deepcopy(rigid_body))
+        self.rigid_body_list.append(rigid_body)
         self.rb_data[rigid_body.id_num] = {}
         self.rb_data[rigid_body.id_num]["pos"] = rigid_body.pos
         self.rb_data[rigid_body.id_num]["rot"] = rigid_body.rot
@@ -403,12 +431,14 @@ class Skeleton:
 
 
 class SkeletonData:
+    __slots__ = ("skeleton_list", "ske_data")
+
     def __init__(self):
         self.skeleton_list = []
         self.ske_data = {}  # added
 
     def add_skeleton(self, new_skeleton):
-        self.skeleton_list.append(copy.deepcopy(new_skeleton))
+        self.skeleton_list.append(new_skeleton)
         self.ske_data[new_skeleton.id_num] = (
             new_skeleton.rb_data
         )  # new_skeleton.rigid_body_list
@@ -432,6 +462,15 @@ class SkeletonData:
 
 
 class AssetMarkerData:
+    __slots__ = (
+        "marker_id",
+        "pos",
+        "marker_size",
+        "marker_params",
+        "residual",
+        "marker_num",
+    )
+
     def __init__(
         self,
         marker_id,
@@ -487,6 +526,8 @@ class AssetMarkerData:
 
 
 class AssetRigidBodyData:
+    __slots__ = ("id_num", "pos", "rot", "mean_error", "param", "rb_num")
+
     def __init__(self, new_id, pos, rot, mean_error=0.0, param=0):
         self.id_num = new_id
         self.pos = pos
@@ -523,6 +564,8 @@ class AssetRigidBodyData:
 
 
 class Asset:
+    __slots__ = ("asset_id", "rigid_body_list", "marker_list")
+
     def __init__(self):
         self.asset_id = 0
         self.rigid_body_list = []
@@ -532,11 +575,11 @@ class Asset:
         self.asset_id = new_id
 
     def add_rigid_body(self, rigid_body):
-        self.rigid_body_list.append(copy.deepcopy(rigid_body))
+        self.rigid_body_list.append(rigid_body)
         return len(self.rigid_body_list)
 
     def add_marker(self, marker):
-        self.marker_list.append(copy.deepcopy(marker))
+        self.marker_list.append(marker)
         return len(self.marker_list)
 
     def get_rigid_body_count(self):
@@ -569,11 +612,13 @@ class Asset:
 
 
 class AssetData:
+    __slots__ = "asset_list"
+
     def __init__(self):
         self.asset_list = []
 
     def add_asset(self, new_asset):
-        self.asset_list.append(copy.deepcopy(new_asset))
+        self.asset_list.append(new_asset)
 
     def get_asset_count(self):
         return len(self.asset_list)
@@ -592,6 +637,8 @@ class AssetData:
 
 
 class LabeledMarker:
+    __slots__ = ("id_num", "pos", "size", "param", "residual", "marker_num")
+
     def __init__(self, new_id, pos, size=0.0, param=0, residual=0.0):
         self.id_num = new_id
         self.pos = pos
@@ -647,11 +694,13 @@ class LabeledMarker:
 
 
 class LabeledMarkerData:
+    __slots__ = "labeled_marker_list"
+
     def __init__(self):
         self.labeled_marker_list = []
 
     def add_labeled_marker(self, labeled_marker):
-        self.labeled_marker_list.append(copy.deepcopy(labeled_marker))
+        self.labeled_marker_list.append(labeled_marker)
         return len(self.labeled_marker_list)
 
     def get_labeled_marker_count(self):
@@ -675,12 +724,14 @@ class LabeledMarkerData:
 
 
 class ForcePlateChannelData:
+    __slots__ = "frame_list"
+
     def __init__(self):
         # list of floats
         self.frame_list = []
 
     def add_frame_entry(self, frame_entry):
-        self.frame_list.append(copy.deepcopy(frame_entry))
+        self.frame_list.append(frame_entry)
         return len(self.frame_list)
 
     def get_as_string(self, tab_str, level, channel_num=-1):
@@ -703,12 +754,14 @@ class ForcePlateChannelData:
 
 
 class ForcePlate:
+    __slots__ = ("id_num", "channel_data_list")
+
     def __init__(self, new_id=0):
         self.id_num = new_id
         self.channel_data_list = []
 
     def add_channel_data(self, channel_data):
-        self.channel_data_list.append(copy.deepcopy(channel_data))
+        self.channel_data_list.append(channel_data)
         return len(self.channel_data_list)
 
     def get_as_string(self, tab_str, level):
@@ -724,11 +777,13 @@ class ForcePlate:
 
 
 class ForcePlateData:
+    __slots__ = "force_plate_list"
+
     def __init__(self):
         self.force_plate_list = []
 
     def add_force_plate(self, force_plate):
-        self.force_plate_list.append(copy.deepcopy(force_plate))
+        self.force_plate_list.append(force_plate)
         return len(self.force_plate_list)
 
     def get_force_plate_count(self):
@@ -749,12 +804,14 @@ class ForcePlateData:
 
 
 class DeviceChannelData:
+    __slots__ = "frame_list"
+
     def __init__(self):
         # list of floats
         self.frame_list = []
 
     def add_frame_entry(self, frame_entry):
-        self.frame_list.append(copy.deepcopy(frame_entry))
+        self.frame_list.append(frame_entry)
         return len(self.frame_list)
 
     def get_as_string(self, tab_str, level, channel_num=-1):
@@ -777,12 +834,14 @@ class DeviceChannelData:
 
 
 class Device:
+    __slots__ = ("id_num", "channel_data_list")
+
     def __init__(self, new_id):
         self.id_num = new_id
         self.channel_data_list = []
 
     def add_channel_data(self, channel_data):
-        self.channel_data_list.append(copy.deepcopy(channel_data))
+        self.channel_data_list.append(channel_data)
         return len(self.channel_data_list)
 
     def get_as_string(self, tab_str, level, device_num):
@@ -804,11 +863,13 @@ class Device:
 
 
 class DeviceData:
+    __slots__ = "device_list"
+
     def __init__(self):
         self.device_list = []
 
     def add_device(self, device):
-        self.device_list.append(copy.deepcopy(device))
+        self.device_list.append(device)
         return len(self.device_list)
 
     def get_device_count(self):
@@ -827,6 +888,21 @@ class DeviceData:
 
 
 class FrameSuffixData:
+    __slots__ = (
+        "timecode",
+        "timecode_sub",
+        "timestamp",
+        "stamp_camera_mid_exposure",
+        "stamp_data_received",
+        "stamp_transmit",
+        "prec_timestamp_secs",
+        "prec_timestamp_frac_secs",
+        "param",
+        "is_recording",
+        "tracked_models_changed",
+        "edit_mode",
+    )
+
     def __init__(self):
         self.timecode = -1
         self.timecode_sub = -1
@@ -884,7 +960,54 @@ class FrameSuffixData:
         return out_str
 
 
+# Immutable frame snapshot, built by MoCapData.get_snapshot()
+RigidBodySnapshot = namedtuple(
+    "RigidBodySnapshot", ["id_num", "pos", "rot", "error", "tracking_valid"]
+)
+SkeletonSnapshot = namedtuple("SkeletonSnapshot", ["id_num", "rigid_bodies"])
+FrameSnapshot = namedtuple(
+    "FrameSnapshot",
+    [
+        "frame_number",
+        "rigid_bodies",
+        "skeletons",
+        "timecode",
+        "timecode_sub",
+        "timestamp",
+        "is_recording",
+        "tracked_models_changed",
+        "edit_mode",
+    ],
+)
+
+
+def get_rigid_body_snapshots(rigid_body_list):
+    return tuple(
+        RigidBodySnapshot(
+            rigid_body.id_num,
+            tuple(rigid_body.pos),
+            tuple(rigid_body.rot),
+            rigid_body.error,
+            rigid_body.tracking_valid,
+        )
+        for rigid_body in rigid_body_list
+    )
+
+
 class MoCapData:
+    __slots__ = (
+        "prefix_data",
+        "marker_set_data",
+        "legacy_other_markers",
+        "rigid_body_data",
+        "asset_data",
+        "skeleton_data",
+        "labeled_marker_data",
+        "force_plate_data",
+        "device_data",
+        "suffix_data",
+    )
+
     def __init__(self):
         # Packet Parts
         self.prefix_data = None
@@ -928,6 +1051,40 @@ class MoCapData:
     def set_suffix_data(self, new_suffix_data):
         self.suffix_data = new_suffix_data
 
+    def get_snapshot(self):
+        """returns an immutable FrameSnapshot that shares nothing with this frame"""
+        frame_number = -1
+        if self.prefix_data is not None:
+            frame_number = self.prefix_data.frame_number
+        rigid_bodies = ()
+        if self.rigid_body_data is not None:
+            rigid_bodies = get_rigid_body_snapshots(
+                self.rigid_body_data.rigid_body_list
+            )
+        skeletons = ()
+        if self.skeleton_data is not None:
+            skeletons = tuple(
+                SkeletonSnapshot(
+                    skeleton.id_num,
+                    get_rigid_body_snapshots(skeleton.rigid_body_list),
+                )
+                for skeleton in self.skeleton_data.skeleton_list
+            )
+        suffix_data = self.suffix_data
+        if suffix_data is None:
+            suffix_data = FrameSuffixData()
+        return FrameSnapshot(
+            frame_number,
+            rigid_bodies,
+            skeletons,
+            suffix_data.timecode,
+            suffix_data.timecode_sub,
+            suffix_data.timestamp,
+            suffix_data.is_recording,
+            suffix_data.tracked_models_changed,
+            suffix_data.edit_mode,
+        )
+
     # def retrieve_pos_ori(self):
     #     if not self.rigid_body_data == None:
     #         locs, oris = self.rigid_body_data.get_pos_ori()
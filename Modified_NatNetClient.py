@@ -15,6 +15,8 @@
 # OptiTrack NatNet direct depacketization library for Python 3.x
 
 import copy
+import hashlib
+import select
 import socket
 import struct
 import sys
@@ -24,6 +26,26 @@ from threading import Thread
 import mathutils
 
 from . import DataDescriptions, MoCapData
+from .async_transport import AsyncTransport
+from .capture import COMMAND_CHANNEL, DATA_CHANNEL, CaptureWriter
+from .diagnostics import FrameDiagnostics
+from .frame import Frame
+from .frame_decoder import (
+    DEVICES,
+    FORCE_PLATES,
+    FRAME_SECTIONS,
+    RIGID_BODIES,
+    SKELETONS,
+    FrameDecoder,
+)
+from .frame_worker import FrameWorker
+from .packet_buffer import (
+    FrameGapDetector,
+    PacketBufferPool,
+    count_message,
+    create_message_counts,
+    get_frame_number,
+)
 from .repository.skeleton import BoneData, SkeletonData, SkeletonRepository
 
 
@@ -52,6 +74,24 @@ def get_message_id(data):
     return message_id
 
 
+def get_desc_dict_diff(old_desc_dict, new_desc_dict):
+    """returns {"rb_desc"|"ske_desc": {"added", "removed", "changed": set of ids}}"""
+    desc_diff = {}
+    for desc_type in ("rb_desc", "ske_desc"):
+        old_descs = old_desc_dict.get(desc_type, {})
+        new_descs = new_desc_dict.get(desc_type, {})
+        desc_diff[desc_type] = {
+            "added": new_descs.keys() - old_descs.keys(),
+            "removed": old_descs.keys() - new_descs.keys(),
+            "changed": {
+                desc_id
+                for desc_id in new_descs.keys() & old_descs.keys()
+                if new_descs[desc_id] != old_descs[desc_id]
+            },
+        }
+    return desc_diff
+
+
 # Create structs for reading various object types to speed up parsing.
 Vector2 = struct.Struct("<ff")
 Vector3 = struct.Struct("<fff")
@@ -93,6 +133,8 @@ class NatNetClient:
         # self.motive_edit = None
         self.new_frame_listener = None
         self.rb_listener = None
+        # Receives a frame.Frame per NAT_FRAMEOFDATA. Wrap callbacks written
+        # for the old frame dicts with frame.dict_listener().
         self.data_listener = None
 
         # Set Application Name
@@ -122,6 +164,61 @@ class NatNetClient:
 
         self.stop_threads = False
 
+        # NAT_FRAMEOFDATA decoder. "fast" walks the packet once with absolute
+        # offsets (frame_decoder.py), "legacy" uses the nested __unpack_* path.
+        self.frame_decoder = FrameDecoder()
+        self.decoder_mode = "fast"
+        # Decode every frame with both paths and report rb_data/ske_data mismatches
+        self.verify_decoder = False
+
+        # Frame dumps for debugging, see diagnostics.py. Attach a ConsoleSink,
+        # FileSink or RingBufferSink to enable them.
+        self.diagnostics = FrameDiagnostics()
+
+        # Data descriptions from the last NAT_MODELDEF, reset by run()
+        self.desc_dict = {}
+
+        # Hash of the last parsed NAT_MODELDEF payload. An identical payload
+        # is not parsed again and leaves desc_dict and SkeletonRepository as is.
+        self.modeldef_hash = None
+        # get_desc_dict_diff() of the last two different data descriptions
+        self.desc_diff = {}
+
+        # Appends every received packet to a capture file, see capture.py
+        self.capture_writer = None
+
+        # Each socket thread receives into its own preallocated buffers and
+        # counts messages by id, see packet_buffer.py
+        self.data_buffer_pool = PacketBufferPool()
+        self.command_buffer_pool = PacketBufferPool()
+        self.data_message_counts = create_message_counts()
+        self.command_message_counts = create_message_counts()
+
+        # Requested SO_RCVBUF of the data socket, big enough to hold the frames
+        # that arrive while Blender's main thread holds the GIL. The operating
+        # system may grant less, see receive_buffer_size_granted.
+        self.receive_buffer_size = 4 * 1024 * 1024
+        self.receive_buffer_size_granted = None
+        # Decode only the newest of the frames queued in the data socket
+        self.skip_stale_frames = True
+        # Frame number gaps of the data stream, see packet_buffer.py
+        self.frame_gap_detector = FrameGapDetector()
+        # Called from the data thread with (frame number, dropped frame count)
+        self.frame_drop_listener = None
+        # Called with (message id, packet) for each of RESPONSE_MESSAGE_IDS
+        # after it has been processed
+        self.response_listener = None
+
+        # "threads" receives on one blocking thread per socket, "asyncio" on
+        # a single event loop thread, see async_transport.py
+        self.transport_mode = "threads"
+        self.async_transport = None
+
+        # Receive and decode frames in a child process, see frame_worker.py.
+        # Multicast only, markers and analog channels are not decoded there.
+        self.decode_in_worker = False
+        self.frame_worker = None
+
     # Client/server message ids
     NAT_CONNECT = 0
     NAT_SERVERINFO = 1
@@ -137,6 +234,14 @@ class NatNetClient:
     NAT_UNRECOGNIZED_REQUEST = 100
     NAT_UNDEFINED = 999999.9999
 
+    # Replies to requests on the command socket, passed to response_listener
+    RESPONSE_MESSAGE_IDS = (
+        NAT_SERVERINFO,
+        NAT_RESPONSE,
+        NAT_MODELDEF,
+        NAT_UNRECOGNIZED_REQUEST,
+    )
+
     def set_client_address(self, local_ip_address):
         if not self.__is_locked:
             self.local_ip_address = local_ip_address
@@ -155,6 +260,10 @@ class NatNetClient:
         if not self.__is_locked:
             self.use_multicast = use_multicast
 
+    def set_receive_buffer_size(self, receive_buffer_size):
+        if not self.__is_locked:
+            self.receive_buffer_size = receive_buffer_size
+
     def can_change_bitstream_version(self):
         return self.__can_change_bitstream_version
 
@@ -172,6 +281,7 @@ class NatNetClient:
                 self.__nat_net_requested_version[1] = minor
                 self.__nat_net_requested_version[2] = 0
                 self.__nat_net_requested_version[3] = 0
+                self.frame_decoder.set_version(major, minor)
                 print("changing bitstream MAIN")
                 # get original output state
                 # print_results = self.get_print_results()
@@ -208,12 +318,97 @@ class NatNetClient:
     def get_print_level(self):
         return self.print_level
 
+    def set_decoder_mode(self, decoder_mode="fast"):
+        if decoder_mode in ("fast", "legacy"):
+            self.decoder_mode = decoder_mode
+        return self.decoder_mode
+
+    def set_transport_mode(self, transport_mode="threads"):
+        if not self.__is_locked and transport_mode in ("threads", "asyncio"):
+            self.transport_mode = transport_mode
+        return self.transport_mode
+
+    def set_decode_in_worker(self, decode_in_worker):
+        if not self.__is_locked:
+            self.decode_in_worker = decode_in_worker
+        return self.decode_in_worker
+
+    def set_verify_decoder(self, verify_decoder):
+        self.verify_decoder = verify_decoder
+
+    def set_frame_pool(self, frame_pool=None):
+        """recycle the frame.Frame objects handed to data_listener through frame_pool"""
+        self.frame_decoder.frame_pool = frame_pool
+        return frame_pool
+
+    def set_analog_buffers(self, force_plate_buffers=None, device_buffers=None):
+        """decode force plate / device channels into analog.AnalogBuffers rings"""
+        self.frame_decoder.force_plate_buffers = force_plate_buffers
+        self.frame_decoder.device_buffers = device_buffers
+        self.set_section_subscription(FORCE_PLATES, force_plate_buffers is not None)
+        self.set_section_subscription(DEVICES, device_buffers is not None)
+
+    def start_capture(self, path):
+        """append every received packet to path, replay it with capture.PacketReplay"""
+        self.stop_capture()
+        self.capture_writer = CaptureWriter(path, self.get_major(), self.get_minor())
+        return self.capture_writer
+
+    def stop_capture(self):
+        capture_writer = self.capture_writer
+        self.capture_writer = None
+        if capture_writer is not None:
+            capture_writer.close()
+        return capture_writer
+
+    def set_nat_net_requested_version(self, major, minor):
+        """sets the bitstream version packets are decoded with, without asking the server"""
+        self.__nat_net_requested_version[0] = major
+        self.__nat_net_requested_version[1] = minor
+        self.__nat_net_requested_version[2] = 0
+        self.__nat_net_requested_version[3] = 0
+        self.frame_decoder.set_version(major, minor)
+
+    def feed_packet(self, data, print_level=0):
+        """handles a packet as if it had arrived on the command socket"""
+        message_id, dict_temp = self.__process_message(data, print_level)
+        if dict_temp is not None:
+            self.desc_dict = dict_temp
+        return message_id
+
+    def subscribe_sections(self, *section_names):
+        """decode the given frame sections, see frame_decoder.FRAME_SECTIONS"""
+        for section_name in section_names:
+            if section_name not in FRAME_SECTIONS:
+                print("ERROR: Unknown frame section %s" % section_name)
+                continue
+            self.frame_decoder.subscribed_sections.add(section_name)
+        return self.get_subscribed_sections()
+
+    def unsubscribe_sections(self, *section_names):
+        """skip the given frame sections, in O(1) on NatNet 4.1 and later"""
+        for section_name in section_names:
+            self.frame_decoder.subscribed_sections.discard(section_name)
+        return self.get_subscribed_sections()
+
+    def set_section_subscription(self, section_name, subscribed):
+        if subscribed:
+            return self.subscribe_sections(section_name)
+        return self.unsubscribe_sections(section_name)
+
+    def get_subscribed_sections(self):
+        return tuple(
+            section_name
+            for section_name in FRAME_SECTIONS
+            if section_name in self.frame_decoder.subscribed_sections
+        )
+
     def connected(self):
         ret_value = True
         # check sockets
         if self.command_socket == None:
             ret_value = False
-        elif self.data_socket == None:
+        elif self.data_socket == None and self.frame_worker is None:
             ret_value = False
         # check versions
         elif self.get_application_name() == "Not Set":
@@ -351,6 +546,18 @@ class NatNetClient:
                     + socket.inet_aton(self.local_ip_address),
                 )
 
+        if result is not None and self.receive_buffer_size:
+            try:
+                result.setsockopt(
+                    socket.SOL_SOCKET, socket.SO_RCVBUF, self.receive_buffer_size
+                )
+            except socket.error as msg:
+                print("ERROR: could not set the data socket receive buffer:\n%s" % msg)
+            # Linux reports twice the granted size and caps requests at
+            # net.core.rmem_max
+            self.receive_buffer_size_granted = result.getsockopt(
+                socket.SOL_SOCKET, socket.SO_RCVBUF
+            )
         return result
 
     # Unpack Mocap Data Functions
@@ -493,14 +700,14 @@ class NatNetClient:
                     )
                     offset += 4
                     trace_mf("\tMarker ID", i, ":", new_id)
-                    rb_marker_list[i].id = new_id
+                    rb_marker_list[i].id_num = new_id
 
                 # Marker sizes
                 for i in marker_count_range:
                     size = FloatValue.unpack(data[offset : offset + 4])
                     offset += 4
                     trace_mf("\tMarker Size", i, ":", size[0])
-                    rb_marker_list[i].size = size
+                    rb_marker_list[i].size = size[0]
 
             for i in marker_count_range:
                 rigid_body.add_rigid_body_marker(rb_marker_list[i])
@@ -644,14 +851,14 @@ class NatNetClient:
                     )
                     offset += 4
                     trace_mf("\tMarker ID", i, ":", new_id)
-                    rb_marker_list[i].id = new_id
+                    rb_marker_list[i].id_num = new_id
 
                 # Marker sizes
                 for i in marker_count_range:
                     size = FloatValue.unpack(data[offset : offset + 4])
                     offset += 4
                     trace_mf("\tMarker Size", i, ":", size[0])
-                    rb_marker_list[i].size = size
+                    rb_marker_list[i].size = size[0]
 
             for i in marker_count_range:
                 rigid_body.add_rigid_body_marker(rb_marker_list[i])
@@ -829,9 +1036,7 @@ class NatNetClient:
 
         # Unpack assets
         for asset_num in range(0, asset_count):
-            rel_offset, asset = self.__unpack_asset(
-                data[offset:], major, minor, asset_num
-            )
+            rel_offset = self.__unpack_asset(data[offset:], major, minor, asset_num)
             offset += rel_offset
 
         return offset
@@ -868,11 +1073,13 @@ class NatNetClient:
         return offset
 
     def __unpack_force_plate_data(self, data, packet_size, major, minor):
-        n_frames_show_max = 4
         offset = 0
         # Force Plate data (version 2.9 and later)
         force_plate_count = 0
         if (major == 2 and minor >= 9) or major > 2:
+            force_plate_count = int.from_bytes(
+                data[offset : offset + 4], byteorder="little", signed=True
+            )
             offset += 4
 
             # get data size (4 bytes)
@@ -897,25 +1104,18 @@ class NatNetClient:
                     )
                     offset += 4
 
-                    # Force plate frames
-                    n_frames_show = min(
-                        force_plate_channel_frame_count, n_frames_show_max
-                    )
-                    for k in range(force_plate_channel_frame_count):
-                        offset += 4
-
-                        if k < n_frames_show:
-                            pass
-                    if n_frames_show < force_plate_channel_frame_count:
-                        pass
+                    # Force plate frames, see FrameDecoder for the decoded samples
+                    offset += 4 * force_plate_channel_frame_count
         return offset
 
     def __unpack_device_data(self, data, packet_size, major, minor):
-        n_frames_show_max = 4
         offset = 0
         # Device data (version 2.11 and later)
         device_count = 0
         if (major == 2 and minor >= 11) or (major > 2):
+            device_count = int.from_bytes(
+                data[offset : offset + 4], byteorder="little", signed=True
+            )
             offset += 4
 
             # get data size (4 bytes)
@@ -939,14 +1139,8 @@ class NatNetClient:
                     )
                     offset += 4
 
-                    # Device Frame Data
-                    n_frames_show = min(device_channel_frame_count, n_frames_show_max)
-                    for k in range(0, device_channel_frame_count):
-                        offset += 4
-                        if k < n_frames_show:
-                            pass
-                    if n_frames_show < device_channel_frame_count:
-                        pass
+                    # Device Frame Data, see FrameDecoder for the decoded samples
+                    offset += 4 * device_channel_frame_count
         return offset
 
     def __unpack_frame_suffix_data(self, data, packet_size, major, minor):
@@ -1173,22 +1367,61 @@ class NatNetClient:
         #     for j in range(len(ske_rb)):
         #         ske_data[ske.id_num][ske_rb[j].id_num] = {'pos': ske_rb[j].pos, 'rot': ske_rb[j].rot}
 
-        # Send information to any listener.
-        if self.data_listener is not None:
-            data_dict = {}
-            data_dict["tracked_models_changed"] = tracked_models_changed
-            data_dict["edit_mode"] = edit_mode
-            data_dict["frame_number"] = frame_number
-            # data_dict[ "rigid_body_count" ] = rigid_body_count
-            # data_dict["rb_data"] = rb_data
-            # data_dict[ "skeleton_count" ] = skeleton_count
-            # data_dict[ "ske_data"] = ske_data
-            data_dict["rb_data"] = rigid_body_data.rb_data
-            data_dict["ske_data"] = skeleton_data.ske_data
-            # print(data_dict)
-            self.data_listener(data_dict)
-
-        return offset, mocap_data
+        data_dict = {}
+        data_dict["tracked_models_changed"] = tracked_models_changed
+        data_dict["edit_mode"] = edit_mode
+        data_dict["frame_number"] = frame_number
+        # data_dict[ "rigid_body_count" ] = rigid_body_count
+        # data_dict["rb_data"] = rb_data
+        # data_dict[ "skeleton_count" ] = skeleton_count
+        # data_dict[ "ske_data"] = ske_data
+        data_dict["rb_data"] = rigid_body_data.rb_data
+        data_dict["ske_data"] = skeleton_data.ske_data
+
+        return offset, mocap_data, data_dict
+
+    # Decode a NAT_FRAMEOFDATA payload with the single pass frame decoder
+    def __decode_mocap_data(self, data: bytes, offset, packet_size, major, minor):
+        self.frame_decoder.rigid_body_listener = self.rigid_body_listener
+        end_offset, frame = self.frame_decoder.decode(
+            data, offset, packet_size, major, minor
+        )
+
+        if self.verify_decoder:
+            # the fast path already notified the rigid body listener
+            rigid_body_listener = self.rigid_body_listener
+            self.rigid_body_listener = None
+            try:
+                rel_offset, mocap_data, legacy_dict = self.__unpack_mocap_data(
+                    data[offset:], packet_size, major, minor
+                )
+            finally:
+                self.rigid_body_listener = rigid_body_listener
+            if offset + rel_offset != end_offset:
+                print(
+                    "WARNING: frame decoder offset mismatch: fast %d legacy %d"
+                    % (end_offset, offset + rel_offset)
+                )
+            self.__compare_frame_dicts(frame, legacy_dict)
+
+        return end_offset, frame
+
+    def __compare_frame_dicts(self, frame, legacy_dict):
+        data_dict = frame.to_dict()
+        keys = ["frame_number"]
+        # unsubscribed sections are handed out empty by the fast path
+        if RIGID_BODIES in self.frame_decoder.subscribed_sections:
+            keys.append("rb_data")
+        if SKELETONS in self.frame_decoder.subscribed_sections:
+            keys.append("ske_data")
+        for key in keys:
+            if data_dict[key] != legacy_dict[key]:
+                print(
+                    "WARNING: frame decoder mismatch on %s at frame %d"
+                    % (key, legacy_dict["frame_number"])
+                )
+                print("\tfast  : %s" % data_dict[key])
+                print("\tlegacy: %s" % legacy_dict[key])
 
     # Unpack a Markerset description packet
     def __unpack_marker_set_description(self, data, major, minor):
@@ -1853,6 +2086,10 @@ class NatNetClient:
             self.__nat_net_requested_version[3] = self.__nat_net_stream_version_server[
                 3
             ]
+            self.frame_decoder.set_version(
+                self.__nat_net_requested_version[0],
+                self.__nat_net_requested_version[1],
+            )
             # Determine if the bitstream version can be changed
             if (self.__nat_net_stream_version_server[0] >= 4) and (
                 self.use_multicast == False
@@ -1889,7 +2126,7 @@ class NatNetClient:
 
     def __unpack_bitstream_info(self, data, packet_size, major, minor):
         nn_version = []
-        inString = data.decode("utf-8")
+        inString = bytes(data).partition(b"\0")[0].decode("utf-8")
         messageList = inString.split(",")
         if len(messageList) > 1:
             if messageList[0] == "Bitstream":
@@ -1899,111 +2136,219 @@ class NatNetClient:
     def __command_thread_function(
         self, in_socket, stop, gprint_level, msg_id, desc_dict
     ):
-        message_id_dict = {}
-        if not self.use_multicast:
-            in_socket.settimeout(2.0)
-        data = bytearray(0)
-        # 64k buffer size
-        recv_buffer_size = 64 * 1024
+        # unicast clients send a keep alive at least every 2 s, multicast
+        # clients wake up regularly to check stop()
+        timeout = 0.5 if self.use_multicast else 2.0
+        in_socket.setblocking(False)
         while not stop():
             # Block for input
             try:
-                data, addr = in_socket.recvfrom(recv_buffer_size)
-            except socket.error as msg:
-                if stop():
-                    # print("ERROR: command socket access error occurred:\n  %s" %msg)
-                    # return 1
-                    print("shutting down")
-            except socket.herror:
-                print("ERROR: command socket access herror occurred")
-                return 2
-            except socket.gaierror:
-                print("ERROR: command socket access gaierror occurred")
-                return 3
-            except socket.timeout:
-                if self.use_multicast:
-                    print(
-                        "ERROR: command socket access timeout occurred. Server not responding"
-                    )
-                    # return 4
-
-            if len(data) > 0:
-                # peek ahead at message_id
-                message_id = get_message_id(data)
-                tmp_str = "mi_%1.1d" % message_id
-                if tmp_str not in message_id_dict:
-                    message_id_dict[tmp_str] = 0
-                message_id_dict[tmp_str] += 1
-
-                print_level = gprint_level()
-                if message_id == self.NAT_FRAMEOFDATA:
-                    if print_level > 0:
-                        if (message_id_dict[tmp_str] % print_level) == 0:
-                            print_level = 1
-                        else:
-                            print_level = 0
-                # print("command_thread_function")
-                message_id, dict_temp = self.__process_message(data, print_level)
-
-                if dict_temp is not None:
-                    self.desc_dict = dict_temp
-
-                # self.command_ready_event.set()
-                data = bytearray(0)
+                readable, _, _ = select.select((in_socket,), (), (), timeout)
+            except (OSError, ValueError) as msg:
+                if not stop():
+                    print("ERROR: command socket access error occurred:\n  %s" % msg)
+                    return 1
+                break
+            if readable:
+                # errors such as Windows reporting an unreachable server on a
+                # UDP socket are not fatal for the command channel
+                self.receive_packets(in_socket, COMMAND_CHANNEL)
 
             if not self.use_multicast:
                 if not stop():
-                    self.send_keep_alive(
-                        in_socket, self.server_ip_address, self.command_port
-                    )
+                    try:
+                        self.send_keep_alive(
+                            in_socket, self.server_ip_address, self.command_port
+                        )
+                    except socket.error as msg:
+                        # shutdown() may close the socket after the stop() check
+                        if not stop():
+                            print(
+                                "ERROR: command socket keep alive failed:\n  %s" % msg
+                            )
         return 0
 
     def __data_thread_function(self, in_socket, stop, gprint_level):
-        message_id_dict = {}
-        data = bytearray(0)
-        # 64k buffer size
-        recv_buffer_size = 64 * 1024
+        # wake up regularly to check stop(), closing the socket does not
+        # interrupt a blocked receive on every platform
+        in_socket.setblocking(False)
 
         while not stop():
             # Block for input
             try:
-                data, addr = in_socket.recvfrom(recv_buffer_size)
-            except socket.error as msg:
+                readable, _, _ = select.select((in_socket,), (), (), 0.5)
+            except (OSError, ValueError) as msg:
                 if not stop():
                     print("ERROR: data socket access error occurred:\n  %s" % msg)
                     return 1
-            except socket.herror:
-                print("ERROR: data socket access herror occurred")
-                # return 2
-            except socket.gaierror:
-                print("ERROR: data socket access gaierror occurred")
-                # return 3
-            except socket.timeout:
-                # if self.use_multicast:
-                print(
-                    "ERROR: data socket access timeout occurred. Server not responding"
-                )
-                # return 4
-            if len(data) > 0:
-                # peek ahead at message_id
-                message_id = get_message_id(data)
-                tmp_str = "mi_%1.1d" % message_id
-                if tmp_str not in message_id_dict:
-                    message_id_dict[tmp_str] = 0
-                message_id_dict[tmp_str] += 1
-
-                print_level = gprint_level()
-                if message_id == self.NAT_FRAMEOFDATA:
-                    if print_level > 0:
-                        if (message_id_dict[tmp_str] % print_level) == 0:
-                            print_level = 1
-                        else:
-                            print_level = 0
-                message_id, dict_temp = self.__process_message(data, print_level)
-
-                data = bytearray(0)
+                break
+            if readable and self.receive_packets(in_socket, DATA_CHANNEL) != 0:
+                if not stop():
+                    return 1
         return 0
 
+    def __process_received_message(self, data, message_id, message_count):
+        print_level = self.print_level
+        if message_id == self.NAT_FRAMEOFDATA:
+            if print_level > 0:
+                if (message_count % print_level) == 0:
+                    print_level = 1
+                else:
+                    print_level = 0
+        message_id, dict_temp = self.__process_message(data, print_level)
+        if dict_temp is not None:
+            self.desc_dict = dict_temp
+        if message_id in self.RESPONSE_MESSAGE_IDS:
+            response_listener = self.response_listener
+            if response_listener is not None:
+                response_listener(message_id, data)
+        return message_id
+
+    def receive_packets(self, in_socket, channel):
+        """processes every datagram queued on the non-blocking in_socket.
+
+        Returns 0 once the socket is drained and 1 on a socket error. Of the
+        queued NAT_FRAMEOFDATA packets only the newest is decoded, unless
+        skip_stale_frames is off or analog buffers need the samples of every
+        frame. Queued frames build up while Blender's main thread holds the GIL.
+        """
+        if channel == DATA_CHANNEL:
+            message_counts = self.data_message_counts
+            buffer_pool = self.data_buffer_pool
+        else:
+            message_counts = self.command_message_counts
+            buffer_pool = self.command_buffer_pool
+        frame_gap_detector = self.frame_gap_detector
+        skip_stale_frames = self.skip_stale_frames and (
+            self.frame_decoder.force_plate_buffers is None
+            and self.frame_decoder.device_buffers is None
+        )
+        return_code = 0
+        newest_frame = None
+        while True:
+            buffer = buffer_pool.acquire()
+            try:
+                byte_count, addr = in_socket.recvfrom_into(buffer)
+            except BlockingIOError:
+                buffer_pool.release(buffer)
+                break
+            except socket.error as msg:
+                buffer_pool.release(buffer)
+                if not self.stop_threads:
+                    print("ERROR: socket access error occurred:\n  %s" % msg)
+                return_code = 1
+                break
+            if byte_count == 0:
+                buffer_pool.release(buffer)
+                continue
+
+            data = memoryview(buffer)[:byte_count]
+            capture_writer = self.capture_writer
+            if capture_writer is not None:
+                capture_writer.write(channel, data)
+            # peek ahead at message_id
+            message_id = get_message_id(data)
+            message_count = count_message(message_counts, message_id)
+
+            if message_id != self.NAT_FRAMEOFDATA:
+                self.__process_received_message(data, message_id, message_count)
+                data = None
+                buffer_pool.release(buffer)
+                continue
+
+            gap = frame_gap_detector.add_frame(get_frame_number(data))
+            if gap > 0 and self.frame_drop_listener is not None:
+                self.frame_drop_listener(frame_gap_detector.last_frame_number, gap)
+            if newest_frame is not None:
+                if skip_stale_frames:
+                    frame_gap_detector.skipped_frame_count += 1
+                else:
+                    self.__process_received_message(*newest_frame[1:])
+                buffer_pool.release(newest_frame[0])
+            newest_frame = (buffer, data, message_id, message_count)
+            data = None
+
+        if newest_frame is not None:
+            self.__process_received_message(*newest_frame[1:])
+            buffer_pool.release(newest_frame[0])
+        return return_code
+
+    def __build_desc_dict(self, data_descs):
+        """returns the desc_dict and SkeletonData list of parsed data descriptions"""
+        desc_dict = {}
+        skeletons = []
+
+        desc_dict["rb_desc"] = {}
+        for rigid_body in data_descs.rigid_body_list:
+            desc_dict["rb_desc"][rigid_body.id_num] = {
+                "name": DataDescriptions.get_as_string(rigid_body.sz_name)
+            }
+
+        desc_dict["ske_desc"] = {}
+        for skeleton in data_descs.skeleton_list:
+
+            skeleton_bones: dict[int, BoneData] = {
+                0: BoneData(
+                    bone_id=0,
+                    bone_name="Root",
+                    t_pose_head=mathutils.Vector(),
+                    parent=None,
+                )
+            }
+
+            skeleton_name = DataDescriptions.get_as_string(skeleton.name)
+
+            ske_name_len = len(DataDescriptions.get_as_string(skeleton.name))
+            desc_dict["ske_desc"][skeleton.id_num] = {}
+            desc_dict["ske_desc"][skeleton.id_num]["name"] = (
+                DataDescriptions.get_as_string(skeleton.name)
+            )
+            desc_dict["ske_desc"][skeleton.id_num]["rb_id"] = {}
+            desc_dict["ske_desc"][skeleton.id_num]["rb_name"] = {}
+            for rigid_body in skeleton.rigid_body_description_list:
+                desc_dict["ske_desc"][skeleton.id_num]["rb_id"][rigid_body.id_num] = {
+                    "name": DataDescriptions.get_as_string(rigid_body.sz_name)[
+                        ske_name_len + 1 :
+                    ],
+                    "pos": rigid_body.pos,
+                    "parent_id": rigid_body.parent_id,
+                }
+                desc_dict["ske_desc"][skeleton.id_num]["rb_name"][
+                    DataDescriptions.get_as_string(rigid_body.sz_name)[
+                        ske_name_len + 1 :
+                    ]
+                ] = {
+                    "id": rigid_body.id_num,
+                    "pos": rigid_body.pos,
+                    "parent_id": rigid_body.parent_id,
+                }
+
+                bone_name = DataDescriptions.get_as_string(rigid_body.sz_name)[
+                    ske_name_len + 1 :
+                ]
+
+                parent_bone_data = skeleton_bones.get(
+                    rigid_body.parent_id, skeleton_bones[0]
+                )
+
+                bone_data = BoneData(
+                    bone_id=rigid_body.id_num,
+                    bone_name=bone_name,
+                    t_pose_head=mathutils.Vector(rigid_body.pos),
+                    parent=parent_bone_data,
+                )
+
+                skeleton_bones[rigid_body.id_num] = bone_data
+
+            skeleton_data = SkeletonData.create_skeleton(
+                skeleton_id=skeleton.id_num,
+                skeleton_name=skeleton_name,
+                bones=skeleton_bones,
+            )
+
+            skeletons.append(skeleton_data)
+        return desc_dict, skeletons
+
     def __process_message(self, data: bytes, print_level=0):
         # print("process_message")
         # return message ID
@@ -2031,102 +2376,57 @@ class NatNetClient:
 
         # skip the 4 bytes for message ID and packet_size
         offset = 4
-        if message_id == self.NAT_FRAMEOFDATA:
+        if message_id == self.NAT_FRAMEOFDATA and major == 0:
+            # the bitstream version arrives with NAT_SERVERINFO, frames
+            # streamed before it cannot be decoded
+            trace("Skipping NAT_FRAMEOFDATA, NatNet version not known yet")
+        elif message_id == self.NAT_FRAMEOFDATA:
             trace("Message ID  : %3.1d NAT_FRAMEOFDATA" % message_id)
             trace("Packet Size : ", packet_size)
 
-            offset_tmp, mocap_data = self.__unpack_mocap_data(
-                data[offset:], packet_size, major, minor
-            )
-            offset += offset_tmp
-            # print("MoCap Frame: %d\n"%(mocap_data.prefix_data.frame_number))
-            # get a string version of the data for output
-            mocap_data_str = mocap_data.get_as_string()
-            if print_level == 0:
-                print("%s\n" % mocap_data_str)
+            mocap_data = None
+            if self.decoder_mode == "fast":
+                offset, frame = self.__decode_mocap_data(
+                    data, offset, packet_size, major, minor
+                )
+            else:
+                offset_tmp, mocap_data, data_dict = self.__unpack_mocap_data(
+                    data[offset:], packet_size, major, minor
+                )
+                offset += offset_tmp
+                frame = Frame.from_dict(data_dict)
+                # print("MoCap Frame: %d\n"%(mocap_data.prefix_data.frame_number))
+
+            # frame dumps are only built when a diagnostics sink is attached
+            if self.diagnostics.sinks:
+                self.diagnostics.dump_frame(frame, mocap_data)
+
+            # Send information to any listener.
+            if self.data_listener is not None:
+                self.data_listener(frame)
+
+            # pooled frames are only valid for the duration of the listener call
+            frame.release()
 
         elif message_id == self.NAT_MODELDEF:
             # global rigid_body_dict
             trace("Message ID  : %3.1d NAT_MODELDEF" % message_id)
             trace("Packet Size : %d" % packet_size)
-            offset_tmp, data_descs = self.__unpack_data_descriptions(
-                data[offset:], packet_size, major, minor
-            )
-            offset += offset_tmp
-
-            desc_dict = {}
-
-            desc_dict["rb_desc"] = {}
-            for rigid_body in data_descs.rigid_body_list:
-                desc_dict["rb_desc"][rigid_body.id_num] = {
-                    "name": DataDescriptions.get_as_string(rigid_body.sz_name)
-                }
-
-            desc_dict["ske_desc"] = {}
-            for skeleton in data_descs.skeleton_list:
-
-                skeleton_bones: dict[int, BoneData] = {
-                    0: BoneData(
-                        bone_id=0,
-                        bone_name="Root",
-                        t_pose_head=mathutils.Vector(),
-                        parent=None,
-                    )
-                }
-
-                skeleton_name = DataDescriptions.get_as_string(skeleton.name)
-
-                ske_name_len = len(DataDescriptions.get_as_string(skeleton.name))
-                desc_dict["ske_desc"][skeleton.id_num] = {}
-                desc_dict["ske_desc"][skeleton.id_num]["name"] = (
-                    DataDescriptions.get_as_string(skeleton.name)
+            modeldef_hash = hashlib.blake2b(data[offset:], digest_size=16).digest()
+            if modeldef_hash == self.modeldef_hash:
+                trace("Data descriptions unchanged")
+            else:
+                offset_tmp, data_descs = self.__unpack_data_descriptions(
+                    data[offset:], packet_size, major, minor
                 )
-                desc_dict["ske_desc"][skeleton.id_num]["rb_id"] = {}
-                desc_dict["ske_desc"][skeleton.id_num]["rb_name"] = {}
-                for rigid_body in skeleton.rigid_body_description_list:
-                    desc_dict["ske_desc"][skeleton.id_num]["rb_id"][
-                        rigid_body.id_num
-                    ] = {
-                        "name": DataDescriptions.get_as_string(rigid_body.sz_name)[
-                            ske_name_len + 1 :
-                        ],
-                        "pos": rigid_body.pos,
-                        "parent_id": rigid_body.parent_id,
-                    }
-                    desc_dict["ske_desc"][skeleton.id_num]["rb_name"][
-                        DataDescriptions.get_as_string(rigid_body.sz_name)[
-                            ske_name_len + 1 :
-                        ]
-                    ] = {
-                        "id": rigid_body.id_num,
-                        "pos": rigid_body.pos,
-                        "parent_id": rigid_body.parent_id,
-                    }
-
-                    bone_name = DataDescriptions.get_as_string(rigid_body.sz_name)[
-                        ske_name_len + 1 :
-                    ]
-
-                    parent_bone_data = skeleton_bones.get(
-                        rigid_body.parent_id, skeleton_bones[0]
-                    )
-
-                    bone_data = BoneData(
-                        bone_id=rigid_body.id_num,
-                        bone_name=bone_name,
-                        t_pose_head=mathutils.Vector(rigid_body.pos),
-                        parent=parent_bone_data,
-                    )
-
-                    skeleton_bones[rigid_body.id_num] = bone_data
+                offset += offset_tmp
 
-                skeleton_data = SkeletonData.create_skeleton(
-                    skeleton_id=skeleton.id_num,
-                    skeleton_name=skeleton_name,
-                    bones=skeleton_bones,
+                desc_dict, skeletons = self.__build_desc_dict(data_descs)
+                self.desc_diff = get_desc_dict_diff(self.desc_dict, desc_dict)
+                SkeletonRepository.update_skeletons(
+                    skeletons=skeletons, skeleton_diff=self.desc_diff["ske_desc"]
                 )
-
-                SkeletonRepository.append_skeleton(skeleton=skeleton_data)
+                self.modeldef_hash = modeldef_hash
 
         elif message_id == self.NAT_SERVERINFO:
             trace("Message ID  : %3.1d NAT_SERVERINFO" % message_id)
@@ -2312,6 +2612,30 @@ class NatNetClient:
     def get_application_name(self):
         return self.__application_name
 
+    def poll_frame_worker(self, latest_only=True):
+        """hands the frames decoded by the frame worker to data_listener.
+
+        Called from Blender's main thread, returns the number of frames. With
+        latest_only, frames decoded since the last call are skipped but for
+        the newest.
+        """
+        frame_worker = self.frame_worker
+        if frame_worker is None:
+            return 0
+        # the version arrives with NAT_SERVERINFO on the command socket
+        frame_worker.set_version(self.get_major(), self.get_minor())
+        frames = frame_worker.read_frames(latest_only)
+        for frame in frames:
+            if self.data_listener is not None:
+                self.data_listener(frame)
+            frame.release()
+        return len(frames)
+
+    def get_dropped_frame_count(self):
+        if self.frame_worker is not None:
+            return self.frame_worker.get_summary().get("dropped", 0)
+        return self.frame_gap_detector.dropped_frame_count
+
     def get_nat_net_requested_version(self):
         return self.__nat_net_requested_version
 
@@ -2322,11 +2646,16 @@ class NatNetClient:
         return self.__server_version
 
     def run(self):
-        # Create the data socket
-        self.data_socket = self.__create_data_socket(self.data_port)
-        if self.data_socket is None:
-            print("Could not open data channel")
-            return False
+        use_frame_worker = self.decode_in_worker and self.use_multicast
+        if self.decode_in_worker and not self.use_multicast:
+            print("Frame worker needs multicast, decoding frames in process")
+
+        # Create the data socket, the frame worker opens its own
+        if not use_frame_worker:
+            self.data_socket = self.__create_data_socket(self.data_port)
+            if self.data_socket is None:
+                print("Could not open data channel")
+                return False
 
         # Create the command socket
         self.command_socket = self.__create_command_socket()
@@ -2340,17 +2669,43 @@ class NatNetClient:
         self.msg_id = 1
         # self.desc_dict_updated = False
         self.desc_dict = {}
+        self.modeldef_hash = None
+        self.data_message_counts = create_message_counts()
+        self.command_message_counts = create_message_counts()
+        self.frame_gap_detector = FrameGapDetector()
+
+        if use_frame_worker:
+            self.frame_worker = FrameWorker()
+            self.frame_worker.start(
+                self.multicast_address,
+                self.local_ip_address,
+                self.data_port,
+                self.receive_buffer_size,
+            )
+
+        if self.transport_mode == "asyncio":
+            # both sockets on one event loop thread
+            self.async_transport = AsyncTransport(self)
+            self.async_transport.start(self.command_socket, self.data_socket)
+            self.send_request(
+                self.command_socket,
+                self.NAT_CONNECT,
+                "",
+                (self.server_ip_address, self.command_port),
+            )
+            return True
 
         # Create a separate thread for receiving data packets
-        self.data_thread = Thread(
-            target=self.__data_thread_function,
-            args=(
-                self.data_socket,
-                lambda: self.stop_threads,
-                lambda: self.print_level,
-            ),
-        )
-        self.data_thread.start()
+        if self.data_socket is not None:
+            self.data_thread = Thread(
+                target=self.__data_thread_function,
+                args=(
+                    self.data_socket,
+                    lambda: self.stop_threads,
+                    lambda: self.print_level,
+                ),
+            )
+            self.data_thread.start()
 
         # Create a separate thread for receiving command packets
         self.command_thread = Thread(
@@ -2378,10 +2733,25 @@ class NatNetClient:
     def shutdown(self):
         # print("shutdown called")
         self.stop_threads = True
-        # closing sockets causes blocking recvfrom to throw
-        # an exception and break the loop
+        self.diagnostics.clear_sinks()
+        self.stop_capture()
+        if self.frame_worker is not None:
+            self.frame_worker.shutdown()
+            self.frame_worker = None
+        if self.async_transport is not None:
+            # cancels pending commands and stops the event loop right away
+            self.async_transport.shutdown()
+            self.async_transport = None
+            self.command_socket.close()
+            if self.data_socket is not None:
+                self.data_socket.close()
+            return
+        # the threads wake up from select() within their timeout and see
+        # stop_threads, closing the sockets makes it fail sooner
         self.command_socket.close()
-        self.data_socket.close()
+        if self.data_socket is not None:
+            self.data_socket.close()
         # attempt to join the threads back.
         self.command_thread.join()
-        self.data_thread.join()
+        if self.data_thread is not None:
+            self.data_thread.join()
@@ -63,6 +63,7 @@ def register():
         plugin_operators.StartFrameRecordOperator,
         plugin_operators.StopFrameRecordOperator,
         plugin_operators.newActionOperator,
+        plugin_operators.ExportAnalogOperator,
         plugin_skeletons.MotiveArmatureOperator,
         plugin_panels.Info,
     ]
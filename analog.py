@@ -0,0 +1,156 @@
+# Ring buffers for force plate and device analog channels.
+#
+# Force plates and devices stream several analog sub-samples per mocap frame.
+# FrameDecoder copies each channel straight out of the packet into a
+# preallocated (capacity, channel_count) float32 ring, so no per-sample Python
+# objects are created. AnalogBuffers owns one ring per device and never
+# allocates more than max_bytes in total.
+#
+# This module must not import bpy or mathutils.
+
+from threading import Lock
+
+import numpy as np
+
+
+class AnalogRingBuffer:
+    """fixed capacity ring of analog samples for one force plate or device"""
+
+    __slots__ = (
+        "device_id",
+        "capacity",
+        "samples",
+        "sample_frames",
+        "write_index",
+        "sample_count",
+    )
+
+    def __init__(self, device_id, channel_count, capacity):
+        self.device_id = device_id
+        self.capacity = capacity
+        # channels shorter than the longest channel of a frame are NaN padded
+        self.samples = np.full((capacity, channel_count), np.nan, dtype=np.float32)
+        # mocap frame number of every sample, sub-samples are spread evenly
+        # over the frame, e.g. 100.0, 100.25, 100.5, 100.75
+        self.sample_frames = np.zeros(capacity, dtype=np.float64)
+        self.write_index = 0
+        self.sample_count = 0
+
+    @property
+    def channel_count(self):
+        return self.samples.shape[1]
+
+    @staticmethod
+    def get_row_bytes(channel_count):
+        return 4 * channel_count + 8
+
+    def get_allocated_bytes(self):
+        return self.samples.nbytes + self.sample_frames.nbytes
+
+    def __ring_slices(self, count):
+        """yields (ring slice, source slice) pairs for the next count rows"""
+        start = self.write_index
+        first = min(count, self.capacity - start)
+        yield slice(start, start + first), slice(0, first)
+        if first < count:
+            yield slice(0, count - first), slice(first, count)
+
+    def write(self, frame_number, channels):
+        """appends one frame worth of samples, channels is a list of 1-D arrays.
+
+        Returns the number of samples that did not fit and were dropped.
+        """
+        frame_sample_count = max((len(channel) for channel in channels), default=0)
+        if frame_sample_count == 0:
+            return 0
+
+        # keep only the newest samples of an oversized frame
+        skip = max(frame_sample_count - self.capacity, 0)
+        count = frame_sample_count - skip
+
+        sample_frames = frame_number + (
+            np.arange(skip, frame_sample_count, dtype=np.float64) / frame_sample_count
+        )
+        for ring_slice, source_slice in self.__ring_slices(count):
+            self.sample_frames[ring_slice] = sample_frames[source_slice]
+            self.samples[ring_slice] = np.nan
+        for channel_index, channel in enumerate(channels[: self.channel_count]):
+            channel = channel[skip:]
+            for ring_slice, source_slice in self.__ring_slices(len(channel)):
+                self.samples[ring_slice, channel_index] = channel[source_slice]
+
+        self.write_index = (self.write_index + count) % self.capacity
+        self.sample_count = min(self.sample_count + count, self.capacity)
+        return skip
+
+    def get_samples(self):
+        """returns copies of (sample_frames, samples), oldest sample first"""
+        if self.sample_count < self.capacity:
+            rows = slice(0, self.sample_count)
+            return self.sample_frames[rows].copy(), self.samples[rows].copy()
+        order = np.roll(np.arange(self.capacity), -self.write_index)
+        return self.sample_frames[order], self.samples[order]
+
+    def clear(self):
+        self.samples.fill(np.nan)
+        self.write_index = 0
+        self.sample_count = 0
+
+
+class AnalogBuffers:
+    """per-device analog ring buffers sharing a fixed memory cap"""
+
+    def __init__(self, capacity=8192, max_bytes=32 * 1024 * 1024):
+        # samples kept per device, lowered when max_bytes would be exceeded
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.buffers = {}
+        self.dropped_sample_count = 0
+        # the data thread writes while Blender's main thread exports
+        self.lock = Lock()
+
+    def get_allocated_bytes(self):
+        return sum(buffer.get_allocated_bytes() for buffer in self.buffers.values())
+
+    def __get_buffer(self, device_id, channel_count):
+        buffer = self.buffers.get(device_id)
+        if buffer is not None and buffer.channel_count == channel_count:
+            return buffer
+
+        # a device whose channel count changed is reallocated
+        if buffer is not None:
+            del self.buffers[device_id]
+        free_bytes = self.max_bytes - self.get_allocated_bytes()
+        capacity = min(
+            self.capacity,
+            free_bytes // AnalogRingBuffer.get_row_bytes(channel_count),
+        )
+        if capacity <= 0:
+            return None
+        buffer = AnalogRingBuffer(device_id, channel_count, capacity)
+        self.buffers[device_id] = buffer
+        return buffer
+
+    def write(self, device_id, frame_number, channels):
+        """appends one frame of channel arrays for device_id"""
+        with self.lock:
+            buffer = self.__get_buffer(device_id, len(channels))
+            if buffer is None:
+                self.dropped_sample_count += max(
+                    (len(channel) for channel in channels), default=0
+                )
+                return
+            self.dropped_sample_count += buffer.write(frame_number, channels)
+
+    def get_samples(self):
+        """returns {device_id: (sample_frames, samples)} copies of every ring"""
+        with self.lock:
+            return {
+                device_id: buffer.get_samples()
+                for device_id, buffer in self.buffers.items()
+            }
+
+    def clear(self):
+        with self.lock:
+            self.buffers = {}
+            self.dropped_sample_count = 0
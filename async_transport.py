@@ -0,0 +1,184 @@
+# asyncio transport for NatNetClient.
+#
+# AsyncTransport serves the command and data sockets from one event loop on a
+# single background thread, instead of one blocking thread per socket. The
+# sockets are read with NatNetClient.receive_packets() from loop readers, so
+# the receive buffer pool, frame skipping and drop detection are the same as
+# with the threads. Requests are coroutines resolved by the server's reply,
+# and shutdown() cancels them and stops the loop without waiting on a socket
+# timeout.
+#
+# A SelectorEventLoop is used on every platform, the Windows default
+# ProactorEventLoop has no add_reader().
+#
+# This module must not import bpy or mathutils.
+
+import asyncio
+import threading
+from collections import deque
+
+from .capture import COMMAND_CHANNEL, DATA_CHANNEL
+
+# seconds between unicast keep alives
+KEEP_ALIVE_INTERVAL = 1.0
+
+
+class AsyncTransport:
+    def __init__(self, client):
+        self.client = client
+        self.loop = None
+        self.thread = None
+        self.command_socket = None
+        self.data_socket = None
+        # (reply message ids, future) of requests in the order they were sent
+        self.__pending = deque()
+        self.__keep_alive_task = None
+
+    def start(self, command_socket, data_socket):
+        """starts the event loop thread, returns once both sockets are read"""
+        self.command_socket = command_socket
+        self.data_socket = data_socket
+        command_socket.setblocking(False)
+        # None when a frame_worker.FrameWorker receives the frames
+        if data_socket is not None:
+            data_socket.setblocking(False)
+        self.loop = asyncio.SelectorEventLoop()
+        started = threading.Event()
+        self.thread = threading.Thread(
+            target=self.__run_loop, args=(started,), daemon=True
+        )
+        self.thread.start()
+        started.wait()
+
+    def __run_loop(self, started):
+        loop = self.loop
+        client = self.client
+        asyncio.set_event_loop(loop)
+        client.response_listener = self.__on_response
+        loop.add_reader(
+            self.command_socket,
+            client.receive_packets,
+            self.command_socket,
+            COMMAND_CHANNEL,
+        )
+        if self.data_socket is not None:
+            loop.add_reader(
+                self.data_socket, client.receive_packets, self.data_socket, DATA_CHANNEL
+            )
+        if not client.use_multicast:
+            self.__keep_alive_task = loop.create_task(self.__keep_alive())
+        loop.call_soon(started.set)
+        try:
+            loop.run_forever()
+            # let the tasks cancelled by __stop() finish
+            tasks = asyncio.all_tasks(loop)
+            if tasks:
+                loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        finally:
+            client.response_listener = None
+            loop.close()
+
+    async def __keep_alive(self):
+        client = self.client
+        address = (client.server_ip_address, client.command_port)
+        while True:
+            client.send_request(self.command_socket, client.NAT_KEEPALIVE, "", address)
+            await asyncio.sleep(KEEP_ALIVE_INTERVAL)
+
+    def __on_response(self, message_id, data):
+        client = self.client
+        for pending in self.__pending:
+            reply_ids, future = pending
+            if future.done():
+                continue
+            if message_id == client.NAT_UNRECOGNIZED_REQUEST:
+                future.set_result(-1)
+            elif message_id not in reply_ids:
+                continue
+            elif message_id == client.NAT_RESPONSE:
+                future.set_result(get_response_value(data))
+            elif message_id == client.NAT_MODELDEF:
+                future.set_result(client.desc_dict)
+            else:
+                future.set_result(client.get_nat_net_requested_version())
+            self.__pending.remove(pending)
+            return
+
+    async def request(self, message_id, command_str="", reply_ids=(), timeout=1.0):
+        """sends a request and returns the value of its reply, -1 on timeout"""
+        client = self.client
+        future = self.loop.create_future()
+        pending = (reply_ids, future)
+        self.__pending.append(pending)
+        try:
+            client.send_request(
+                self.command_socket,
+                message_id,
+                command_str,
+                (client.server_ip_address, client.command_port),
+            )
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return -1
+        finally:
+            if pending in self.__pending:
+                self.__pending.remove(pending)
+
+    async def connect(self, timeout=1.0):
+        """returns the NatNet version from the server's NAT_SERVERINFO"""
+        client = self.client
+        return await self.request(
+            client.NAT_CONNECT, "", (client.NAT_SERVERINFO,), timeout
+        )
+
+    async def send_command(self, command_str, timeout=1.0):
+        """returns the response code, or the response string of e.g. Bitstream"""
+        client = self.client
+        return await self.request(
+            client.NAT_REQUEST, command_str, (client.NAT_RESPONSE,), timeout
+        )
+
+    async def send_commands(self, command_strs, timeout=1.0):
+        return [
+            await self.send_command(command_str, timeout)
+            for command_str in command_strs
+        ]
+
+    async def request_modeldef(self, timeout=2.0):
+        """returns the client's desc_dict once NAT_MODELDEF has been processed"""
+        client = self.client
+        return await self.request(
+            client.NAT_REQUEST_MODELDEF, "", (client.NAT_MODELDEF,), timeout
+        )
+
+    def run_coroutine(self, coroutine):
+        """schedules coroutine from another thread, returns a concurrent Future"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def __stop(self):
+        for _, future in self.__pending:
+            future.cancel()
+        self.__pending.clear()
+        # the keep alive and commands awaited through run_coroutine()
+        for task in asyncio.all_tasks(self.loop):
+            task.cancel()
+        self.__keep_alive_task = None
+        self.loop.remove_reader(self.command_socket)
+        if self.data_socket is not None:
+            self.loop.remove_reader(self.data_socket)
+        self.loop.stop()
+
+    def shutdown(self):
+        if self.thread is None:
+            return
+        self.loop.call_soon_threadsafe(self.__stop)
+        self.thread.join()
+        self.thread = None
+
+
+def get_response_value(data):
+    """returns the int code or the string of a NAT_RESPONSE packet"""
+    packet_size = int.from_bytes(data[2:4], byteorder="little", signed=True)
+    if packet_size == 4:
+        return int.from_bytes(data[4:8], byteorder="little", signed=True)
+    return bytes(data[4:]).partition(b"\0")[0].decode("utf-8")
@@ -0,0 +1,328 @@
+# Raw NatNet packet capture and replay.
+#
+# CaptureWriter appends every datagram NatNetClient receives, with its receive
+# time and the socket it arrived on, to an append-only file. Each record is a
+# single unbuffered write, so a capture is readable up to the last packet even
+# when Blender crashes mid-take. PacketReplay feeds a capture back through
+# NatNetClient.feed_packet() in real time, scaled time, as fast as possible or
+# one frame at a time, and seeks to any frame number or receive time.
+#
+# File layout:
+#   header  magic, format version, NatNet major/minor at capture start,
+#           wall clock start time
+#   records receive time (seconds since capture start), channel, length, bytes
+#   index   one INDEX_DTYPE entry per record, written by CaptureWriter.close()
+#   trailer index offset, record count, INDEX_MAGIC
+#
+# CaptureReader maps the file with mmap and views the index in place, so
+# opening a multi-hour capture reads neither the packets nor the index into
+# memory, and packets are handed to the decoder as memoryviews into the map.
+# A capture without an index (format 1, or not closed) is indexed by scanning
+# the records once.
+#
+# This module must not import bpy or mathutils.
+
+import mmap
+import struct
+import threading
+import time
+
+import numpy as np
+
+CAPTURE_MAGIC = b"NATNETCP"
+CAPTURE_FORMAT_VERSION = 2
+INDEX_MAGIC = b"NATNETIX"
+
+# channel a packet was received on
+DATA_CHANNEL = 0
+COMMAND_CHANNEL = 1
+
+NAT_MODELDEF = 5
+NAT_FRAMEOFDATA = 7
+
+# magic, format version, NatNet major, NatNet minor, wall clock start time
+CaptureHeader = struct.Struct("<8sBBBxd")
+# receive time, channel, packet length
+RecordHeader = struct.Struct("<dBI")
+# record offset, receive time, frame number (-1 for other messages),
+# message id, channel
+IndexEntry = struct.Struct("<QdihBx")
+# index offset, record count, magic
+IndexTrailer = struct.Struct("<QQ8s")
+
+INDEX_DTYPE = np.dtype(
+    [
+        ("offset", "<u8"),
+        ("receive_time", "<f8"),
+        ("frame_number", "<i4"),
+        ("message_id", "<i2"),
+        ("channel", "u1"),
+        ("pad", "u1"),
+    ]
+)
+
+
+def get_message_id(packet):
+    return int.from_bytes(packet[0:2], byteorder="little", signed=True)
+
+
+def get_frame_number(packet):
+    """returns the frame number of a NAT_FRAMEOFDATA packet, -1 for others"""
+    if get_message_id(packet) != NAT_FRAMEOFDATA or len(packet) < 8:
+        return -1
+    return int.from_bytes(packet[4:8], byteorder="little", signed=True)
+
+
+class CaptureWriter:
+    def __init__(self, path, major=0, minor=0):
+        self.path = path
+        self.packet_count = 0
+        self.start_time = time.perf_counter()
+        # both client threads write, records must not interleave
+        self.lock = threading.Lock()
+        self.__file = open(path, "wb", buffering=0)
+        self.__file.write(
+            CaptureHeader.pack(
+                CAPTURE_MAGIC, CAPTURE_FORMAT_VERSION, major, minor, time.time()
+            )
+        )
+        self.__offset = CaptureHeader.size
+        # packed IndexEntry records, written as the footer on close
+        self.__index = bytearray()
+
+    def write(self, channel, packet):
+        receive_time = time.perf_counter() - self.start_time
+        record = RecordHeader.pack(receive_time, channel, len(packet)) + packet
+        frame_number = get_frame_number(packet)
+        message_id = get_message_id(packet)
+        with self.lock:
+            if self.__file is None:
+                return
+            self.__file.write(record)
+            self.__index += IndexEntry.pack(
+                self.__offset, receive_time, frame_number, message_id, channel
+            )
+            self.__offset += len(record)
+            self.packet_count += 1
+
+    def close(self):
+        """writes the index footer and closes the file"""
+        with self.lock:
+            if self.__file is None:
+                return
+            self.__file.write(
+                self.__index
+                + IndexTrailer.pack(self.__offset, self.packet_count, INDEX_MAGIC)
+            )
+            self.__file.close()
+            self.__file = None
+            self.__index = bytearray()
+
+
+class CaptureReader:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            header = file.read(CaptureHeader.size)
+            if len(header) < CaptureHeader.size:
+                raise ValueError("%s is not a NatNet capture" % path)
+            magic, format_version, major, minor, start_wall_time = CaptureHeader.unpack(
+                header
+            )
+            if magic != CAPTURE_MAGIC:
+                raise ValueError("%s is not a NatNet capture" % path)
+            if format_version > CAPTURE_FORMAT_VERSION:
+                raise ValueError(
+                    "%s has unsupported capture format %d" % (path, format_version)
+                )
+            self.__mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.major = major
+        self.minor = minor
+        self.start_wall_time = start_wall_time
+
+        self.index = self.__read_index()
+        if self.index is None:
+            self.index = self.__scan_index()
+        # frame records sorted by frame number, built on the first find_frame()
+        self.__frame_order = None
+        self.__modeldef_records = np.flatnonzero(
+            self.index["message_id"] == NAT_MODELDEF
+        )
+
+    def __len__(self):
+        return len(self.index)
+
+    def __read_index(self):
+        """returns a view of the index footer, None when there is none"""
+        size = len(self.__mmap)
+        if size < CaptureHeader.size + IndexTrailer.size:
+            return None
+        index_offset, record_count, magic = IndexTrailer.unpack_from(
+            self.__mmap, size - IndexTrailer.size
+        )
+        if magic != INDEX_MAGIC:
+            return None
+        if index_offset + record_count * IndexEntry.size + IndexTrailer.size != size:
+            return None
+        return np.frombuffer(
+            self.__mmap, dtype=INDEX_DTYPE, count=record_count, offset=index_offset
+        )
+
+    def __scan_index(self):
+        """indexes the records, a truncated last record ends the capture"""
+        data = self.__mmap
+        size = len(data)
+        offset = CaptureHeader.size
+        entries = []
+        while offset + RecordHeader.size <= size:
+            receive_time, channel, length = RecordHeader.unpack_from(data, offset)
+            packet_offset = offset + RecordHeader.size
+            if packet_offset + length > size:
+                break
+            packet = data[packet_offset : packet_offset + 8]
+            entries.append(
+                (
+                    offset,
+                    receive_time,
+                    get_frame_number(packet),
+                    get_message_id(packet),
+                    channel,
+                    0,
+                )
+            )
+            offset = packet_offset + length
+        return np.array(entries, dtype=INDEX_DTYPE)
+
+    def get_record(self, record_index):
+        """returns (receive time, channel, packet), the packet is a memoryview"""
+        offset = int(self.index["offset"][record_index])
+        receive_time, channel, length = RecordHeader.unpack_from(self.__mmap, offset)
+        offset += RecordHeader.size
+        return receive_time, channel, memoryview(self.__mmap)[offset : offset + length]
+
+    def __iter__(self):
+        for record_index in range(len(self.index)):
+            yield self.get_record(record_index)
+
+    def get_frame_count(self):
+        return int(np.count_nonzero(self.index["message_id"] == NAT_FRAMEOFDATA))
+
+    def find_frame(self, frame_number):
+        """returns the first record of frame_number or the next higher frame, in O(log n)"""
+        if self.__frame_order is None:
+            frame_records = np.flatnonzero(self.index["message_id"] == NAT_FRAMEOFDATA)
+            frame_numbers = self.index["frame_number"][frame_records]
+            # frame numbers restart when Motive loops or restarts playback
+            order = np.argsort(frame_numbers, kind="stable")
+            self.__frame_order = (frame_records[order], frame_numbers[order])
+        frame_records, frame_numbers = self.__frame_order
+        position = np.searchsorted(frame_numbers, frame_number, side="left")
+        if position == len(frame_records):
+            return len(self.index)
+        return int(frame_records[position])
+
+    def find_time(self, receive_time):
+        """returns the first record received at receive_time or later, in O(log n)"""
+        return int(
+            np.searchsorted(self.index["receive_time"], receive_time, side="left")
+        )
+
+    def find_modeldef(self, record_index):
+        """returns the last NAT_MODELDEF record before record_index, None if none"""
+        position = np.searchsorted(self.__modeldef_records, record_index, side="left")
+        if position == 0:
+            return None
+        return int(self.__modeldef_records[position - 1])
+
+    def close(self):
+        # views of the map have to be released before it can be closed
+        self.index = None
+        self.__frame_order = None
+        self.__mmap.close()
+
+
+class PacketReplay:
+    def __init__(self, path, client):
+        self.reader = CaptureReader(path)
+        self.client = client
+        # index of the next record to feed
+        self.position = 0
+        self.thread = None
+        self.stop_replay = False
+        self.fed_packet_count = 0
+
+        # captures started after NAT_SERVERINFO carry the version in the header
+        if client.get_major() == 0 and self.reader.major != 0:
+            client.set_nat_net_requested_version(self.reader.major, self.reader.minor)
+
+    def rewind(self):
+        self.position = 0
+
+    def seek(self, record_index):
+        """continues at record_index with the data descriptions in effect there"""
+        self.position = max(0, min(record_index, len(self.reader)))
+        modeldef_index = self.reader.find_modeldef(self.position)
+        if modeldef_index is not None:
+            # an unchanged NAT_MODELDEF is only hashed, not parsed again
+            self.client.feed_packet(self.reader.get_record(modeldef_index)[2])
+        return self.position
+
+    def seek_frame(self, frame_number):
+        return self.seek(self.reader.find_frame(frame_number))
+
+    def seek_time(self, receive_time):
+        return self.seek(self.reader.find_time(receive_time))
+
+    def __next_record(self):
+        if self.position >= len(self.reader):
+            return None
+        record = self.reader.get_record(self.position)
+        self.position += 1
+        return record
+
+    def step(self):
+        """feeds packets up to and including the next frame, False at the end"""
+        while True:
+            record = self.__next_record()
+            if record is None:
+                return False
+            packet = record[2]
+            self.client.feed_packet(packet)
+            self.fed_packet_count += 1
+            if get_message_id(packet) == NAT_FRAMEOFDATA:
+                return True
+
+    def play(self, speed=1.0):
+        """feeds every packet at speed times the captured rate, None for no waits"""
+        start_time = time.perf_counter()
+        first_receive_time = None
+        while not self.stop_replay:
+            record = self.__next_record()
+            if record is None:
+                return
+            receive_time, channel, packet = record
+            if speed is not None:
+                if first_receive_time is None:
+                    first_receive_time = receive_time
+                due_time = start_time + (receive_time - first_receive_time) / speed
+                delay = due_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self.client.feed_packet(packet)
+            self.fed_packet_count += 1
+
+    def start(self, speed=1.0):
+        """plays the capture on a background thread"""
+        self.stop_replay = False
+        self.thread = threading.Thread(target=self.play, args=(speed,), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_replay = True
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def close(self):
+        self.stop()
+        self.reader.close()
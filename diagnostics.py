@@ -0,0 +1,170 @@
+# Frame diagnostics for NatNetClient.
+#
+# Frame dumps are only built when at least one sink is attached. With no sinks
+# the data thread pays a single truthiness check per frame.
+
+from collections import deque
+
+from .MoCapData import get_tab_str
+
+
+class ConsoleSink:
+    def write(self, text):
+        print(text)
+
+    def close(self):
+        pass
+
+
+class FileSink:
+    def __init__(self, path):
+        self.path = path
+        self.__file = None
+
+    def write(self, text):
+        if self.__file is None:
+            self.__file = open(self.path, "a", encoding="utf-8")
+        self.__file.write(text)
+        self.__file.write("\n")
+        self.__file.flush()
+
+    def close(self):
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+
+class RingBufferSink:
+    def __init__(self, capacity=256):
+        self.dumps = deque(maxlen=capacity)
+
+    def write(self, text):
+        self.dumps.append(text)
+
+    def get_dumps(self):
+        return list(self.dumps)
+
+    def close(self):
+        pass
+
+
+def format_frame(frame, asset_ids=None, tab_str="  ", level=0):
+    """returns a MoCapData style dump of a frame.Frame"""
+    out_tab_str = get_tab_str(tab_str, level)
+    out_tab_str2 = get_tab_str(tab_str, level + 1)
+    out_tab_str3 = get_tab_str(tab_str, level + 2)
+
+    out_str = "%sMoCap Frame Begin\n%s-----------------\n" % (
+        out_tab_str,
+        out_tab_str,
+    )
+    out_str += "%sFrame #: %3.1d\n" % (out_tab_str, frame.frame_number)
+
+    rb_data = frame.rigid_bodies.to_rb_data()
+    rb_ids = [rb_id for rb_id in rb_data if asset_ids is None or rb_id in asset_ids]
+    out_str += "%sRigid Body Count: %3.1d\n" % (out_tab_str2, len(rb_ids))
+    for rb_id in rb_ids:
+        pos = rb_data[rb_id]["pos"]
+        rot = rb_data[rb_id]["rot"]
+        out_str += "%sID: %3.1d Position: [%3.2f, %3.2f, %3.2f]" % (
+            out_tab_str3,
+            rb_id,
+            pos[0],
+            pos[1],
+            pos[2],
+        )
+        out_str += " Orientation: [%3.2f, %3.2f, %3.2f, %3.2f]\n" % (
+            rot[0],
+            rot[1],
+            rot[2],
+            rot[3],
+        )
+
+    ske_ids = [
+        ske_id for ske_id in frame.skeletons if asset_ids is None or ske_id in asset_ids
+    ]
+    out_str += "%sSkeleton Count: %3.1d\n" % (out_tab_str2, len(ske_ids))
+    for ske_id in ske_ids:
+        bones = frame.skeletons[ske_id].to_bone_data()
+        out_str += "%sSkeleton ID: %3.1d Bone Count: %3.1d\n" % (
+            out_tab_str3,
+            ske_id,
+            len(bones),
+        )
+        for bone_id, bone in bones.items():
+            pos = bone["pos"]
+            rot = bone["rot"]
+            out_str += "%s%sID: %3.1d Position: [%3.2f, %3.2f, %3.2f]" % (
+                out_tab_str3,
+                tab_str,
+                bone_id,
+                pos[0],
+                pos[1],
+                pos[2],
+            )
+            out_str += " Orientation: [%3.2f, %3.2f, %3.2f, %3.2f]\n" % (
+                rot[0],
+                rot[1],
+                rot[2],
+                rot[3],
+            )
+
+    out_str += "%sEdit Mode: %s\n" % (out_tab_str2, frame.edit_mode)
+    out_str += "%sMoCap Frame End\n%s-----------------\n" % (
+        out_tab_str,
+        out_tab_str,
+    )
+    return out_str
+
+
+class FrameDiagnostics:
+    def __init__(self):
+        self.sinks = []
+        # dump every Nth frame
+        self.sample_every = 1
+        # only dump these rigid body / skeleton IDs, None dumps all assets
+        self.asset_ids = None
+        self.__frame_count = 0
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+        return sink
+
+    def remove_sink(self, sink):
+        if sink in self.sinks:
+            self.sinks.remove(sink)
+            sink.close()
+
+    def clear_sinks(self):
+        for sink in self.sinks:
+            sink.close()
+        self.sinks = []
+
+    def set_sample_every(self, sample_every=1):
+        if sample_every >= 1:
+            self.sample_every = sample_every
+        return self.sample_every
+
+    def set_asset_filter(self, asset_ids=None):
+        self.asset_ids = None if asset_ids is None else set(asset_ids)
+
+    def is_enabled(self):
+        return bool(self.sinks)
+
+    def dump_frame(self, frame, mocap_data=None):
+        """builds the frame dump and writes it to every sink, honoring sampling.
+
+        mocap_data is the legacy MoCapData frame, when available it is used
+        for unfiltered dumps since it also carries markers and suffix data.
+        """
+        self.__frame_count += 1
+        if (self.__frame_count % self.sample_every) != 0:
+            return
+
+        if mocap_data is not None and self.asset_ids is None:
+            out_str = mocap_data.get_as_string()
+        else:
+            out_str = format_frame(frame, self.asset_ids)
+
+        for sink in tuple(self.sinks):
+            sink.write(out_str)
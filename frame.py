@@ -0,0 +1,525 @@
+# Frame containers filled by frame_decoder.FrameDecoder.
+#
+# RigidBodyArrays and SkeletonArrays hold one section as struct-of-arrays.
+# Frame bundles them with the frame prefix/suffix data, and FramePool recycles
+# Frame objects so that, once the buffers have grown to the stream's asset
+# counts, decoding a frame allocates close to nothing.
+#
+# This module must not import bpy or mathutils.
+
+from collections import deque
+
+import numpy as np
+
+
+def reserve(buffer, count, dtype, width=None):
+    """returns buffer if it holds count rows, else a larger zeroed replacement"""
+    if buffer is not None and len(buffer) >= count:
+        return buffer
+    capacity = max(count, 16) if buffer is None else max(count, 2 * len(buffer))
+    shape = capacity if width is None else (capacity, width)
+    return np.zeros(shape, dtype=dtype)
+
+
+class RigidBodyArrays:
+    """struct-of-arrays view of the rigid body section of one frame"""
+
+    __slots__ = (
+        "ids",
+        "positions",
+        "rotations",
+        "errors",
+        "valid",
+        "__rows",
+        "__rows_key",
+        "__id_buffer",
+        "__position_buffer",
+        "__rotation_buffer",
+        "__error_buffer",
+        "__valid_buffer",
+        "__param_buffer",
+    )
+
+    def __init__(self, ids, positions, rotations, errors, valid):
+        self.ids = ids  # (N,) int32
+        self.positions = positions  # (N, 3) float32
+        self.rotations = rotations  # (N, 4) float32, qx qy qz qw
+        self.errors = errors  # (N,) float32
+        self.valid = valid  # (N,) bool
+        self.__rows = None
+        self.__rows_key = None
+        self.__id_buffer = None
+        self.__position_buffer = None
+        self.__rotation_buffer = None
+        self.__error_buffer = None
+        self.__valid_buffer = None
+        self.__param_buffer = None
+
+    @classmethod
+    def from_records(cls, records):
+        return cls(
+            ids=records["id"].copy(),
+            positions=records["pos"].copy(),
+            rotations=records["rot"].copy(),
+            errors=records["error"].copy(),
+            valid=(records["params"] & 0x01) != 0,
+        )
+
+    @classmethod
+    def empty(cls):
+        return cls(
+            ids=np.zeros(0, dtype=np.int32),
+            positions=np.zeros((0, 3), dtype=np.float32),
+            rotations=np.zeros((0, 4), dtype=np.float32),
+            errors=np.zeros(0, dtype=np.float32),
+            valid=np.zeros(0, dtype=bool),
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __resize(self, count):
+        if self.__id_buffer is None or len(self.__id_buffer) < count:
+            self.__id_buffer = reserve(self.__id_buffer, count, np.int32)
+            self.__position_buffer = reserve(
+                self.__position_buffer, count, np.float32, 3
+            )
+            self.__rotation_buffer = reserve(
+                self.__rotation_buffer, count, np.float32, 4
+            )
+            self.__error_buffer = reserve(self.__error_buffer, count, np.float32)
+            self.__valid_buffer = reserve(self.__valid_buffer, count, bool)
+            self.__param_buffer = reserve(self.__param_buffer, count, np.int16)
+        if len(self.ids) != count or self.ids.base is not self.__id_buffer:
+            self.ids = self.__id_buffer[:count]
+            self.positions = self.__position_buffer[:count]
+            self.rotations = self.__rotation_buffer[:count]
+            self.errors = self.__error_buffer[:count]
+            self.valid = self.__valid_buffer[:count]
+
+    def clear(self):
+        self.__resize(0)
+
+    def assign(self, ids, positions, rotations, errors, valid):
+        """copies a rigid body section into buffers reused across frames"""
+        self.__resize(len(ids))
+        np.copyto(self.ids, ids)
+        np.copyto(self.positions, positions)
+        np.copyto(self.rotations, rotations)
+        np.copyto(self.errors, errors)
+        np.copyto(self.valid, valid)
+
+    def assign_records(self, records):
+        """assign() from a RigidBodyRecord array without temporaries"""
+        count = len(records)
+        self.__resize(count)
+        np.copyto(self.ids, records["id"])
+        np.copyto(self.positions, records["pos"])
+        np.copyto(self.rotations, records["rot"])
+        np.copyto(self.errors, records["error"])
+        params = self.__param_buffer[:count]
+        np.bitwise_and(records["params"], 0x01, out=params)
+        np.not_equal(params, 0, out=self.valid)
+
+    def get_row(self, rb_id):
+        """returns the row of rb_id, or None if it is not in this frame"""
+        # the ids of a reused object change between frames, the lookup is
+        # only rebuilt when they do
+        rows_key = self.ids.tobytes()
+        if self.__rows is None or self.__rows_key != rows_key:
+            self.__rows = {rb_id: row for row, rb_id in enumerate(self.ids.tolist())}
+            self.__rows_key = rows_key
+        return self.__rows.get(rb_id)
+
+    def to_rb_data(self):
+        """returns the legacy {id: {"pos": ..., "rot": ...}} layout"""
+        return {
+            rb_id: {"pos": tuple(pos), "rot": tuple(rot)}
+            for rb_id, pos, rot in zip(
+                self.ids.tolist(), self.positions.tolist(), self.rotations.tolist()
+            )
+        }
+
+    def copy(self):
+        return RigidBodyArrays(
+            ids=self.ids.copy(),
+            positions=self.positions.copy(),
+            rotations=self.rotations.copy(),
+            errors=self.errors.copy(),
+            valid=self.valid.copy(),
+        )
+
+
+class SkeletonArrays:
+    """contiguous bone arrays of one skeleton in one frame, in wire order"""
+
+    __slots__ = (
+        "bone_ids",
+        "positions",
+        "rotations",
+        "valid",
+        "__id_buffer",
+        "__position_buffer",
+        "__rotation_buffer",
+        "__valid_buffer",
+        "__param_buffer",
+    )
+
+    def __init__(self, bone_ids, positions, rotations, valid):
+        self.bone_ids = bone_ids  # (B,) int32
+        self.positions = positions  # (B, 3) float32
+        self.rotations = rotations  # (B, 4) float32, qx qy qz qw
+        self.valid = valid  # (B,) bool
+        self.__id_buffer = None
+        self.__position_buffer = None
+        self.__rotation_buffer = None
+        self.__valid_buffer = None
+        self.__param_buffer = None
+
+    @classmethod
+    def from_records(cls, records):
+        return cls(
+            bone_ids=records["id"].copy(),
+            positions=records["pos"].copy(),
+            rotations=records["rot"].copy(),
+            valid=(records["params"] & 0x01) != 0,
+        )
+
+    @classmethod
+    def empty(cls):
+        return cls(
+            bone_ids=np.zeros(0, dtype=np.int32),
+            positions=np.zeros((0, 3), dtype=np.float32),
+            rotations=np.zeros((0, 4), dtype=np.float32),
+            valid=np.zeros(0, dtype=bool),
+        )
+
+    def __len__(self):
+        return len(self.bone_ids)
+
+    def __resize(self, count):
+        if self.__id_buffer is None or len(self.__id_buffer) < count:
+            self.__id_buffer = reserve(self.__id_buffer, count, np.int32)
+            self.__position_buffer = reserve(
+                self.__position_buffer, count, np.float32, 3
+            )
+            self.__rotation_buffer = reserve(
+                self.__rotation_buffer, count, np.float32, 4
+            )
+            self.__valid_buffer = reserve(self.__valid_buffer, count, bool)
+            self.__param_buffer = reserve(self.__param_buffer, count, np.int16)
+        if len(self.bone_ids) != count or self.bone_ids.base is not self.__id_buffer:
+            self.bone_ids = self.__id_buffer[:count]
+            self.positions = self.__position_buffer[:count]
+            self.rotations = self.__rotation_buffer[:count]
+            self.valid = self.__valid_buffer[:count]
+
+    def assign(self, bone_ids, positions, rotations, valid):
+        """copies one skeleton into buffers reused across frames"""
+        self.__resize(len(bone_ids))
+        np.copyto(self.bone_ids, bone_ids)
+        np.copyto(self.positions, positions)
+        np.copyto(self.rotations, rotations)
+        np.copyto(self.valid, valid)
+
+    def assign_records(self, records):
+        """assign() from a RigidBodyRecord array without temporaries"""
+        count = len(records)
+        self.__resize(count)
+        np.copyto(self.bone_ids, records["id"])
+        np.copyto(self.positions, records["pos"])
+        np.copyto(self.rotations, records["rot"])
+        params = self.__param_buffer[:count]
+        np.bitwise_and(records["params"], 0x01, out=params)
+        np.not_equal(params, 0, out=self.valid)
+
+    def to_bone_data(self):
+        """returns the legacy {bone_id: {"pos": ..., "rot": ...}} layout"""
+        return {
+            bone_id: {"pos": tuple(pos), "rot": tuple(rot)}
+            for bone_id, pos, rot in zip(
+                self.bone_ids.tolist(),
+                self.positions.tolist(),
+                self.rotations.tolist(),
+            )
+        }
+
+    def copy(self):
+        return SkeletonArrays(
+            bone_ids=self.bone_ids.copy(),
+            positions=self.positions.copy(),
+            rotations=self.rotations.copy(),
+            valid=self.valid.copy(),
+        )
+
+
+class MarkerArrays:
+    """struct-of-arrays marker cloud of one frame"""
+
+    __slots__ = (
+        "ids",
+        "positions",
+        "sizes",
+        "residuals",
+        "params",
+        "__id_buffer",
+        "__position_buffer",
+        "__size_buffer",
+        "__residual_buffer",
+        "__param_buffer",
+    )
+
+    def __init__(self):
+        self.ids = np.zeros(0, dtype=np.int32)  # (N,) int32, model ID << 16 | marker ID
+        self.positions = np.zeros((0, 3), dtype=np.float32)  # (N, 3) float32
+        self.sizes = np.zeros(0, dtype=np.float32)  # (N,) float32
+        self.residuals = np.zeros(0, dtype=np.float32)  # (N,) float32
+        self.params = np.zeros(0, dtype=np.int16)  # (N,) int16, occluded etc.
+        self.__id_buffer = None
+        self.__position_buffer = None
+        self.__size_buffer = None
+        self.__residual_buffer = None
+        self.__param_buffer = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __resize(self, count):
+        if self.__id_buffer is None or len(self.__id_buffer) < count:
+            self.__id_buffer = reserve(self.__id_buffer, count, np.int32)
+            self.__position_buffer = reserve(
+                self.__position_buffer, count, np.float32, 3
+            )
+            self.__size_buffer = reserve(self.__size_buffer, count, np.float32)
+            self.__residual_buffer = reserve(self.__residual_buffer, count, np.float32)
+            self.__param_buffer = reserve(self.__param_buffer, count, np.int16)
+        if len(self.ids) != count or self.ids.base is not self.__id_buffer:
+            self.ids = self.__id_buffer[:count]
+            self.positions = self.__position_buffer[:count]
+            self.sizes = self.__size_buffer[:count]
+            self.residuals = self.__residual_buffer[:count]
+            self.params = self.__param_buffer[:count]
+
+    def clear(self):
+        self.__resize(0)
+
+    def assign_positions(self, positions):
+        """copies unlabeled marker positions, ids, sizes and residuals are zeroed"""
+        self.__resize(len(positions))
+        np.copyto(self.positions, positions)
+        self.ids.fill(0)
+        self.sizes.fill(0.0)
+        self.residuals.fill(0.0)
+        self.params.fill(0)
+
+    def assign_records(self, records):
+        """copies a labeled marker record array, fields missing from older bitstreams are zeroed"""
+        self.__resize(len(records))
+        names = records.dtype.names
+        np.copyto(self.ids, records["id"])
+        np.copyto(self.positions, records["pos"])
+        np.copyto(self.sizes, records["size"])
+        if "residual" in names:
+            np.copyto(self.residuals, records["residual"])
+        else:
+            self.residuals.fill(0.0)
+        if "params" in names:
+            np.copyto(self.params, records["params"])
+        else:
+            self.params.fill(0)
+
+    def copy(self):
+        marker_arrays = MarkerArrays()
+        marker_arrays.ids = self.ids.copy()
+        marker_arrays.positions = self.positions.copy()
+        marker_arrays.sizes = self.sizes.copy()
+        marker_arrays.residuals = self.residuals.copy()
+        marker_arrays.params = self.params.copy()
+        return marker_arrays
+
+
+class Frame:
+    """one decoded NAT_FRAMEOFDATA, the object NatNetClient hands data_listener.
+
+    frame_number            int
+    rigid_bodies            RigidBodyArrays: ids, positions, rotations
+                            (qx qy qz qw), errors and valid flags, one row per
+                            rigid body, get_row(rb_id) looks up a row
+    skeletons               dict of skeleton ID -> SkeletonArrays, one row
+                            per bone in wire order
+    labeled_markers         MarkerArrays, empty unless the labeled_markers
+                            section is subscribed
+    unlabeled_markers       MarkerArrays of the legacy marker section, empty
+                            unless the legacy_markers section is subscribed
+    timecode, timecode_sub  SMPTE timecode words
+    timestamp               seconds since Motive started, -1 if not sent
+    is_recording, tracked_models_changed, edit_mode
+                            frame suffix flags
+
+    Frames handed out by a FramePool are only valid until release(), use
+    copy() to keep one around. to_dict() and dict_listener() provide the old
+    frame_number/rb_data/ske_data dict layout.
+    """
+
+    __slots__ = (
+        "frame_number",
+        "rigid_bodies",
+        "skeletons",
+        "labeled_markers",
+        "unlabeled_markers",
+        "timecode",
+        "timecode_sub",
+        "timestamp",
+        "is_recording",
+        "tracked_models_changed",
+        "edit_mode",
+        "__pool",
+        "__skeleton_cache",
+    )
+
+    def __init__(self, pool=None):
+        self.frame_number = -1
+        self.rigid_bodies = RigidBodyArrays.empty()
+        # skeleton ID -> SkeletonArrays, in wire order
+        self.skeletons = {}
+        self.labeled_markers = MarkerArrays()
+        self.unlabeled_markers = MarkerArrays()
+        self.timecode = -1
+        self.timecode_sub = -1
+        self.timestamp = -1
+        self.is_recording = False
+        self.tracked_models_changed = False
+        self.edit_mode = False
+        self.__pool = pool
+        self.__skeleton_cache = {}
+
+    @classmethod
+    def from_dict(cls, data_dict):
+        """builds a frame from the frame_number/rb_data/ske_data dict layout"""
+        frame = cls()
+        frame.frame_number = data_dict["frame_number"]
+        rb_data = data_dict.get("rb_data", {})
+        rigid_body_count = len(rb_data)
+        frame.rigid_bodies.assign(
+            ids=np.fromiter(rb_data.keys(), dtype=np.int32, count=rigid_body_count),
+            positions=np.array(
+                [rb["pos"] for rb in rb_data.values()], dtype=np.float32
+            ).reshape(-1, 3),
+            rotations=np.array(
+                [rb["rot"] for rb in rb_data.values()], dtype=np.float32
+            ).reshape(-1, 4),
+            errors=0.0,
+            valid=True,
+        )
+        for skeleton_id, bones in data_dict.get("ske_data", {}).items():
+            bone_count = len(bones)
+            frame.add_skeleton(skeleton_id).assign(
+                bone_ids=np.fromiter(bones.keys(), dtype=np.int32, count=bone_count),
+                positions=np.array(
+                    [bone["pos"] for bone in bones.values()], dtype=np.float32
+                ).reshape(-1, 3),
+                rotations=np.array(
+                    [bone["rot"] for bone in bones.values()], dtype=np.float32
+                ).reshape(-1, 4),
+                valid=True,
+            )
+        for key in (
+            "timecode",
+            "timecode_sub",
+            "timestamp",
+            "is_recording",
+            "tracked_models_changed",
+            "edit_mode",
+        ):
+            if key in data_dict:
+                setattr(frame, key, data_dict[key])
+        return frame
+
+    def to_dict(self):
+        """returns the frame in the frame_number/rb_data/ske_data dict layout"""
+        return {
+            "frame_number": self.frame_number,
+            "rb_data": self.rigid_bodies.to_rb_data(),
+            "ske_data": {
+                skeleton_id: bone_arrays.to_bone_data()
+                for skeleton_id, bone_arrays in self.skeletons.items()
+            },
+            "timecode": self.timecode,
+            "timecode_sub": self.timecode_sub,
+            "timestamp": self.timestamp,
+            "is_recording": self.is_recording,
+            "tracked_models_changed": self.tracked_models_changed,
+            "edit_mode": self.edit_mode,
+        }
+
+    def clear_skeletons(self):
+        self.skeletons.clear()
+
+    def add_skeleton(self, skeleton_id):
+        """returns the reusable SkeletonArrays of skeleton_id for this frame"""
+        bone_arrays = self.__skeleton_cache.get(skeleton_id)
+        if bone_arrays is None:
+            bone_arrays = SkeletonArrays.empty()
+            self.__skeleton_cache[skeleton_id] = bone_arrays
+        self.skeletons[skeleton_id] = bone_arrays
+        return bone_arrays
+
+    def get_rigid_body_row(self, rb_id):
+        return self.rigid_bodies.get_row(rb_id)
+
+    def release(self):
+        """hands the frame back to its pool, it must not be used afterwards"""
+        if self.__pool is not None:
+            self.__pool.release(self)
+
+    def copy(self):
+        """returns an independent frame that does not belong to any pool"""
+        frame = Frame()
+        frame.frame_number = self.frame_number
+        frame.rigid_bodies = self.rigid_bodies.copy()
+        frame.skeletons = {
+            skeleton_id: bone_arrays.copy()
+            for skeleton_id, bone_arrays in self.skeletons.items()
+        }
+        frame.labeled_markers = self.labeled_markers.copy()
+        frame.unlabeled_markers = self.unlabeled_markers.copy()
+        frame.timecode = self.timecode
+        frame.timecode_sub = self.timecode_sub
+        frame.timestamp = self.timestamp
+        frame.is_recording = self.is_recording
+        frame.tracked_models_changed = self.tracked_models_changed
+        frame.edit_mode = self.edit_mode
+        return frame
+
+
+def dict_listener(listener):
+    """wraps a data_listener written for frame dicts so it accepts a Frame"""
+
+    def receive_frame(frame):
+        listener(frame.to_dict())
+
+    return receive_frame
+
+
+class FramePool:
+    """recycles Frame objects between packets"""
+
+    def __init__(self, size=4):
+        # frames kept for reuse, frames released beyond this are dropped
+        self.size = size
+        self.allocated_count = 0
+        self.__free = deque()
+
+    def acquire(self):
+        try:
+            return self.__free.pop()
+        except IndexError:
+            self.allocated_count += 1
+            return Frame(self)
+
+    def release(self, frame):
+        if len(self.__free) < self.size:
+            self.__free.append(frame)
+
+    def get_free_count(self):
+        return len(self.__free)
@@ -0,0 +1,511 @@
+# Copyright © 2018 Naturalpoint
+#
+# Licensed under the Apache License, Version 2.0 (the "License")
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Single-pass NAT_FRAMEOFDATA decoder.
+#
+# The nested NatNetClient.__unpack_* helpers hand every level a data[offset:]
+# sub-slice and return relative offsets. The decoder in this module walks the
+# packet buffer once, keeps one absolute offset and reads every field with
+# Struct.unpack_from, so no intermediate memoryviews are created.
+#
+# This module must not import bpy or mathutils.
+
+import struct
+
+import numpy as np
+
+from .frame import Frame
+
+Int16Value = struct.Struct("<h")
+Int32Value = struct.Struct("<i")
+Int64Value = struct.Struct("<q")
+FloatValue = struct.Struct("<f")
+DoubleValue = struct.Struct("<d")
+CountAndSize = struct.Struct("<ii")
+# ID, position (x, y, z), orientation (qx, qy, qz, qw)
+RigidBodyPose = struct.Struct("<i3f4f")
+Timecode = struct.Struct("<ii")
+# force plate / device ID, channel count
+ChannelDeviceHeader = struct.Struct("<ii")
+HiresTimestamps = struct.Struct("<qqq")
+PrecisionTimestamp = struct.Struct("<ii")
+
+# Frame sections in wire order, the names accepted by the subscription API
+MARKER_SETS = "marker_sets"
+LEGACY_MARKERS = "legacy_markers"
+RIGID_BODIES = "rigid_bodies"
+SKELETONS = "skeletons"
+ASSETS = "assets"
+LABELED_MARKERS = "labeled_markers"
+FORCE_PLATES = "force_plates"
+DEVICES = "devices"
+FRAME_SECTIONS = (
+    MARKER_SETS,
+    LEGACY_MARKERS,
+    RIGID_BODIES,
+    SKELETONS,
+    ASSETS,
+    LABELED_MARKERS,
+    FORCE_PLATES,
+    DEVICES,
+)
+
+# x, y, z of an unlabeled marker
+MarkerPosition = np.dtype(("<f4", (3,)))
+
+# NatNet 3.0+ rigid body / skeleton bone record, 38 bytes, no padding
+RigidBodyRecord = np.dtype(
+    [
+        ("id", "<i4"),
+        ("pos", "<f4", (3,)),
+        ("rot", "<f4", (4,)),
+        ("error", "<f4"),
+        ("params", "<i2"),
+    ]
+)
+
+
+def find_nul(data, offset):
+    """returns the absolute offset of the next null byte at or after offset"""
+    try:
+        return data.index(b"\0", offset)
+    except AttributeError:
+        # memoryview has no index()
+        return bytes(data[offset:]).index(b"\0") + offset
+
+
+class DecodePlan:
+    """record layouts and skip widths of one NatNet bitstream version.
+
+    Every version check of the frame format is answered once here, so the
+    per-frame decode loop only reads precomputed attributes.
+    """
+
+    def __init__(self, major, minor):
+        self.version = (major, minor)
+
+        # Sections carry a byte count after their element count (4.1 and later)
+        self.has_data_size = ((major == 4) and (minor > 0)) or (major > 4)
+        self.count_width = 8 if self.has_data_size else 4
+
+        # Rigid body / bone record: pose, then marker data before 3.0, then
+        # mean marker error (2.0+) and tracking valid param (2.6+)
+        self.rb_has_markers = major < 3 and major != 0
+        # marker positions, plus marker ID's and sizes from 2.0
+        self.rb_marker_width = 20 if major >= 2 else 12
+        rb_tail = 0
+        if major >= 2:
+            rb_tail += 4
+        if ((major == 2) and (minor >= 6)) or major > 2:
+            rb_tail += 2
+        self.rb_tail = rb_tail
+        if self.rb_has_markers:
+            self.rb_record = RigidBodyPose
+        else:
+            self.rb_record = struct.Struct("<i3f4f%dx" % rb_tail)
+        # fixed 38 byte records can be decoded with a single np.frombuffer
+        self.rb_dtype = RigidBodyRecord if major >= 3 else None
+
+        self.has_skeletons = (major == 2 and minor > 0) or major > 2
+        self.has_assets = self.has_data_size
+        self.has_labeled_markers = (major == 2 and minor > 3) or major > 2
+        # ID, position, size, params (2.6+), residual (3.0+)
+        labeled_marker_size = 20
+        if (major == 2 and minor >= 6) or major > 2:
+            labeled_marker_size += 2
+        if major >= 3:
+            labeled_marker_size += 4
+        self.labeled_marker_size = labeled_marker_size
+        labeled_marker_fields = [("id", "<i4"), ("pos", "<f4", (3,)), ("size", "<f4")]
+        if (major == 2 and minor >= 6) or major > 2:
+            labeled_marker_fields.append(("params", "<i2"))
+        if major >= 3:
+            labeled_marker_fields.append(("residual", "<f4"))
+        self.labeled_marker_dtype = np.dtype(labeled_marker_fields)
+        self.has_force_plates = (major == 2 and minor >= 9) or major > 2
+        self.has_devices = (major == 2 and minor >= 11) or (major > 2)
+
+        # Timestamp (increased to double precision in 2.7 and later)
+        if (major == 2 and minor >= 7) or (major > 2):
+            self.timestamp_value = DoubleValue
+        else:
+            self.timestamp_value = FloatValue
+        # Hires Timestamp (3.0+) and Precision Timestamp (4.0+)
+        suffix_skip = 0
+        if major >= 3:
+            suffix_skip += HiresTimestamps.size
+        if major >= 4:
+            suffix_skip += PrecisionTimestamp.size
+        self.suffix_skip = suffix_skip
+
+
+class FrameDecoder:
+    def __init__(self):
+        # Set this to a callback method of your choice to receive per-rigid-body data at each frame.
+        self.rigid_body_listener = None
+        # Sections handed to the listener. On NatNet 4.1+ every other section
+        # is jumped over using its byte count, older bitstreams walk it.
+        self.subscribed_sections = {RIGID_BODIES, SKELETONS}
+        # When set, decode() fills a frame.Frame acquired from this pool
+        # instead of allocating a new one
+        self.frame_pool = None
+        # analog.AnalogBuffers filled when the force plate / device sections
+        # are subscribed, without one those sections are skipped
+        self.force_plate_buffers = None
+        self.device_buffers = None
+        self.plan = None
+
+    def set_version(self, major, minor):
+        """builds the decode plan for a NatNet bitstream version"""
+        if self.plan is None or self.plan.version != (major, minor):
+            self.plan = DecodePlan(major, minor)
+        return self.plan
+
+    @staticmethod
+    def __read_count(data, offset, plan):
+        (count,) = Int32Value.unpack_from(data, offset)
+        return offset + plan.count_width, count
+
+    # Jump over a whole NatNet 4.1+ section: count, sizeInBytes, payload
+    @staticmethod
+    def __jump_section(data, offset):
+        (size_in_bytes,) = Int32Value.unpack_from(data, offset + 4)
+        return offset + 8 + size_in_bytes
+
+    def __skip_marker_sets(self, data, offset, plan):
+        offset, marker_set_count = self.__read_count(data, offset, plan)
+        for _ in range(marker_set_count):
+            offset = find_nul(data, offset) + 1
+            (marker_count,) = Int32Value.unpack_from(data, offset)
+            offset += 4 + 12 * marker_count
+        return offset
+
+    def __skip_legacy_other_markers(self, data, offset, plan):
+        offset, other_marker_count = self.__read_count(data, offset, plan)
+        return offset + 12 * max(other_marker_count, 0)
+
+    def __decode_legacy_other_markers(self, data, offset, plan, marker_arrays):
+        offset, other_marker_count = self.__read_count(data, offset, plan)
+        other_marker_count = max(other_marker_count, 0)
+        positions = np.frombuffer(
+            data, dtype=MarkerPosition, count=other_marker_count, offset=offset
+        )
+        marker_arrays.assign_positions(positions)
+        return offset + 12 * other_marker_count
+
+    # Decode count rigid body or skeleton bone records into a {id: pose} dict
+    def __decode_rigid_body_records(self, data, offset, count, plan, listener=None):
+        records = {}
+        rb_record = plan.rb_record
+        record_size = rb_record.size
+        if plan.rb_has_markers:
+            marker_width = plan.rb_marker_width
+            rb_tail = plan.rb_tail
+            for _ in range(count):
+                pose = rb_record.unpack_from(data, offset)
+                offset += record_size
+                (marker_count,) = Int32Value.unpack_from(data, offset)
+                offset += 4 + marker_width * marker_count + rb_tail
+                pos = pose[1:4]
+                rot = pose[4:8]
+                records[pose[0]] = {"pos": pos, "rot": rot}
+                if listener is not None:
+                    listener(pose[0], pos, rot, self.frame_number)
+        else:
+            for _ in range(count):
+                pose = rb_record.unpack_from(data, offset)
+                offset += record_size
+                pos = pose[1:4]
+                rot = pose[4:8]
+                records[pose[0]] = {"pos": pos, "rot": rot}
+                if listener is not None:
+                    listener(pose[0], pos, rot, self.frame_number)
+        return offset, records
+
+    def __decode_rigid_bodies(self, data, offset, plan):
+        offset, rigid_body_count = self.__read_count(data, offset, plan)
+        return self.__decode_rigid_body_records(
+            data, offset, rigid_body_count, plan, self.rigid_body_listener
+        )
+
+    # Decode the whole rigid body section into rb_arrays, with one np.frombuffer for NatNet 3.0+
+    def __decode_rigid_body_arrays(self, data, offset, plan, rb_arrays):
+        if plan.rb_dtype is None:
+            offset, rb_data = self.__decode_rigid_bodies(data, offset, plan)
+            rigid_body_count = len(rb_data)
+            # errors and tracking flags are not decoded for pre 3.0 bitstreams
+            rb_arrays.assign(
+                ids=np.fromiter(rb_data.keys(), dtype=np.int32, count=rigid_body_count),
+                positions=np.array(
+                    [rb["pos"] for rb in rb_data.values()], dtype=np.float32
+                ).reshape(-1, 3),
+                rotations=np.array(
+                    [rb["rot"] for rb in rb_data.values()], dtype=np.float32
+                ).reshape(-1, 4),
+                errors=0.0,
+                valid=True,
+            )
+            return offset
+
+        offset, rigid_body_count = self.__read_count(data, offset, plan)
+        records = np.frombuffer(
+            data, dtype=plan.rb_dtype, count=rigid_body_count, offset=offset
+        )
+        offset += plan.rb_dtype.itemsize * rigid_body_count
+        rb_arrays.assign_records(records)
+
+        listener = self.rigid_body_listener
+        if listener is not None:
+            for rb_id, pos, rot in zip(
+                rb_arrays.ids.tolist(),
+                rb_arrays.positions.tolist(),
+                rb_arrays.rotations.tolist(),
+            ):
+                listener(rb_id, tuple(pos), tuple(rot), self.frame_number)
+        return offset
+
+    def __decode_skeletons(self, data, offset, plan):
+        ske_data = {}
+        if plan.has_skeletons:
+            offset, skeleton_count = self.__read_count(data, offset, plan)
+            for _ in range(skeleton_count):
+                skeleton_id, rigid_body_count = CountAndSize.unpack_from(data, offset)
+                offset += 8
+                offset, ske_data[skeleton_id] = self.__decode_rigid_body_records(
+                    data, offset, rigid_body_count, plan
+                )
+        return offset, ske_data
+
+    # Decode every skeleton into the SkeletonArrays of frame, one np.frombuffer per skeleton for NatNet 3.0+
+    def __decode_skeleton_arrays(self, data, offset, plan, frame):
+        if plan.rb_dtype is None:
+            offset, ske_data = self.__decode_skeletons(data, offset, plan)
+            for skeleton_id, bones in ske_data.items():
+                bone_count = len(bones)
+                frame.add_skeleton(skeleton_id).assign(
+                    bone_ids=np.fromiter(
+                        bones.keys(), dtype=np.int32, count=bone_count
+                    ),
+                    positions=np.array(
+                        [bone["pos"] for bone in bones.values()], dtype=np.float32
+                    ).reshape(-1, 3),
+                    rotations=np.array(
+                        [bone["rot"] for bone in bones.values()], dtype=np.float32
+                    ).reshape(-1, 4),
+                    valid=True,
+                )
+            return offset
+
+        offset, skeleton_count = self.__read_count(data, offset, plan)
+        for _ in range(skeleton_count):
+            skeleton_id, bone_count = CountAndSize.unpack_from(data, offset)
+            offset += 8
+            records = np.frombuffer(
+                data, dtype=plan.rb_dtype, count=bone_count, offset=offset
+            )
+            offset += plan.rb_dtype.itemsize * bone_count
+            frame.add_skeleton(skeleton_id).assign_records(records)
+        return offset
+
+    def __skip_assets(self, data, offset, plan):
+        # Assets ( Motive 3.1/NatNet 4.1 and greater)
+        if plan.has_assets:
+            offset, asset_count = self.__read_count(data, offset, plan)
+            for _ in range(asset_count):
+                # asset ID, # of rigid bodies
+                (rigid_body_count,) = Int32Value.unpack_from(data, offset + 4)
+                offset += 8 + 38 * rigid_body_count
+                (marker_count,) = Int32Value.unpack_from(data, offset)
+                offset += 4 + 26 * marker_count
+        return offset
+
+    def __skip_labeled_markers(self, data, offset, plan):
+        if plan.has_labeled_markers:
+            offset, labeled_marker_count = self.__read_count(data, offset, plan)
+            offset += plan.labeled_marker_size * labeled_marker_count
+        return offset
+
+    def __decode_labeled_markers(self, data, offset, plan, marker_arrays):
+        if plan.has_labeled_markers:
+            offset, labeled_marker_count = self.__read_count(data, offset, plan)
+            records = np.frombuffer(
+                data,
+                dtype=plan.labeled_marker_dtype,
+                count=labeled_marker_count,
+                offset=offset,
+            )
+            marker_arrays.assign_records(records)
+            offset += plan.labeled_marker_size * labeled_marker_count
+        return offset
+
+    def __skip_channel_devices(self, data, offset, plan):
+        offset, device_count = self.__read_count(data, offset, plan)
+        for _ in range(device_count):
+            # ID, channel count
+            (channel_count,) = Int32Value.unpack_from(data, offset + 4)
+            offset += 8
+            for _ in range(channel_count):
+                (frame_count,) = Int32Value.unpack_from(data, offset)
+                offset += 4 + 4 * frame_count
+        return offset
+
+    def __decode_channel_devices(self, data, offset, plan, frame_number, buffers):
+        offset, device_count = self.__read_count(data, offset, plan)
+        for _ in range(device_count):
+            device_id, channel_count = ChannelDeviceHeader.unpack_from(data, offset)
+            offset += 8
+            channels = []
+            for _ in range(channel_count):
+                (frame_count,) = Int32Value.unpack_from(data, offset)
+                offset += 4
+                channels.append(
+                    np.frombuffer(data, dtype="<f4", count=frame_count, offset=offset)
+                )
+                offset += 4 * frame_count
+            buffers.write(device_id, frame_number, channels)
+        return offset
+
+    def __skip_force_plates(self, data, offset, plan):
+        if plan.has_force_plates:
+            offset = self.__skip_channel_devices(data, offset, plan)
+        return offset
+
+    def __skip_devices(self, data, offset, plan):
+        if plan.has_devices:
+            offset = self.__skip_channel_devices(data, offset, plan)
+        return offset
+
+    # Returns (offset, timecode, timecode_sub, timestamp, param)
+    def __decode_frame_suffix(self, data, offset, end, plan):
+        timecode, timecode_sub = Timecode.unpack_from(data, offset)
+        offset += 8
+
+        param = 0
+        timestamp = -1
+        # check to see if there is enough data
+        if (end - offset) <= 0:
+            print("ERROR: Early End of Data Frame Suffix Data")
+            print("\tNo time stamp info available")
+        else:
+            (timestamp,) = plan.timestamp_value.unpack_from(data, offset)
+            offset += plan.timestamp_value.size + plan.suffix_skip
+
+            # Frame parameters
+            (param,) = Int16Value.unpack_from(data, offset)
+            offset += 2
+        return offset, timecode, timecode_sub, timestamp, param
+
+    def decode(self, data, offset, packet_size, major, minor):
+        """decodes the NAT_FRAMEOFDATA payload starting at offset in data.
+
+        Returns the offset after the frame and a frame.Frame, acquired from
+        frame_pool when one is set. Unsubscribed rigid body and skeleton
+        sections are left empty.
+
+        The decode plan is rebuilt whenever major/minor differ from the
+        version it was built for.
+        """
+        plan = self.plan
+        if plan is None or plan.version != (major, minor):
+            plan = self.set_version(major, minor)
+        end = offset + packet_size
+
+        # Frame Prefix Data
+        (self.frame_number,) = Int32Value.unpack_from(data, offset)
+        offset += 4
+
+        pool = self.frame_pool
+        frame = Frame() if pool is None else pool.acquire()
+        frame.frame_number = self.frame_number
+        frame.clear_skeletons()
+
+        subscribed = self.subscribed_sections
+        jump = plan.has_data_size
+
+        if jump and MARKER_SETS not in subscribed:
+            offset = self.__jump_section(data, offset)
+        else:
+            offset = self.__skip_marker_sets(data, offset, plan)
+        if LEGACY_MARKERS in subscribed:
+            offset = self.__decode_legacy_other_markers(
+                data, offset, plan, frame.unlabeled_markers
+            )
+        else:
+            frame.unlabeled_markers.clear()
+            if jump:
+                offset = self.__jump_section(data, offset)
+            else:
+                offset = self.__skip_legacy_other_markers(data, offset, plan)
+
+        if jump and RIGID_BODIES not in subscribed:
+            offset = self.__jump_section(data, offset)
+        else:
+            offset = self.__decode_rigid_body_arrays(
+                data, offset, plan, frame.rigid_bodies
+            )
+        if RIGID_BODIES not in subscribed:
+            frame.rigid_bodies.clear()
+
+        if jump and SKELETONS not in subscribed:
+            offset = self.__jump_section(data, offset)
+        else:
+            offset = self.__decode_skeleton_arrays(data, offset, plan, frame)
+        if SKELETONS not in subscribed:
+            frame.clear_skeletons()
+
+        # assets only exist on NatNet 4.1+, so they are always jumpable
+        if jump and ASSETS not in subscribed:
+            offset = self.__jump_section(data, offset)
+        else:
+            offset = self.__skip_assets(data, offset, plan)
+        frame.labeled_markers.clear()
+        if LABELED_MARKERS in subscribed:
+            offset = self.__decode_labeled_markers(
+                data, offset, plan, frame.labeled_markers
+            )
+        elif jump:
+            offset = self.__jump_section(data, offset)
+        else:
+            offset = self.__skip_labeled_markers(data, offset, plan)
+        force_plate_buffers = self.force_plate_buffers
+        if FORCE_PLATES not in subscribed or force_plate_buffers is None:
+            if jump:
+                offset = self.__jump_section(data, offset)
+            else:
+                offset = self.__skip_force_plates(data, offset, plan)
+        elif plan.has_force_plates:
+            offset = self.__decode_channel_devices(
+                data, offset, plan, self.frame_number, force_plate_buffers
+            )
+        device_buffers = self.device_buffers
+        if DEVICES not in subscribed or device_buffers is None:
+            if jump:
+                offset = self.__jump_section(data, offset)
+            else:
+                offset = self.__skip_devices(data, offset, plan)
+        elif plan.has_devices:
+            offset = self.__decode_channel_devices(
+                data, offset, plan, self.frame_number, device_buffers
+            )
+
+        offset, timecode, timecode_sub, timestamp, param = self.__decode_frame_suffix(
+            data, offset, end, plan
+        )
+        frame.timecode = timecode
+        frame.timecode_sub = timecode_sub
+        frame.timestamp = timestamp
+        frame.is_recording = (param & 0x01) != 0
+        frame.tracked_models_changed = (param & 0x02) != 0
+        frame.edit_mode = (param & 0x04) != 0
+        return offset, frame
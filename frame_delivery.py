@@ -0,0 +1,313 @@
+# Hand-off of decoded frame values from the network thread to Blender's main
+# thread.
+#
+# LatestFrameMailbox keeps only the newest item, for live preview: when the
+# main thread falls behind it jumps to the newest frame instead of working
+# through stale ones. BoundedFrameQueue keeps items in order up to a fixed
+# capacity, for recording, and counts what it had to drop.
+#
+# Both rely on deque.append() and deque.popleft() being atomic, so neither the
+# producer nor the consumer takes a lock. Counters are only written by the side
+# that owns them.
+#
+# ApplyInterval paces the single main-thread timer that empties them.
+#
+# JitterBuffer is filled and emptied by that timer only. UDP multicast can
+# reorder and duplicate datagrams, the buffer orders frames by frame number,
+# drops duplicates and frames older than the last one released, and holds each
+# frame until its Motive timestamp plus a fixed depth. Frames then leave at the
+# cadence Motive captured them, not the one they arrived at.
+#
+# This module must not import bpy or mathutils.
+
+import heapq
+import itertools
+import time
+from collections import deque
+
+# backward frame number jumps larger than this are Motive timeline seeks,
+# loops or restarts, not late frames
+MAX_REORDER_FRAMES = 256
+# a receive time this much later than the timestamp schedule is a new clock
+# base, e.g. after Motive restarted, not a late frame
+MAX_CLOCK_STEP = 1.0
+
+
+class LatestFrameMailbox:
+    """holds the newest item, put() replaces an item that was not taken yet"""
+
+    def __init__(self):
+        self.__items = deque(maxlen=1)
+        # written by the producer
+        self.put_count = 0
+        self.replaced_count = 0
+        # written by the consumer
+        self.taken_count = 0
+
+    def __len__(self):
+        return len(self.__items)
+
+    def put(self, item):
+        if self.__items:
+            self.replaced_count += 1
+        self.__items.append(item)
+        self.put_count += 1
+
+    def get(self):
+        """returns the newest item, None when there is none"""
+        try:
+            item = self.__items.popleft()
+        except IndexError:
+            return None
+        self.taken_count += 1
+        return item
+
+    def get_all(self, max_count=None):
+        item = self.get()
+        return [] if item is None else [item]
+
+    def clear(self):
+        self.__items.clear()
+
+    def get_summary(self):
+        return {
+            "policy": "latest",
+            "queued": len(self.__items),
+            "put": self.put_count,
+            "taken": self.taken_count,
+            "dropped": self.replaced_count,
+        }
+
+
+class BoundedFrameQueue:
+    """FIFO of at most capacity items, a full queue drops its oldest item"""
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.__items = deque(maxlen=capacity)
+        # written by the producer
+        self.put_count = 0
+        self.overflow_count = 0
+        self.max_queued = 0
+        # written by the consumer
+        self.taken_count = 0
+
+    def __len__(self):
+        return len(self.__items)
+
+    def put(self, item):
+        queued = len(self.__items)
+        if queued >= self.capacity:
+            self.overflow_count += 1
+        elif queued >= self.max_queued:
+            self.max_queued = queued + 1
+        self.__items.append(item)
+        self.put_count += 1
+
+    def get(self):
+        """returns the oldest item, None when there is none"""
+        try:
+            item = self.__items.popleft()
+        except IndexError:
+            return None
+        self.taken_count += 1
+        return item
+
+    def get_all(self, max_count=None):
+        """returns up to max_count of the oldest items"""
+        items = []
+        while max_count is None or len(items) < max_count:
+            item = self.get()
+            if item is None:
+                break
+            items.append(item)
+        return items
+
+    def clear(self):
+        self.__items.clear()
+
+    def get_summary(self):
+        return {
+            "policy": "fifo",
+            "queued": len(self.__items),
+            "put": self.put_count,
+            "taken": self.taken_count,
+            "dropped": self.overflow_count,
+            "max_queued": self.max_queued,
+            "capacity": self.capacity,
+        }
+
+
+class ApplyInterval:
+    """interval of the main thread timer, following the frame rate and apply time"""
+
+    def __init__(self, min_interval=1 / 240, max_interval=0.1, smoothing=0.2):
+        self.min_interval = min_interval
+        # reached while no frames arrive, e.g. when Motive is paused
+        self.max_interval = max_interval
+        self.smoothing = smoothing
+        # smoothed seconds between frames put into the mailbox or queue
+        self.frame_interval = None
+        self.interval = max_interval
+        self.last_time = time.perf_counter()
+        self.last_put_count = 0
+
+    def update(self, put_count, apply_seconds, backlog=False):
+        """returns the seconds until the next tick.
+
+        put_count is the number of frames delivered so far, apply_seconds how
+        long this tick took, backlog whether queued frames are left over.
+        """
+        now = time.perf_counter()
+        elapsed = now - self.last_time
+        new_frames = put_count - self.last_put_count
+        self.last_time = now
+        self.last_put_count = put_count
+
+        if backlog:
+            # work through recorded frames as fast as the UI allows
+            self.interval = self.min_interval
+            return self.interval
+        if new_frames > 0 and elapsed > 0:
+            frame_interval = elapsed / new_frames
+            if self.frame_interval is None:
+                self.frame_interval = frame_interval
+            else:
+                self.frame_interval += self.smoothing * (
+                    frame_interval - self.frame_interval
+                )
+            interval = self.frame_interval
+        else:
+            # nothing arrived, back off until frames come in again
+            interval = 2 * self.interval
+        # leave the UI at least as much time as applying the frame took
+        interval = max(interval, apply_seconds)
+        self.interval = min(max(interval, self.min_interval), self.max_interval)
+        return self.interval
+
+
+class JitterBuffer:
+    """orders frames by frame number and releases them at their timestamp plus depth"""
+
+    def __init__(self, depth=0.0, drift_smoothing=0.001):
+        # seconds a frame is held after the earliest time it could have arrived
+        self.depth = depth
+        # how fast clock_offset follows the stream when it drifts later
+        self.drift_smoothing = drift_smoothing
+        # receive time minus Motive timestamp of the fastest recent frame
+        self.clock_offset = None
+        # (frame number, timestamp) of the last released frame
+        self.last_frame_number = None
+        self.last_timestamp = None
+        # (frame number, release time, put order, timestamp, item)
+        self.__heap = []
+        self.__keys = set()
+        self.__put_order = itertools.count()
+        self.__last_put_frame_number = None
+        self.put_count = 0
+        self.released_count = 0
+        self.duplicate_count = 0
+        self.late_count = 0
+        self.reordered_count = 0
+        self.skipped_count = 0
+        self.discontinuity_count = 0
+
+    def __len__(self):
+        return len(self.__heap)
+
+    def __get_release_time(self, timestamp, receive_time):
+        if timestamp is None or timestamp < 0:
+            # no timestamp in the frame suffix, hold it from its arrival
+            return receive_time + self.depth
+        offset = receive_time - timestamp
+        if (
+            self.clock_offset is None
+            or offset < self.clock_offset
+            or offset - self.clock_offset > MAX_CLOCK_STEP
+        ):
+            self.clock_offset = offset
+        else:
+            self.clock_offset += self.drift_smoothing * (offset - self.clock_offset)
+        return timestamp + self.clock_offset + self.depth
+
+    def put(self, frame_number, timestamp, receive_time, item):
+        """buffers item, returns False when it is dropped as duplicate or late"""
+        self.put_count += 1
+        last_frame_number = self.last_frame_number
+        if last_frame_number is not None and frame_number <= last_frame_number:
+            if last_frame_number - frame_number > MAX_REORDER_FRAMES:
+                self.discontinuity_count += 1
+                self.clear()
+            elif frame_number < last_frame_number:
+                self.late_count += 1
+                return False
+            elif timestamp <= self.last_timestamp:
+                self.duplicate_count += 1
+                return False
+            # else a paused Motive timeline repeating its current frame
+        key = (frame_number, timestamp)
+        if key in self.__keys:
+            self.duplicate_count += 1
+            return False
+        if (
+            self.__last_put_frame_number is not None
+            and frame_number < self.__last_put_frame_number
+        ):
+            self.reordered_count += 1
+        self.__last_put_frame_number = frame_number
+        self.__keys.add(key)
+        heapq.heappush(
+            self.__heap,
+            (
+                frame_number,
+                self.__get_release_time(timestamp, receive_time),
+                next(self.__put_order),
+                timestamp,
+                item,
+            ),
+        )
+        return True
+
+    def get_ready(self, now=None, latest_only=False):
+        """returns the items due at now in frame number order, or only the newest"""
+        if now is None:
+            now = time.perf_counter()
+        heap = self.__heap
+        items = []
+        while heap and heap[0][1] <= now:
+            frame_number, _, _, timestamp, item = heapq.heappop(heap)
+            self.__keys.discard((frame_number, timestamp))
+            self.last_frame_number = frame_number
+            self.last_timestamp = timestamp
+            items.append(item)
+        self.released_count += len(items)
+        if latest_only and len(items) > 1:
+            self.skipped_count += len(items) - 1
+            items = items[-1:]
+        return items
+
+    def get_next_release_time(self):
+        """returns when the first buffered item is due, None when empty"""
+        return self.__heap[0][1] if self.__heap else None
+
+    def clear(self):
+        """forgets buffered items and the release order, e.g. after a seek"""
+        self.__heap.clear()
+        self.__keys.clear()
+        self.__last_put_frame_number = None
+        self.last_frame_number = None
+        self.last_timestamp = None
+        self.clock_offset = None
+
+    def get_summary(self):
+        return {
+            "depth": self.depth,
+            "buffered": len(self.__heap),
+            "put": self.put_count,
+            "released": self.released_count,
+            "duplicates": self.duplicate_count,
+            "late": self.late_count,
+            "reordered": self.reordered_count,
+            "skipped": self.skipped_count,
+            "discontinuities": self.discontinuity_count,
+        }
@@ -0,0 +1,530 @@
+# Frame decoding in a separate process.
+#
+# FrameWorker starts this module as a script in a child Python process. The
+# child opens its own multicast data socket, decodes every NAT_FRAMEOFDATA with
+# frame_decoder.FrameDecoder and writes the rigid body and skeleton arrays into
+# a ring of slots in multiprocessing.shared_memory. Blender's process only
+# copies the newest slot, or while recording the slots it has not read yet, out
+# of the mapping, so unpacking frames no longer competes with the UI for the
+# GIL and runs on another core.
+#
+# The command channel stays with NatNetClient in Blender's process, which
+# passes the bitstream version on through the ring header. Markers and analog
+# channels are not decoded by the worker.
+#
+# Every slot is a seqlock: the writer stores the sequence number in
+# sequence_begin, then the arrays, then sequence_end. A copy is consistent when
+# sequence_end before and sequence_begin after copying both hold the sequence
+# number the reader asked for.
+#
+# This module must not import bpy or mathutils.
+
+import argparse
+import os
+import select
+import socket
+import subprocess
+import sys
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+if __name__ == "__main__" and not __package__:
+    # started as a script by FrameWorker.start(), resolve the relative imports
+    # below without running the package __init__, which imports bpy
+    import types
+
+    __package__ = "_natnet_frame_worker"
+    _package = types.ModuleType(__package__)
+    _package.__path__ = [os.path.dirname(os.path.abspath(__file__))]
+    sys.modules[__package__] = _package
+
+from .capture import NAT_FRAMEOFDATA, get_message_id
+from .frame import Frame, FramePool
+from .frame_decoder import FrameDecoder
+from .packet_buffer import RECEIVE_BUFFER_SIZE, FrameGapDetector, get_frame_number
+
+FRAME_RING_MAGIC = b"NATNETFR"
+# slots start on a cache line
+SLOT_ALIGNMENT = 64
+
+# frame suffix flags stored per slot
+TRACKED_MODELS_CHANGED = 0x01
+EDIT_MODE = 0x02
+IS_RECORDING = 0x04
+
+HEADER_DTYPE = np.dtype(
+    [
+        ("magic", "S8"),
+        ("slot_count", "<i4"),
+        ("max_rigid_bodies", "<i4"),
+        ("max_skeletons", "<i4"),
+        ("max_bones", "<i4"),
+        # bitstream version, written by Blender's process once it is known
+        ("major", "<i4"),
+        ("minor", "<i4"),
+        # set by Blender's process to end the worker
+        ("stop", "<i4"),
+        ("worker_pid", "<i4"),
+        # sequence number of the newest complete slot, 0 before the first frame
+        ("latest_sequence", "<u8"),
+        # FrameGapDetector counts of the worker's data socket
+        ("received", "<u8"),
+        ("dropped", "<u8"),
+        # frames with more assets than the slots hold
+        ("truncated", "<u8"),
+    ],
+    align=True,
+)
+
+
+def create_slot_dtype(max_rigid_bodies, max_skeletons, max_bones):
+    """returns the dtype of one ring slot, max_bones counts all skeletons together"""
+    return np.dtype(
+        [
+            ("sequence_begin", "<u8"),
+            ("frame_number", "<i4"),
+            ("flags", "<i4"),
+            ("timestamp", "<f8"),
+            ("rigid_body_count", "<i4"),
+            ("skeleton_count", "<i4"),
+            ("rigid_body_ids", "<i4", (max_rigid_bodies,)),
+            ("rigid_body_positions", "<f4", (max_rigid_bodies, 3)),
+            ("rigid_body_rotations", "<f4", (max_rigid_bodies, 4)),
+            ("rigid_body_errors", "<f4", (max_rigid_bodies,)),
+            ("rigid_body_valid", "?", (max_rigid_bodies,)),
+            ("skeleton_ids", "<i4", (max_skeletons,)),
+            ("bone_counts", "<i4", (max_skeletons,)),
+            ("bone_ids", "<i4", (max_bones,)),
+            ("bone_positions", "<f4", (max_bones, 3)),
+            ("bone_rotations", "<f4", (max_bones, 4)),
+            ("bone_valid", "?", (max_bones,)),
+            ("sequence_end", "<u8"),
+        ],
+        align=True,
+    )
+
+
+def get_slots_offset():
+    return -(-HEADER_DTYPE.itemsize // SLOT_ALIGNMENT) * SLOT_ALIGNMENT
+
+
+def get_frame_ring_size(slot_count, max_rigid_bodies, max_skeletons, max_bones):
+    slot_dtype = create_slot_dtype(max_rigid_bodies, max_skeletons, max_bones)
+    return get_slots_offset() + slot_count * slot_dtype.itemsize
+
+
+def init_frame_ring(buffer, slot_count, max_rigid_bodies, max_skeletons, max_bones):
+    header = np.ndarray((), dtype=HEADER_DTYPE, buffer=buffer)
+    header[()] = np.zeros((), dtype=HEADER_DTYPE)
+    header["slot_count"] = slot_count
+    header["max_rigid_bodies"] = max_rigid_bodies
+    header["max_skeletons"] = max_skeletons
+    header["max_bones"] = max_bones
+    header["magic"] = FRAME_RING_MAGIC
+
+
+def map_frame_ring(buffer):
+    """returns (header, slots) views of an initialized ring in buffer"""
+    header = np.ndarray((), dtype=HEADER_DTYPE, buffer=buffer)
+    if header["magic"] != FRAME_RING_MAGIC:
+        raise ValueError("shared memory does not hold a frame ring")
+    slot_dtype = create_slot_dtype(
+        int(header["max_rigid_bodies"]),
+        int(header["max_skeletons"]),
+        int(header["max_bones"]),
+    )
+    slots = np.ndarray(
+        int(header["slot_count"]),
+        dtype=slot_dtype,
+        buffer=buffer,
+        offset=get_slots_offset(),
+    )
+    return header, slots
+
+
+class FrameRingWriter:
+    """writes decoded frames into the ring, used in the worker process"""
+
+    def __init__(self, buffer):
+        self.header, self.slots = map_frame_ring(buffer)
+        self.sequence = int(self.header["latest_sequence"])
+        self.max_rigid_bodies = int(self.header["max_rigid_bodies"])
+        self.max_skeletons = int(self.header["max_skeletons"])
+        self.max_bones = int(self.header["max_bones"])
+
+    def is_stopped(self):
+        return bool(self.header["stop"])
+
+    def get_version(self):
+        return int(self.header["major"]), int(self.header["minor"])
+
+    def set_counts(self, frame_gap_detector):
+        self.header["received"] = frame_gap_detector.received_frame_count
+        self.header["dropped"] = frame_gap_detector.dropped_frame_count
+
+    def write(self, frame):
+        sequence = self.sequence + 1
+        slot = self.slots[sequence % len(self.slots)]
+        slot["sequence_begin"] = sequence
+
+        rigid_bodies = frame.rigid_bodies
+        rigid_body_count = min(len(rigid_bodies), self.max_rigid_bodies)
+        truncated = rigid_body_count < len(rigid_bodies)
+        slot["frame_number"] = frame.frame_number
+        slot["flags"] = (
+            (TRACKED_MODELS_CHANGED if frame.tracked_models_changed else 0)
+            | (EDIT_MODE if frame.edit_mode else 0)
+            | (IS_RECORDING if frame.is_recording else 0)
+        )
+        slot["timestamp"] = frame.timestamp
+        slot["rigid_body_count"] = rigid_body_count
+        slot["rigid_body_ids"][:rigid_body_count] = rigid_bodies.ids[:rigid_body_count]
+        slot["rigid_body_positions"][:rigid_body_count] = rigid_bodies.positions[
+            :rigid_body_count
+        ]
+        slot["rigid_body_rotations"][:rigid_body_count] = rigid_bodies.rotations[
+            :rigid_body_count
+        ]
+        slot["rigid_body_errors"][:rigid_body_count] = rigid_bodies.errors[
+            :rigid_body_count
+        ]
+        slot["rigid_body_valid"][:rigid_body_count] = rigid_bodies.valid[
+            :rigid_body_count
+        ]
+
+        skeleton_count = 0
+        bone_start = 0
+        for skeleton_id, bone_arrays in frame.skeletons.items():
+            bone_count = len(bone_arrays)
+            if (
+                skeleton_count == self.max_skeletons
+                or bone_start + bone_count > self.max_bones
+            ):
+                truncated = True
+                break
+            bone_end = bone_start + bone_count
+            slot["skeleton_ids"][skeleton_count] = skeleton_id
+            slot["bone_counts"][skeleton_count] = bone_count
+            slot["bone_ids"][bone_start:bone_end] = bone_arrays.bone_ids
+            slot["bone_positions"][bone_start:bone_end] = bone_arrays.positions
+            slot["bone_rotations"][bone_start:bone_end] = bone_arrays.rotations
+            slot["bone_valid"][bone_start:bone_end] = bone_arrays.valid
+            skeleton_count += 1
+            bone_start = bone_end
+        slot["skeleton_count"] = skeleton_count
+
+        slot["sequence_end"] = sequence
+        self.header["latest_sequence"] = sequence
+        if truncated:
+            self.header["truncated"] += 1
+        self.sequence = sequence
+        return sequence
+
+
+class FrameRingReader:
+    """copies frames out of the ring, used in Blender's process"""
+
+    def __init__(self, buffer, frame_pool=None):
+        self.header, self.slots = map_frame_ring(buffer)
+        self.frame_pool = frame_pool
+        # sequence number of the last slot handed out
+        self.last_sequence = int(self.header["latest_sequence"])
+        # slots overwritten before they were read, while every frame was read
+        self.overrun_count = 0
+        # slots the writer changed during the copy
+        self.torn_count = 0
+
+    def set_version(self, major, minor):
+        if self.header["major"] != major or self.header["minor"] != minor:
+            self.header["minor"] = minor
+            self.header["major"] = major
+
+    def read_frames(self, latest_only=True):
+        """returns the newest frame, or every frame not read yet, oldest first"""
+        latest_sequence = int(self.header["latest_sequence"])
+        if latest_sequence <= self.last_sequence:
+            return []
+        if latest_only:
+            first_sequence = latest_sequence
+        else:
+            first_sequence = max(
+                self.last_sequence + 1, latest_sequence - len(self.slots) + 1
+            )
+            self.overrun_count += first_sequence - self.last_sequence - 1
+        frames = []
+        for sequence in range(first_sequence, latest_sequence + 1):
+            frame = self.read_slot(sequence)
+            if frame is not None:
+                frames.append(frame)
+        self.last_sequence = latest_sequence
+        return frames
+
+    def read_slot(self, sequence):
+        """returns the frame in the slot of sequence, None if it was overwritten"""
+        slot = self.slots[sequence % len(self.slots)]
+        if slot["sequence_end"] != sequence:
+            self.torn_count += 1
+            return None
+        pool = self.frame_pool
+        frame = Frame() if pool is None else pool.acquire()
+        frame.frame_number = int(slot["frame_number"])
+        flags = int(slot["flags"])
+        frame.tracked_models_changed = bool(flags & TRACKED_MODELS_CHANGED)
+        frame.edit_mode = bool(flags & EDIT_MODE)
+        frame.is_recording = bool(flags & IS_RECORDING)
+        frame.timestamp = float(slot["timestamp"])
+
+        rigid_body_count = int(slot["rigid_body_count"])
+        frame.rigid_bodies.assign(
+            ids=slot["rigid_body_ids"][:rigid_body_count],
+            positions=slot["rigid_body_positions"][:rigid_body_count],
+            rotations=slot["rigid_body_rotations"][:rigid_body_count],
+            errors=slot["rigid_body_errors"][:rigid_body_count],
+            valid=slot["rigid_body_valid"][:rigid_body_count],
+        )
+        frame.clear_skeletons()
+        bone_start = 0
+        for skeleton_id, bone_count in zip(
+            slot["skeleton_ids"][: slot["skeleton_count"]].tolist(),
+            slot["bone_counts"][: slot["skeleton_count"]].tolist(),
+        ):
+            bone_end = bone_start + bone_count
+            frame.add_skeleton(skeleton_id).assign(
+                bone_ids=slot["bone_ids"][bone_start:bone_end],
+                positions=slot["bone_positions"][bone_start:bone_end],
+                rotations=slot["bone_rotations"][bone_start:bone_end],
+                valid=slot["bone_valid"][bone_start:bone_end],
+            )
+            bone_start = bone_end
+
+        if slot["sequence_begin"] != sequence:
+            self.torn_count += 1
+            frame.release()
+            return None
+        return frame
+
+    def get_summary(self):
+        return {
+            "decoded": int(self.header["latest_sequence"]),
+            "received": int(self.header["received"]),
+            "dropped": int(self.header["dropped"]),
+            "truncated": int(self.header["truncated"]),
+            "overrun": self.overrun_count,
+            "torn": self.torn_count,
+        }
+
+
+class FrameWorker:
+    """runs the data socket and frame decoding in a child process"""
+
+    def __init__(
+        self, slot_count=64, max_rigid_bodies=256, max_skeletons=16, max_bones=1024
+    ):
+        self.slot_count = slot_count
+        self.max_rigid_bodies = max_rigid_bodies
+        self.max_skeletons = max_skeletons
+        self.max_bones = max_bones
+        self.shared_memory = None
+        self.reader = None
+        self.process = None
+
+    def start(
+        self, multicast_address, local_ip_address, data_port, receive_buffer_size=0
+    ):
+        """creates the ring and starts the worker process"""
+        self.shared_memory = shared_memory.SharedMemory(
+            create=True,
+            size=get_frame_ring_size(
+                self.slot_count,
+                self.max_rigid_bodies,
+                self.max_skeletons,
+                self.max_bones,
+            ),
+        )
+        init_frame_ring(
+            self.shared_memory.buf,
+            self.slot_count,
+            self.max_rigid_bodies,
+            self.max_skeletons,
+            self.max_bones,
+        )
+        self.reader = FrameRingReader(self.shared_memory.buf, FramePool())
+        # Blender's sys.executable is its bundled Python
+        self.process = subprocess.Popen(
+            [
+                sys.executable,
+                os.path.abspath(__file__),
+                self.shared_memory.name,
+                "--multicast-address",
+                multicast_address,
+                "--local-address",
+                local_ip_address,
+                "--data-port",
+                str(data_port),
+                "--receive-buffer-size",
+                str(receive_buffer_size),
+                "--parent-pid",
+                str(os.getpid()),
+            ]
+        )
+        return True
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def set_version(self, major, minor):
+        if self.reader is not None:
+            self.reader.set_version(major, minor)
+
+    def get_decoded_frame_count(self):
+        if self.reader is None:
+            return 0
+        return int(self.reader.header["latest_sequence"])
+
+    def read_frames(self, latest_only=True):
+        if self.reader is None:
+            return []
+        return self.reader.read_frames(latest_only)
+
+    def get_summary(self):
+        return {} if self.reader is None else self.reader.get_summary()
+
+    def shutdown(self, timeout=2.0):
+        if self.process is not None:
+            self.reader.header["stop"] = 1
+            try:
+                self.process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+        if self.shared_memory is not None:
+            # views of the buffer have to be released before it can be closed
+            self.reader = None
+            self.shared_memory.close()
+            self.shared_memory.unlink()
+            self.shared_memory = None
+
+
+def create_data_socket(
+    multicast_address, local_ip_address, data_port, receive_buffer_size
+):
+    """returns the multicast data socket NatNetClient would open, None on error"""
+    result = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, 0)
+    result.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    try:
+        result.setsockopt(
+            socket.IPPROTO_IP,
+            socket.IP_ADD_MEMBERSHIP,
+            socket.inet_aton(multicast_address) + socket.inet_aton(local_ip_address),
+        )
+        result.bind((local_ip_address, data_port))
+    except socket.error as msg:
+        print("ERROR: frame worker data socket error occurred:\n%s" % msg)
+        result.close()
+        return None
+    if receive_buffer_size:
+        try:
+            result.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer_size)
+        except socket.error as msg:
+            print("ERROR: could not set the data socket receive buffer:\n%s" % msg)
+    result.setblocking(False)
+    return result
+
+
+def attach_shared_memory(name):
+    """opens the ring without handing it to this process' resource tracker"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # before Python 3.13 attaching registers the segment, and the tracker
+        # would unlink it when the worker exits
+        result = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(result._name, "shared_memory")
+        return result
+
+
+def run_worker(
+    shared_memory_name,
+    multicast_address,
+    local_ip_address,
+    data_port,
+    receive_buffer_size=0,
+    parent_pid=None,
+):
+    ring = attach_shared_memory(shared_memory_name)
+    writer = FrameRingWriter(ring.buf)
+    writer.header["worker_pid"] = os.getpid()
+    data_socket = create_data_socket(
+        multicast_address, local_ip_address, data_port, receive_buffer_size
+    )
+    if data_socket is None:
+        writer = None
+        ring.close()
+        return 1
+
+    frame_decoder = FrameDecoder()
+    frame_decoder.frame_pool = FramePool()
+    frame_gap_detector = FrameGapDetector()
+    buffer = bytearray(RECEIVE_BUFFER_SIZE)
+    try:
+        # a parent that died without setting stop leaves the worker orphaned
+        while not writer.is_stopped() and (
+            parent_pid is None or os.getppid() == parent_pid
+        ):
+            readable, _, _ = select.select((data_socket,), (), (), 0.5)
+            if not readable:
+                continue
+            while True:
+                try:
+                    byte_count, _ = data_socket.recvfrom_into(buffer)
+                except BlockingIOError:
+                    break
+                if byte_count < 8:
+                    continue
+                data = memoryview(buffer)[:byte_count]
+                if get_message_id(data) != NAT_FRAMEOFDATA:
+                    continue
+                frame_gap_detector.add_frame(get_frame_number(data))
+                writer.set_counts(frame_gap_detector)
+                major, minor = writer.get_version()
+                if major == 0:
+                    # the bitstream version arrives on Blender's command socket
+                    continue
+                packet_size = int.from_bytes(data[2:4], byteorder="little", signed=True)
+                try:
+                    _, frame = frame_decoder.decode(data, 4, packet_size, major, minor)
+                except Exception as e:
+                    print("ERROR: frame worker could not decode a frame: %s" % e)
+                    continue
+                writer.write(frame)
+                frame.release()
+    finally:
+        data_socket.close()
+        writer = None
+        ring.close()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="NatNet frame decoding worker")
+    parser.add_argument("shared_memory_name")
+    parser.add_argument("--multicast-address", default="239.255.42.99")
+    parser.add_argument("--local-address", default="127.0.0.1")
+    parser.add_argument("--data-port", type=int, default=1511)
+    parser.add_argument("--receive-buffer-size", type=int, default=0)
+    parser.add_argument("--parent-pid", type=int, default=None)
+    args = parser.parse_args(argv)
+    return run_worker(
+        args.shared_memory_name,
+        args.multicast_address,
+        args.local_address,
+        args.data_port,
+        args.receive_buffer_size,
+        args.parent_pid,
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
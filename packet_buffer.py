@@ -0,0 +1,119 @@
+# Receive buffers for the NatNetClient socket threads.
+#
+# PacketBufferPool hands out preallocated bytearrays for recvfrom_into(), so
+# receiving a datagram allocates no bytes object. The decoders copy what they
+# keep out of the packet, a buffer can be released as soon as the packet has
+# been processed. FrameGapDetector counts the frames lost between Motive and
+# the data socket from gaps in the received frame numbers.
+#
+# This module must not import bpy or mathutils.
+
+from collections import deque
+
+# largest UDP payload, NatNet packets are never larger
+RECEIVE_BUFFER_SIZE = 64 * 1024
+
+# message ids up to NAT_KEEPALIVE are counted individually, the last slot
+# counts everything else such as NAT_UNRECOGNIZED_REQUEST
+MESSAGE_COUNT_SLOTS = 12
+
+
+class PacketBufferPool:
+    """recycles receive buffers between datagrams"""
+
+    def __init__(self, size=4, buffer_size=RECEIVE_BUFFER_SIZE):
+        # buffers kept for reuse, buffers released beyond this are dropped
+        self.size = size
+        self.buffer_size = buffer_size
+        self.allocated_count = 0
+        self.__free = deque()
+        for _ in range(size):
+            self.__free.append(self.__allocate())
+
+    def __allocate(self):
+        self.allocated_count += 1
+        return bytearray(self.buffer_size)
+
+    def acquire(self):
+        try:
+            return self.__free.pop()
+        except IndexError:
+            return self.__allocate()
+
+    def release(self, buffer):
+        if len(self.__free) < self.size:
+            self.__free.append(buffer)
+
+    def get_free_count(self):
+        return len(self.__free)
+
+
+def create_message_counts():
+    return [0] * MESSAGE_COUNT_SLOTS
+
+
+def count_message(message_counts, message_id):
+    """increments and returns the count of message_id"""
+    if not 0 <= message_id < MESSAGE_COUNT_SLOTS - 1:
+        message_id = MESSAGE_COUNT_SLOTS - 1
+    message_counts[message_id] += 1
+    return message_counts[message_id]
+
+
+# larger forward jumps and any backward jump are Motive timeline seeks, loops
+# or restarts, not dropped frames
+MAX_DROP_GAP = 4096
+
+
+def get_frame_number(data):
+    """returns the frame number of a NAT_FRAMEOFDATA packet without decoding it"""
+    return int.from_bytes(data[4:8], byteorder="little", signed=True)
+
+
+class FrameGapDetector:
+    """counts frames missing from the received NAT_FRAMEOFDATA sequence"""
+
+    def __init__(self):
+        self.last_frame_number = None
+        self.received_frame_count = 0
+        # frames that never arrived, lost on the network or in a full kernel buffer
+        self.dropped_frame_count = 0
+        # received frames the client did not decode because a newer one was queued
+        self.skipped_frame_count = 0
+        self.gap_count = 0
+        self.largest_gap = 0
+        self.discontinuity_count = 0
+
+    def add_frame(self, frame_number):
+        """returns the number of frames missing before frame_number"""
+        last_frame_number = self.last_frame_number
+        self.last_frame_number = frame_number
+        self.received_frame_count += 1
+        if last_frame_number is None:
+            return 0
+        gap = frame_number - last_frame_number - 1
+        if gap <= 0:
+            # a paused Motive timeline repeats the current frame
+            if gap < -1:
+                self.discontinuity_count += 1
+            return 0
+        if gap > MAX_DROP_GAP:
+            self.discontinuity_count += 1
+            return 0
+        self.dropped_frame_count += gap
+        self.gap_count += 1
+        if gap > self.largest_gap:
+            self.largest_gap = gap
+        return gap
+
+    def get_summary(self):
+        expected = self.received_frame_count + self.dropped_frame_count
+        return {
+            "received": self.received_frame_count,
+            "dropped": self.dropped_frame_count,
+            "drop_rate": self.dropped_frame_count / expected if expected else 0.0,
+            "skipped": self.skipped_frame_count,
+            "gaps": self.gap_count,
+            "largest_gap": self.largest_gap,
+            "discontinuities": self.discontinuity_count,
+        }
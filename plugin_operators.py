@@ -1,16 +1,27 @@
 import ipaddress
 import sys
-from queue import Queue
-from threading import Lock
-from time import time
+from time import perf_counter, time
 
 import bpy
 import mathutils
+import numpy as np
 from bpy.types import Operator
 
-from .Modified_NatNetClient import NatNetClient
+from .analog import AnalogBuffers
+from .frame import FramePool
+from .frame_decoder import LABELED_MARKERS, LEGACY_MARKERS
+from .frame_delivery import (
+    ApplyInterval,
+    BoundedFrameQueue,
+    JitterBuffer,
+    LatestFrameMailbox,
+)
+from .Modified_NatNetClient import NatNetClient, get_desc_dict_diff
 from .repository.action import ActionRepository
+from .repository.analog import AnalogExportRepository
+from .repository.marker import MarkerCloudRepository
 from .repository.skeleton import SkeletonRepository
+from .resample import KeyframeResampler
 
 # Define a custom property to track states
 bpy.types.WindowManager.connection_status = bpy.props.BoolProperty(
@@ -29,6 +40,9 @@ bpy.types.WindowManager.record2_status = bpy.props.BoolProperty(
 
 
 class ConnectionSetup:
+    # recorded frames handled per apply_frames call, the rest waits
+    MAX_QUEUED_FRAMES_PER_TICK = 64
+
     def __init__(self):
         self.streaming_client = None
         self.indicate_model_changed = None
@@ -36,30 +50,65 @@ class ConnectionSetup:
         self.assets_motive = {}  # ( {assetType: {motive_ID: motive_name}} )
         self.assets_blender = {}  # ( {assetType: {motive_ID: blender_ID}} )
         self.rev_assets_blender = {}  # ( {blender_ID: {object, motive_ID, assetType}} )
-        self.q = Queue()
-        self.l = Lock()
+        # LATEST, FIFO, or AUTO for FIFO while recording, see frame_delivery.py
+        self.delivery_policy = "AUTO"
+        self.frame_mailbox = LatestFrameMailbox()
+        self.frame_queue = BoundedFrameQueue()
+        # orders live frames and paces their release, see frame_delivery.py
+        self.jitter_buffer = JitterBuffer()
+        self.recording = False
+        # the persistent update_object_loc timer, see start_apply_timer
+        self.apply_timer = None
+        self.apply_interval = ApplyInterval()
         self.is_running = None
         self.frame_start = 0
         self.live_record = False
+        # SCENE_RATE or SUBFRAMES, how live recordings are keyed, see resample.py
+        self.key_timing = "SCENE_RATE"
+        self.resampler = KeyframeResampler()
+        # resampler key frame of the first recorded frame
+        self.key_frame_start = None
         self.bone_convention = "FBX"
+        self.stream_markers = False
+        self.stream_analog = False
+        self.force_plate_buffers = None
+        self.device_buffers = None
 
         FRAME_PER_SEC = 30
         self.SEC_PER_FRAME = 1 / FRAME_PER_SEC
         self.current_time = time()
 
     def reset_to_initial(self):
+        self.stop_apply_timer()
         self.streaming_client = None
         self.indicate_model_changed = None
         self.indicate_motive_edit = None
         self.assets_motive = {}
         self.assets_blender = {}
         self.rev_assets_blender = {}
-        self.q = Queue()
-        self.l = Lock()
+        # LATEST, FIFO, or AUTO for FIFO while recording, see frame_delivery.py
+        self.delivery_policy = "AUTO"
+        self.frame_mailbox = LatestFrameMailbox()
+        self.frame_queue = BoundedFrameQueue()
+        # orders live frames and paces their release, see frame_delivery.py
+        self.jitter_buffer = JitterBuffer()
+        self.recording = False
+        # the persistent update_object_loc timer, see start_apply_timer
+        self.apply_timer = None
+        self.apply_interval = ApplyInterval()
         self.is_running = None
         self.frame_start = 0
         self.live_record = False
+        # SCENE_RATE or SUBFRAMES, how live recordings are keyed, see resample.py
+        self.key_timing = "SCENE_RATE"
+        self.resampler = KeyframeResampler()
+        # resampler key frame of the first recorded frame
+        self.key_frame_start = None
         self.bone_convention = "FBX"
+        self.stream_markers = False
+        self.stream_analog = False
+        self.force_plate_buffers = None
+        self.device_buffers = None
 
         FRAME_PER_SEC = 30
         self.SEC_PER_FRAME = 1 / FRAME_PER_SEC
@@ -71,25 +120,100 @@ class ConnectionSetup:
     # def signal_motive_edit(self, edit_mode): # flag for live/edit mode in Motive
     #     self.indicate_motive_edit = edit_mode
 
+    def set_delivery_policy(self, delivery_policy):
+        if delivery_policy in ("AUTO", "LATEST", "FIFO"):
+            self.delivery_policy = delivery_policy
+        return self.delivery_policy
+
+    def set_key_timing(self, key_timing):
+        if key_timing in ("SCENE_RATE", "SUBFRAMES"):
+            self.key_timing = key_timing
+            self.resampler.subframes = key_timing == "SUBFRAMES"
+            self.resampler.reset()
+        return self.key_timing
+
+    def set_jitter_buffer_depth(self, depth_ms):
+        self.jitter_buffer.depth = max(depth_ms, 0) / 1000
+        return self.jitter_buffer.depth
+
+    def get_frame_delivery(self):
+        """returns the mailbox or queue receive_data_frame hands frames to"""
+        if self.delivery_policy == "FIFO" or (
+            self.delivery_policy == "AUTO" and self.recording
+        ):
+            return self.frame_queue
+        return self.frame_mailbox
+
+    def start_apply_timer(self):
+        """registers update_object_loc once, it reschedules itself"""
+        if self.apply_timer is None:
+            # timers are looked up by identity, keep the bound method
+            self.apply_timer = self.update_object_loc
+            self.apply_interval = ApplyInterval()
+            self.jitter_buffer.clear()
+            bpy.app.timers.register(
+                self.apply_timer, first_interval=self.apply_interval.min_interval
+            )
+
+    def stop_apply_timer(self):
+        if self.apply_timer is not None:
+            if bpy.app.timers.is_registered(self.apply_timer):
+                bpy.app.timers.unregister(self.apply_timer)
+            self.apply_timer = None
+
+    def set_recording(self, recording):
+        self.recording = recording
+        if self.streaming_client is not None:
+            # frames queued in the socket are needed when every frame is kept
+            self.streaming_client.skip_stale_frames = (
+                self.get_frame_delivery() is self.frame_mailbox
+            )
+
     def connect_button_clicked(self, dict, context):
         if self.streaming_client is not None:
             self.streaming_client.set_client_address(dict["clientAddress"])
             self.streaming_client.set_server_address(dict["serverAddress"])
             self.streaming_client.set_use_multicast(dict["use_multicast"])
+            # one event loop thread for both sockets, disconnects immediately
+            self.streaming_client.set_transport_mode("asyncio")
+            self.stream_markers = dict.get("stream_markers", False)
+            if self.stream_markers:
+                self.streaming_client.subscribe_sections(
+                    LABELED_MARKERS, LEGACY_MARKERS
+                )
 
+            self.set_delivery_policy(dict.get("frame_delivery", "AUTO"))
+            self.set_jitter_buffer_depth(dict.get("jitter_buffer_depth", 0))
+            self.set_key_timing(dict.get("key_timing", "SCENE_RATE"))
+            # the frame worker decodes rigid bodies and skeletons only
+            self.streaming_client.set_decode_in_worker(
+                dict.get("decode_in_worker", False)
+                and not (self.stream_markers or dict.get("stream_analog", False))
+            )
+            self.stream_analog = dict.get("stream_analog", False)
+            if self.stream_analog:
+                self.force_plate_buffers = AnalogBuffers()
+                self.device_buffers = AnalogBuffers()
+                self.streaming_client.set_analog_buffers(
+                    self.force_plate_buffers, self.device_buffers
+                )
+
+            self.streaming_client.set_frame_pool(FramePool())
             self.is_running = self.streaming_client.run()
 
             # send commands to Motive to change its settings
             if self.is_running:
+                markers_str = "true" if self.stream_markers else "false"
                 sz_commands = [
-                    "SetProperty,,Labeled Markers,false",
-                    "SetProperty,,Unlabeled Markers,false",
+                    "SetProperty,,Labeled Markers," + markers_str,
+                    "SetProperty,,Unlabeled Markers," + markers_str,
                     "SetProperty,,Asset Markers,false",
                     "SetProperty,,Rigid Bodies,true",
                     "SetProperty,,Skeletons,true",
                     "SetProperty,,Trained Markerset Markers,false",
                     "SetProperty,,Trained Markerset Bones,false",
-                    "SetProperty,,Devices,false",
+                    "SetProperty,,Devices,"
+                    + ("true" if self.stream_analog else "false"),
                     # "SetProperty,,Skeleton Coordinates,Global",
                     "SetProperty,,Skeleton Coordinates,Local",
                     "SetProperty,,Bone Naming Convention," + str(self.bone_convention),
@@ -113,17 +237,25 @@ class ConnectionSetup:
     def start_button_clicked(self, context):
         if context.window_manager.connection_status:
             self.streaming_client.data_listener = self.receive_data_frame
+            self.start_apply_timer()
 
             # Update start state
             context.window_manager.start_status = True
 
     def get_desc_dict(self, context):  # array of all rigid bodies in the .tak
-        if self.streaming_client.desc_dict != self.assets_motive:
+        desc_dict = self.streaming_client.desc_dict
+        if desc_dict is not self.assets_motive:
+            # only unassign rigid bodies that were removed or changed
+            rb_diff = get_desc_dict_diff(self.assets_motive, desc_dict)["rb_desc"]
+            stale_ids = rb_diff["removed"] | rb_diff["changed"]
             for k, v in self.rev_assets_blender.items():
-                v["m_ID"] = "None"
-            self.assets_blender = {}
+                if v.get("m_ID") in stale_ids:
+                    v["m_ID"] = "None"
+            rb_assets = self.assets_blender.get("rigid_body", {})
+            for m_id in stale_ids & rb_assets.keys():
+                del rb_assets[m_id]
             # print(self.assets_blender, self.rev_assets_blender)
-        self.assets_motive = self.streaming_client.desc_dict
+        self.assets_motive = desc_dict
 
     def request_data_descriptions(self, s_client, context):
         # Request the model definitions
@@ -193,68 +325,211 @@ class ConnectionSetup:
         rot_transform = (mat_default.inverted() @ mat_obj).to_quaternion()
         return rot_transform
 
-    def receive_data_frame(self, data_dict):
-        self.indicate_model_changed = data_dict["tracked_models_changed"]
-        self.indicate_motive_edit = data_dict["edit_mode"]
-        frame_num = data_dict["frame_number"]
+    def receive_data_frame(self, frame):
+        self.indicate_model_changed = frame.tracked_models_changed
+        self.indicate_motive_edit = frame.edit_mode
+        frame_num = frame.frame_number
 
         values = []
 
-        for key1 in data_dict["rb_data"]:
-            if ("rigid_body" in self.assets_blender) and (
-                key1 in self.assets_blender["rigid_body"]
-            ):
-                m_val = data_dict["rb_data"][key1]  # rb.m_id = key1
-                b_id = self.assets_blender["rigid_body"][key1]["b_ID"]
+        rigid_bodies = frame.rigid_bodies
+        for key1, asset in self.assets_blender.get("rigid_body", {}).items():
+            row = rigid_bodies.get_row(key1)
+            if row is None:
+                continue
+            b_id = asset["b_ID"]
 
-                # Z-Up with quats
-                pos1 = self.quat_loc_yup_zup(m_val["pos"])
-                rot1 = self.quat_rot_yup_zup(m_val["rot"])
+            # Z-Up with quats
+            pos1 = self.quat_loc_yup_zup(rigid_bodies.positions[row].tolist())
+            rot1 = self.quat_rot_yup_zup(rigid_bodies.rotations[row].tolist())
 
-                # sequence -> (assetID, pos, rot, frame_num, assetType, ske_rb)
-                value = (b_id, pos1, rot1, frame_num, "rigid_body", None)
-                values.append(value)
+            # sequence -> (assetID, pos, rot, frame_num, assetType, ske_rb)
+            value = (b_id, pos1, rot1, frame_num, "rigid_body", None)
+            values.append(value)
 
-        for skeleton_id, frame_data in data_dict["ske_data"].items():
+        for skeleton_id, bone_arrays in frame.skeletons.items():
             skeleton_data = SkeletonRepository.get_by_id(skeleton_id=skeleton_id)
-            frame_data = skeleton_data.create_frame_data(data=frame_data)
+            frame_data = skeleton_data.create_frame_data_from_arrays(
+                bone_arrays=bone_arrays
+            )
             values.append(
                 (skeleton_id, skeleton_data, None, frame_num, "skeleton", frame_data)
             )
 
-        self.l.acquire()
-        try:
-            self.q.put(values)
-        finally:
-            self.l.release()
-            bpy.app.timers.register(
-                self.update_object_loc, first_interval=1 / 120
-            )  # freq = 120 Hz
+        if self.stream_markers:
+            # copied out of the frame, pooled frames are reused after this call
+            marker_positions = np.concatenate(
+                (
+                    frame.labeled_markers.positions,
+                    frame.unlabeled_markers.positions,
+                )
+            )
+            cloud = MarkerCloudRepository.to_blender_positions(marker_positions)
+            values.append((None, cloud, None, frame_num, "markers", None))
+
+        self.get_frame_delivery().put(
+            (frame_num, frame.timestamp, perf_counter(), values)
+        )
 
     def update_object_loc(self):
-        self.l.acquire()
+        """persistent timer, returns the seconds until it runs again"""
+        apply_start = perf_counter()
         try:
+            self.apply_frames()
+        except Exception as e:
+            # a failing frame must not stop the timer
+            print("ERROR: applying frame failed: %s" % e)
+        interval = self.apply_interval.update(
+            self.get_delivered_frame_count(),
+            perf_counter() - apply_start,
+            backlog=len(self.frame_queue) > 0,
+        )
+        next_release_time = self.jitter_buffer.get_next_release_time()
+        if next_release_time is not None:
+            # run again when the next buffered frame is due
+            interval = min(
+                interval,
+                max(
+                    next_release_time - perf_counter(),
+                    self.apply_interval.min_interval,
+                ),
+            )
+        return interval
 
-            if not self.q.empty():
-                q_vals = self.q.get()
-
-                current_frame = None
-
-                for q_val in q_vals:
-                    try:
-                        # live mode
-                        if self.indicate_motive_edit == False:
-                            # no definitive keyframes
-                            if bpy.context.window_manager.record2_status == True:
-                                bpy.context.window_manager.record1_status = False
-                                if self.live_record == False:
-                                    self.frame_start = q_val[3]
-                                    print("frame start: ", self.frame_start)
-                                self.live_record = True
-                                current_frame = q_val[3] - self.frame_start
-                                print("current_frame: ", current_frame)
-                                # q_val[5] -> assetType, q_val[0] -> rbID
-
+    def get_delivered_frame_count(self):
+        """frames put into the mailbox and queue, or decoded by the frame worker"""
+        if self.streaming_client is not None:
+            frame_worker = self.streaming_client.frame_worker
+            if frame_worker is not None:
+                # frames are only put once this timer polls the worker
+                return frame_worker.get_decoded_frame_count()
+        return self.frame_mailbox.put_count + self.frame_queue.put_count
+
+    def get_ready_frames(self):
+        """returns the received frames to apply now, oldest first"""
+        received = (
+            self.frame_queue.get_all(self.MAX_QUEUED_FRAMES_PER_TICK)
+            + self.frame_mailbox.get_all()
+        )
+        jitter_buffer = self.jitter_buffer
+        if self.indicate_motive_edit == False:
+            for frame_number, timestamp, receive_time, values in received:
+                jitter_buffer.put(
+                    frame_number,
+                    timestamp,
+                    receive_time,
+                    (frame_number, timestamp, receive_time, values),
+                )
+            return jitter_buffer.get_ready(
+                perf_counter(),
+                latest_only=self.get_frame_delivery() is self.frame_mailbox,
+            )
+        # Motive's edit mode timeline is moved by hand, frames step back on
+        # purpose and are applied as they arrive
+        jitter_buffer.clear()
+        return received
+
+    def get_key_frames(self, frames):
+        """returns (key frame, values) pairs, key frames are only set when live recording"""
+        if not (self.recording and self.indicate_motive_edit == False):
+            self.resampler.reset()
+            return [(None, values) for _, _, _, values in frames]
+        keys = []
+        for _, timestamp, _, values in frames:
+            keys += self.resampler.add(timestamp, values)
+        return keys
+
+    def get_live_frame(self, frame_number, key_frame):
+        """returns the recording frame of a live frame, 0 for the first recorded one"""
+        if key_frame is None or self.key_frame_start is None:
+            # no Motive timestamp, one key per Motive frame
+            return frame_number - self.frame_start
+        return key_frame - self.key_frame_start
+
+    def apply_frames(self):
+        window_manager = bpy.context.window_manager
+        self.set_recording(
+            window_manager.record1_status or window_manager.record2_status
+        )
+        scene_fps = bpy.context.scene.render.fps / bpy.context.scene.render.fps_base
+        self.resampler.set_scene_fps(scene_fps)
+        # the viewport follows at the scene frame rate
+        self.SEC_PER_FRAME = 1 / scene_fps
+        if self.streaming_client is not None:
+            # hands frames decoded in the worker process to receive_data_frame
+            self.streaming_client.poll_frame_worker(
+                latest_only=self.get_frame_delivery() is self.frame_mailbox
+            )
+        # recorded frames in order, then the newest live frame
+        for key_frame, q_vals in self.get_key_frames(self.get_ready_frames()):
+            current_frame = None
+
+            for q_val in q_vals:
+                try:
+                    # markers are display only, they are never keyframed
+                    if q_val[4] == "markers":
+                        MarkerCloudRepository.render_markers(q_val[1])
+                        continue
+
+                    # live mode
+                    if self.indicate_motive_edit == False:
+                        # no definitive keyframes
+                        if bpy.context.window_manager.record2_status == True:
+                            bpy.context.window_manager.record1_status = False
+                            if self.live_record == False:
+                                self.frame_start = q_val[3]
+                                self.key_frame_start = key_frame
+                                print("frame start: ", self.frame_start)
+                            self.live_record = True
+                            current_frame = self.get_live_frame(q_val[3], key_frame)
+                            print("current_frame: ", current_frame)
+                            # q_val[5] -> assetType, q_val[0] -> rbID
+
+                            if q_val[4] == "rigid_body":
+                                my_obj = self.rev_assets_blender[q_val[0]]["obj"]
+                                my_obj.location = q_val[1]
+                                my_obj.rotation_mode = "QUATERNION"
+                                my_obj.rotation_quaternion = q_val[2]
+
+                                ActionRepository.assign_action(my_obj)
+                                my_obj.keyframe_insert(
+                                    data_path="location", frame=current_frame
+                                )
+
+                                my_obj.keyframe_insert(
+                                    data_path="rotation_quaternion",
+                                    frame=current_frame,
+                                )
+
+                            elif q_val[4] == "skeleton":
+                                (
+                                    skeleton_id,
+                                    skeleton_data,
+                                    _,
+                                    frame_num,
+                                    _,
+                                    frame_data,
+                                ) = q_val
+                                SkeletonRepository.render_skeletons_and_insert_keyframe(
+                                    keyframe_num=current_frame,
+                                    target_skeleton_data=skeleton_data,
+                                    frame_data=frame_data,
+                                )
+
+                        # selective keyframes
+                        elif bpy.context.window_manager.record1_status == True:
+                            bpy.context.window_manager.record2_status = False
+                            if self.live_record == False:
+                                self.frame_start = q_val[3]
+                                self.key_frame_start = key_frame
+                            self.live_record = True
+                            current_frame = self.get_live_frame(q_val[3], key_frame)
+                            if (
+                                bpy.context.scene.frame_start
+                                <= current_frame
+                                <= bpy.context.scene.frame_end
+                            ):
+                                # my_obj = self.rev_assets_blender[self.assets_blender[q_val[0]]]['obj']
                                 if q_val[4] == "rigid_body":
                                     my_obj = self.rev_assets_blender[q_val[0]]["obj"]
                                     my_obj.location = q_val[1]
@@ -263,14 +538,13 @@ class ConnectionSetup:
 
                                     ActionRepository.assign_action(my_obj)
                                     my_obj.keyframe_insert(
-                                        data_path="location", frame=current_frame
+                                        data_path="location",
+                                        frame=current_frame,
                                     )
-
                                     my_obj.keyframe_insert(
                                         data_path="rotation_quaternion",
                                         frame=current_frame,
                                     )
-
                                 elif q_val[4] == "skeleton":
                                     (
                                         skeleton_id,
@@ -286,85 +560,80 @@ class ConnectionSetup:
                                         frame_data=frame_data,
                                     )
 
-                            # selective keyframes
-                            elif bpy.context.window_manager.record1_status == True:
-                                bpy.context.window_manager.record2_status = False
-                                if self.live_record == False:
-                                    self.frame_start = q_val[3]
-                                self.live_record = True
-                                current_frame = q_val[3] - self.frame_start
-                                if (
-                                    bpy.context.scene.frame_start
-                                    <= current_frame
-                                    <= bpy.context.scene.frame_end
-                                ):
-                                    # my_obj = self.rev_assets_blender[self.assets_blender[q_val[0]]]['obj']
-                                    if q_val[4] == "rigid_body":
-                                        my_obj = self.rev_assets_blender[q_val[0]][
-                                            "obj"
-                                        ]
-                                        my_obj.location = q_val[1]
-                                        my_obj.rotation_mode = "QUATERNION"
-                                        my_obj.rotation_quaternion = q_val[2]
-
-                                        ActionRepository.assign_action(my_obj)
-                                        my_obj.keyframe_insert(
-                                            data_path="location",
-                                            frame=current_frame,
-                                        )
-                                        my_obj.keyframe_insert(
-                                            data_path="rotation_quaternion",
-                                            frame=current_frame,
-                                        )
-                                    elif q_val[4] == "skeleton":
-                                        (
-                                            skeleton_id,
-                                            skeleton_data,
-                                            _,
-                                            frame_num,
-                                            _,
-                                            frame_data,
-                                        ) = q_val
-                                        SkeletonRepository.render_skeletons_and_insert_keyframe(
-                                            keyframe_num=current_frame,
-                                            target_skeleton_data=skeleton_data,
-                                            frame_data=frame_data,
-                                        )
-
-                            # no recording
-                            else:
-                                # my_obj = self.rev_assets_blender[self.assets_blender[q_val[0]]]['obj']
-                                if q_val[4] == "rigid_body":
-                                    my_obj = self.rev_assets_blender[q_val[0]]["obj"]
-                                    my_obj.location = q_val[1]
-                                    my_obj.rotation_mode = "QUATERNION"
-                                    my_obj.rotation_quaternion = q_val[2]
-                                elif q_val[4] == "skeleton":
-                                    (
-                                        skeleton_id,
-                                        skeleton_data,
-                                        _,
-                                        _,
-                                        _,
-                                        frame_data,
-                                    ) = q_val
-                                    SkeletonRepository.render_skeletons_and_insert_keyframe(
-                                        target_skeleton_data=skeleton_data,
-                                        frame_data=frame_data,
-                                    )
-
-                        # edit mode
+                        # no recording
                         else:
-                            # no definitive keyframes
-                            if bpy.context.window_manager.record2_status == True:
-                                bpy.context.window_manager.record1_status = False
-                                if bpy.context.scene.frame_end <= q_val[3]:
-                                    bpy.context.scene.frame_end = q_val[3]
-
+                            # my_obj = self.rev_assets_blender[self.assets_blender[q_val[0]]]['obj']
+                            if q_val[4] == "rigid_body":
+                                my_obj = self.rev_assets_blender[q_val[0]]["obj"]
+                                my_obj.location = q_val[1]
+                                my_obj.rotation_mode = "QUATERNION"
+                                my_obj.rotation_quaternion = q_val[2]
+                            elif q_val[4] == "skeleton":
+                                (
+                                    skeleton_id,
+                                    skeleton_data,
+                                    _,
+                                    _,
+                                    _,
+                                    frame_data,
+                                ) = q_val
+                                SkeletonRepository.render_skeletons_and_insert_keyframe(
+                                    target_skeleton_data=skeleton_data,
+                                    frame_data=frame_data,
+                                )
+
+                    # edit mode
+                    else:
+                        # no definitive keyframes
+                        if bpy.context.window_manager.record2_status == True:
+                            bpy.context.window_manager.record1_status = False
+                            if bpy.context.scene.frame_end <= q_val[3]:
+                                bpy.context.scene.frame_end = q_val[3]
+
+                            current_frame = q_val[3]
+
+                            # my_obj = self.rev_assets_blender[self.assets_blender[q_val[0]]]['obj']\
+                            #  # new_id
+                            if q_val[4] == "rigid_body":
+                                my_obj = self.rev_assets_blender[q_val[0]]["obj"]
+                                my_obj.location = q_val[1]
+                                my_obj.rotation_mode = "QUATERNION"
+                                my_obj.rotation_quaternion = q_val[2]
+
+                                ActionRepository.assign_action(my_obj)
+                                my_obj.keyframe_insert(
+                                    data_path="location", frame=current_frame
+                                )
+                                my_obj.keyframe_insert(
+                                    data_path="rotation_quaternion",
+                                    frame=current_frame,
+                                )
+                            elif q_val[4] == "skeleton":
+                                (
+                                    skeleton_id,
+                                    skeleton_data,
+                                    _,
+                                    frame_num,
+                                    _,
+                                    frame_data,
+                                ) = q_val
+                                SkeletonRepository.render_skeletons_and_insert_keyframe(
+                                    keyframe_num=current_frame,
+                                    target_skeleton_data=skeleton_data,
+                                    frame_data=frame_data,
+                                )
+
+                        # selective keyframes
+                        elif bpy.context.window_manager.record1_status == True:
+                            bpy.context.window_manager.record2_status = False
+                            if (
+                                bpy.context.scene.frame_start
+                                <= q_val[3]
+                                <= bpy.context.scene.frame_end
+                            ):
                                 current_frame = q_val[3]
 
-                                # my_obj = self.rev_assets_blender[self.assets_blender[q_val[0]]]['obj']\
-                                #  # new_id
+                                # my_obj = self.rev_assets_blender[self.assets_blender[q_val[0]]]['obj']
                                 if q_val[4] == "rigid_body":
                                     my_obj = self.rev_assets_blender[q_val[0]]["obj"]
                                     my_obj.location = q_val[1]
@@ -373,7 +642,8 @@ class ConnectionSetup:
 
                                     ActionRepository.assign_action(my_obj)
                                     my_obj.keyframe_insert(
-                                        data_path="location", frame=current_frame
+                                        data_path="location",
+                                        frame=current_frame,
                                     )
                                     my_obj.keyframe_insert(
                                         data_path="rotation_quaternion",
@@ -394,85 +664,41 @@ class ConnectionSetup:
                                         frame_data=frame_data,
                                     )
 
-                            # selective keyframes
-                            elif bpy.context.window_manager.record1_status == True:
-                                bpy.context.window_manager.record2_status = False
-                                if (
-                                    bpy.context.scene.frame_start
-                                    <= q_val[3]
-                                    <= bpy.context.scene.frame_end
-                                ):
-                                    current_frame = q_val[3]
-
-                                    # my_obj = self.rev_assets_blender[self.assets_blender[q_val[0]]]['obj']
-                                    if q_val[4] == "rigid_body":
-                                        my_obj = self.rev_assets_blender[q_val[0]][
-                                            "obj"
-                                        ]
-                                        my_obj.location = q_val[1]
-                                        my_obj.rotation_mode = "QUATERNION"
-                                        my_obj.rotation_quaternion = q_val[2]
-
-                                        ActionRepository.assign_action(my_obj)
-                                        my_obj.keyframe_insert(
-                                            data_path="location",
-                                            frame=current_frame,
-                                        )
-                                        my_obj.keyframe_insert(
-                                            data_path="rotation_quaternion",
-                                            frame=current_frame,
-                                        )
-                                    elif q_val[4] == "skeleton":
-                                        (
-                                            skeleton_id,
-                                            skeleton_data,
-                                            _,
-                                            frame_num,
-                                            _,
-                                            frame_data,
-                                        ) = q_val
-                                        SkeletonRepository.render_skeletons_and_insert_keyframe(
-                                            keyframe_num=current_frame,
-                                            target_skeleton_data=skeleton_data,
-                                            frame_data=frame_data,
-                                        )
-
-                            # no recording
-                            else:
-                                if q_val[4] == "rigid_body":
-                                    my_obj = self.rev_assets_blender[q_val[0]]["obj"]
-                                    my_obj.location = q_val[1]
-                                    my_obj.rotation_mode = "QUATERNION"
-                                    my_obj.rotation_quaternion = q_val[2]
-                                elif q_val[4] == "skeleton":
-                                    (
-                                        skeleton_id,
-                                        skeleton_data,
-                                        _,
-                                        _,
-                                        _,
-                                        frame_data,
-                                    ) = q_val
-                                    SkeletonRepository.render_skeletons_and_insert_keyframe(
-                                        target_skeleton_data=skeleton_data,
-                                        frame_data=frame_data,
-                                    )
-                    except KeyError:
-                        # if object id updated in middle of the running .tak
-                        pass
-
-                if current_frame is not None and (
-                    time() - self.current_time >= self.SEC_PER_FRAME
-                ):
-                    bpy.context.scene.frame_set(current_frame)
-                    self.current_time = time()
-        finally:
-            self.l.release()
+                        # no recording
+                        else:
+                            if q_val[4] == "rigid_body":
+                                my_obj = self.rev_assets_blender[q_val[0]]["obj"]
+                                my_obj.location = q_val[1]
+                                my_obj.rotation_mode = "QUATERNION"
+                                my_obj.rotation_quaternion = q_val[2]
+                            elif q_val[4] == "skeleton":
+                                (
+                                    skeleton_id,
+                                    skeleton_data,
+                                    _,
+                                    _,
+                                    _,
+                                    frame_data,
+                                ) = q_val
+                                SkeletonRepository.render_skeletons_and_insert_keyframe(
+                                    target_skeleton_data=skeleton_data,
+                                    frame_data=frame_data,
+                                )
+                except KeyError:
+                    # if object id updated in middle of the running .tak
+                    pass
+
+            if current_frame is not None and (
+                time() - self.current_time >= self.SEC_PER_FRAME
+            ):
+                # subframe keys are shown on their whole frame
+                bpy.context.scene.frame_set(int(current_frame))
+                self.current_time = time()
 
     def stop_receive_rigid_body_frame(self, new_id, position, rotation, frame_number):
         pass
 
-    def stop_receive_data_frame(self, data_dict):
+    def stop_receive_data_frame(self, frame):
         pass
 
     def pause_button_clicked(
@@ -480,10 +706,12 @@ class ConnectionSetup:
     ):  # Stop the data stream, but don't update the stored info
         if self.streaming_client:
             self.streaming_client.data_listener = self.stop_receive_data_frame
+            self.stop_apply_timer()
             context.window_manager.start_status = False
 
     def stop_button_clicked(self, context):  # Stop connection
         if self.streaming_client:
+            self.stop_apply_timer()
             self.streaming_client.shutdown()
             self.streaming_client = None
             context.window_manager.connection_status = False
@@ -509,6 +737,12 @@ class ConnectOperator(Operator):
                 "clientAddress": bpy.context.scene.init_prop.client_address,
                 "serverAddress": bpy.context.scene.init_prop.server_address,
                 "use_multicast": True,
+                "stream_markers": bpy.context.scene.init_prop.stream_markers,
+                "stream_analog": bpy.context.scene.init_prop.stream_analog,
+                "frame_delivery": bpy.context.scene.init_prop.frame_delivery,
+                "jitter_buffer_depth": bpy.context.scene.init_prop.jitter_buffer_depth,
+                "key_timing": bpy.context.scene.init_prop.key_timing,
+                "decode_in_worker": bpy.context.scene.init_prop.decode_in_worker,
             }
 
             # check the ips
@@ -553,8 +787,8 @@ class RefreshAssetsOperator(Operator):
     bl_label = "Refresh Assets"
 
     def execute(self, context):
-        SkeletonRepository.clear()
-
+        # unchanged data descriptions are not parsed again and keep their
+        # object assignments, see NatNetClient.modeldef_hash
         existing_conn = ConnectOperator.connection_setup
         existing_conn.request_data_descriptions(existing_conn.streaming_client, context)
         if context.window_manager.start_status:
@@ -670,6 +904,69 @@ class newActionOperator(Operator):
         return {"FINISHED"}
 
 
+class ExportAnalogOperator(Operator):
+    bl_idname = "wm.export_analog"
+    bl_description = (
+        "Export the buffered force plate and device samples to the active object"
+    )
+    bl_label = "Export Analog Channels"
+
+    target: bpy.props.EnumProperty(
+        name="Export To",
+        items=[
+            ("FCURVES", "F-Curves", "Key every sample on custom property F-curves"),
+            (
+                "CUSTOM_PROPERTIES",
+                "Custom Properties",
+                "Store every channel as a float array custom property",
+            ),
+        ],
+    )
+
+    def execute(self, context):
+        existing_connection = ConnectOperator.connection_setup
+        object = context.active_object
+        if object is None:
+            self.report({"ERROR"}, "Select an object to export onto")
+            return {"CANCELLED"}
+        if (
+            existing_connection is None
+            or existing_connection.force_plate_buffers is None
+        ):
+            self.report({"ERROR"}, "Analog streaming is not enabled")
+            return {"CANCELLED"}
+
+        exports = (
+            ("fp_", existing_connection.force_plate_buffers.get_samples()),
+            ("dev_", existing_connection.device_buffers.get_samples()),
+        )
+        if self.target == "CUSTOM_PROPERTIES":
+            for prefix, device_samples in exports:
+                AnalogExportRepository.export_to_custom_properties(
+                    object, device_samples, prefix
+                )
+        else:
+            # the earliest buffered mocap frame lands on the scene start frame
+            first_frames = [
+                sample_frames[0]
+                for _, device_samples in exports
+                for sample_frames, _ in device_samples.values()
+                if len(sample_frames)
+            ]
+            if not first_frames:
+                self.report({"WARNING"}, "No analog samples received")
+                return {"CANCELLED"}
+            frame_offset = context.scene.frame_start - int(min(first_frames))
+            for prefix, device_samples in exports:
+                AnalogExportRepository.export_to_fcurves(
+                    object, device_samples, prefix, frame_offset
+                )
+        return {"FINISHED"}
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+
 class ResetOperator(Operator):
     bl_idname = "object.reset_operator"
     bl_description = "Reset the connection"
@@ -40,6 +40,12 @@ class InitialSettings(Panel):
         box = layout.box()
         box.prop(initprop, "server_address")
         box.prop(initprop, "client_address")
+        box.prop(initprop, "stream_markers")
+        box.prop(initprop, "stream_analog")
+        box.prop(initprop, "frame_delivery")
+        box.prop(initprop, "jitter_buffer_depth")
+        box.prop(initprop, "key_timing")
+        box.prop(initprop, "decode_in_worker")
         box2 = box.box()
         row = box2.row(align=True)
         row.label(text="Set Transmission Type to")
@@ -119,6 +125,11 @@ class Connection(Panel):
                     text=plugin_operators.PauseOperator.bl_label,
                     icon_value=IconsLoader.get_icon("Pause"),
                 )
+                streaming_client = ConnectOperator.connection_setup.streaming_client
+                dropped = streaming_client.get_dropped_frame_count()
+                if dropped:
+                    row = layout.row(align=True)
+                    row.label(text="Dropped frames: " + str(dropped), icon="ERROR")
             else:
                 row.operator(
                     plugin_operators.StartOperator.bl_idname,
@@ -126,6 +137,14 @@ class Connection(Panel):
                     icon_value=IconsLoader.get_icon("Awaiting"),
                 )
 
+            if ConnectOperator.connection_setup.stream_analog:
+                row = layout.row(align=True)
+                row.operator(
+                    plugin_operators.ExportAnalogOperator.bl_idname,
+                    text=plugin_operators.ExportAnalogOperator.bl_label,
+                    icon="GRAPH",
+                )
+
         else:
             layout.operator(
                 plugin_operators.ConnectOperator.bl_idname,
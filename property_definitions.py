@@ -127,3 +127,64 @@ class CustomSceneProperties(PropertyGroup):
     )
 
     custom_recording: BoolProperty(name="Record Frame Range", default=False)
+
+    stream_markers: BoolProperty(
+        name="Stream Markers",
+        description="Show labeled and unlabeled markers as a point cloud",
+        default=False,
+    )
+
+    stream_analog: BoolProperty(
+        name="Stream Force Plates/Devices",
+        description="Buffer force plate and device channels for export",
+        default=False,
+    )
+
+    frame_delivery: EnumProperty(
+        name="Frame Delivery",
+        description="How frames are handed from the network to the viewport",
+        items=[
+            (
+                "AUTO",
+                "Auto",
+                "Every frame in order while recording, the newest frame otherwise",
+            ),
+            ("LATEST", "Latest", "Only the newest frame, stale frames are skipped"),
+            ("FIFO", "Every Frame", "Every frame in order, up to a bounded backlog"),
+        ],
+        default="AUTO",
+    )
+
+    key_timing: EnumProperty(
+        name="Recorded Keys",
+        description="Where live recordings put their keys on the scene timeline",
+        items=[
+            (
+                "SCENE_RATE",
+                "Scene Frame Rate",
+                "One key per scene frame, interpolated at Motive's timestamps",
+            ),
+            (
+                "SUBFRAMES",
+                "Every Frame",
+                "One key per Motive frame, on the subframe of its timestamp",
+            ),
+        ],
+        default="SCENE_RATE",
+    )
+
+    jitter_buffer_depth: IntProperty(
+        name="Jitter Buffer (ms)",
+        description="Hold live frames this long to put reordered packets back in "
+        "order, late and duplicate frames are dropped at any depth",
+        default=0,
+        min=0,
+        max=500,
+    )
+
+    decode_in_worker: BoolProperty(
+        name="Decode in Separate Process",
+        description="Receive and decode rigid bodies and skeletons in a worker "
+        "process, markers and force plates/devices are not streamed",
+        default=False,
+    )
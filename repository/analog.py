@@ -0,0 +1,54 @@
+import numpy as np
+from bpy.types import Object
+
+from .action import ActionRepository
+
+
+class AnalogExportRepository:
+    @staticmethod
+    def get_channel_name(prefix: str, device_id: int, channel_index: int) -> str:
+        return f"{prefix}{device_id}_ch{channel_index}"
+
+    @classmethod
+    def export_to_custom_properties(
+        cls, object: Object, device_samples: dict, prefix: str
+    ):
+        """device_samples is analog.AnalogBuffers.get_samples() output"""
+        for device_id, (sample_frames, samples) in device_samples.items():
+            object[f"{prefix}{device_id}_frames"] = sample_frames
+            for channel_index in range(samples.shape[1]):
+                name = cls.get_channel_name(prefix, device_id, channel_index)
+                object[name] = np.ascontiguousarray(samples[:, channel_index])
+
+    @classmethod
+    def export_to_fcurves(
+        cls, object: Object, device_samples: dict, prefix: str, frame_offset: float
+    ):
+        """keys every sample on an F-curve of a float custom property.
+
+        A sample of mocap frame f is keyed at scene frame f + frame_offset.
+        """
+        ActionRepository.assign_action(object)
+        fcurves = ActionRepository.get_fcurves(object=object)
+
+        for device_id, (sample_frames, samples) in device_samples.items():
+            keyframe_frames = sample_frames + frame_offset
+            for channel_index in range(samples.shape[1]):
+                name = cls.get_channel_name(prefix, device_id, channel_index)
+                if name not in object:
+                    object[name] = 0.0
+
+                data_path = f'["{name}"]'
+                fcurve = fcurves.find(data_path=data_path)
+                if fcurve is None:
+                    fcurve = fcurves.new(data_path=data_path)
+                fcurve.keyframe_points.clear()
+
+                values = samples[:, channel_index]
+                keep = ~np.isnan(values)
+                coords = np.empty((np.count_nonzero(keep), 2), dtype=np.float32)
+                coords[:, 0] = keyframe_frames[keep]
+                coords[:, 1] = values[keep]
+                fcurve.keyframe_points.add(len(coords))
+                fcurve.keyframe_points.foreach_set("co", coords.ravel())
+                fcurve.update()
@@ -0,0 +1,50 @@
+from typing import Optional
+
+import bpy
+import numpy as np
+from bpy.types import Object
+
+
+class MarkerCloudRepository:
+    object_name: str = "Motive Markers"
+
+    render_object: Optional[Object] = None
+
+    @classmethod
+    def get_render_object(cls) -> Object:
+        try:
+            if cls.render_object is not None and cls.render_object.name:
+                return cls.render_object
+        except ReferenceError:
+            # deleted by the user
+            pass
+
+        object = bpy.data.objects.get(cls.object_name)
+        if object is None:
+            mesh = bpy.data.meshes.new(cls.object_name)
+            object = bpy.data.objects.new(cls.object_name, mesh)
+            bpy.context.scene.collection.objects.link(object)
+        cls.render_object = object
+        return object
+
+    @staticmethod
+    def to_blender_positions(positions: np.ndarray) -> np.ndarray:
+        # Motive's [X, Y, Z] -> Blender [X, -Z, Y]
+        blender_positions = positions[:, (0, 2, 1)]
+        blender_positions[:, 1] *= -1.0
+        return blender_positions
+
+    @classmethod
+    def render_markers(cls, positions: np.ndarray):
+        """positions is an (N, 3) float32 array in Blender coordinates"""
+        mesh = cls.get_render_object().data
+        marker_count = len(positions)
+        if len(mesh.vertices) != marker_count:
+            mesh.clear_geometry()
+            mesh.vertices.add(marker_count)
+        mesh.vertices.foreach_set("co", np.ascontiguousarray(positions).ravel())
+        mesh.update()
+
+    @classmethod
+    def clear(cls):
+        cls.render_object = None
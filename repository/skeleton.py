@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any, Optional
 
 import bpy
@@ -6,6 +6,7 @@ from bpy.types import EditBone, Object
 from mathutils import Matrix, Quaternion, Vector
 
 from .action import ActionRepository
+from .skeleton_cache import SkeletonCacheRepository
 
 
 @dataclass
@@ -86,6 +87,10 @@ class SkeletonData:
     skeleton_name: str
     bones: dict[int, BoneData]
 
+    # bone names in wire order, cached for the bone ids they were built from
+    _wire_bone_ids: Optional[bytes] = field(default=None, repr=False)
+    _wire_bone_names: list[str] = field(default_factory=list, repr=False)
+
     @classmethod
     def create_skeleton(
         cls, skeleton_id: int, skeleton_name: str, bones: dict[int, BoneData]
@@ -194,6 +199,35 @@ class SkeletonData:
             frames[bone_data.bone_name] = frame_data
         return frames
 
+    def get_wire_bone_names(self, bone_ids) -> list[str]:
+        key = bone_ids.tobytes()
+        if key != self._wire_bone_ids:
+            min_key = int(bone_ids.min())  # TODO this is because of bone_id bug
+            self._wire_bone_names = [
+                self.get_bone_by_id(bone_id=bone_id - min_key + 1).bone_name
+                for bone_id in bone_ids.tolist()
+            ]
+            self._wire_bone_ids = key
+        return self._wire_bone_names
+
+    def create_frame_data_from_arrays(
+        self,
+        bone_arrays: Any,
+    ) -> dict[str, FrameData]:
+        if not len(bone_arrays):
+            return {}
+        bone_names = self.get_wire_bone_names(bone_ids=bone_arrays.bone_ids)
+        # Motive sends x, y, z, w
+        rotations = bone_arrays.rotations[:, (3, 0, 1, 2)].tolist()
+        return {
+            bone_name: FrameData(
+                location=Vector(pos), quaternion_rotation=Quaternion(rot)
+            )
+            for bone_name, pos, rot in zip(
+                bone_names, bone_arrays.positions.tolist(), rotations
+            )
+        }
+
     def render_skeleton_and_insert_keyframe(
         self,
         object: Object,
@@ -242,11 +276,49 @@ class SkeletonRepository:
         cls.skeletons[skeleton.skeleton_id] = skeleton
         cls.skeleton_name_to_id[skeleton.skeleton_name] = skeleton.skeleton_id
 
+    @classmethod
+    def update_skeletons(
+        cls, skeletons: list[SkeletonData], skeleton_diff: dict[str, set[int]]
+    ) -> None:
+        """replaces the skeletons, keeping the SkeletonData of unchanged ones.
+
+        skeleton_diff is the "ske_desc" entry of get_desc_dict_diff(). Objects
+        rendering a changed skeleton are moved to its new SkeletonData,
+        objects rendering a removed skeleton are unassigned.
+        """
+        replaced_ids = skeleton_diff["added"] | skeleton_diff["changed"]
+        new_skeletons: dict[int, SkeletonData] = {}
+        for skeleton in skeletons:
+            old_skeleton = cls.skeletons.get(skeleton.skeleton_id)
+            if old_skeleton is None or skeleton.skeleton_id in replaced_ids:
+                new_skeletons[skeleton.skeleton_id] = skeleton
+            else:
+                new_skeletons[skeleton.skeleton_id] = old_skeleton
+
+        cls.skeletons = new_skeletons
+        cls.skeleton_name_to_id = {
+            skeleton.skeleton_name: skeleton_id
+            for skeleton_id, skeleton in new_skeletons.items()
+        }
+        cls.render_object_to_skeleton = {
+            object: (
+                None if skeleton is None else new_skeletons.get(skeleton.skeleton_id)
+            )
+            for object, skeleton in cls.render_object_to_skeleton.items()
+        }
+
     @classmethod
     def set_transform_matrix(cls) -> None:
         for skeleton in cls.skeletons.values():
-            if skeleton.bones[0].transform_matrix is None:
-                skeleton.create_armature(is_create_armature=False)
+            if skeleton.bones[0].transform_matrix is not None:
+                continue
+            # building a throwaway armature is slow, reuse matrices computed
+            # for the same skeleton layout in an earlier session
+            if SkeletonCacheRepository.restore_transform_matrices(skeleton):
+                continue
+            skeleton.create_armature(is_create_armature=False)
+            SkeletonCacheRepository.store_transform_matrices(skeleton)
+        SkeletonCacheRepository.save()
 
     @classmethod
     def create_armatures(
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+from typing import Any, Optional
+
+import bpy
+from mathutils import Matrix
+
+
+class SkeletonCacheRepository:
+    """BoneData.transform_matrix per skeleton name and bone layout, on disk"""
+
+    file_name: str = "skeleton_cache.json"
+    # least recently stored entries are dropped beyond this count
+    max_entries: int = 64
+
+    # "<skeleton name>:<bone layout hash>" -> {bone id: 3x3 matrix rows or None}
+    entries: Optional[dict[str, dict[str, Optional[list]]]] = None
+    is_dirty: bool = False
+
+    @classmethod
+    def get_cache_path(cls) -> str:
+        cache_dir = bpy.utils.user_resource("DATAFILES", path="optitrack", create=True)
+        return os.path.join(cache_dir, cls.file_name)
+
+    @classmethod
+    def get_entries(cls) -> dict[str, dict[str, Optional[list]]]:
+        if cls.entries is None:
+            try:
+                with open(cls.get_cache_path(), "r", encoding="utf-8") as file:
+                    cls.entries = json.load(file)
+            except (OSError, ValueError):
+                cls.entries = {}
+        return cls.entries
+
+    @staticmethod
+    def get_cache_key(skeleton: Any) -> str:
+        layout = [
+            (
+                bone.bone_id,
+                bone.bone_name,
+                None if bone.parent is None else bone.parent.bone_id,
+                [round(value, 6) for value in bone.t_pose_head],
+            )
+            for bone in skeleton.bones.values()
+        ]
+        layout_hash = hashlib.sha1(json.dumps(layout).encode("utf-8")).hexdigest()
+        return f"{skeleton.skeleton_name}:{layout_hash}"
+
+    @classmethod
+    def restore_transform_matrices(cls, skeleton: Any) -> bool:
+        """sets every BoneData.transform_matrix from the cache, False on a miss"""
+        entry = cls.get_entries().get(cls.get_cache_key(skeleton))
+        if entry is None:
+            return False
+        for bone in skeleton.bones.values():
+            rows = entry.get(str(bone.bone_id))
+            bone.transform_matrix = None if rows is None else Matrix(rows)
+        return True
+
+    @classmethod
+    def store_transform_matrices(cls, skeleton: Any):
+        entries = cls.get_entries()
+        key = cls.get_cache_key(skeleton)
+        entries.pop(key, None)
+        entries[key] = {
+            str(bone.bone_id): (
+                None
+                if bone.transform_matrix is None
+                else [list(row) for row in bone.transform_matrix]
+            )
+            for bone in skeleton.bones.values()
+        }
+        while len(entries) > cls.max_entries:
+            del entries[next(iter(entries))]
+        cls.is_dirty = True
+
+    @classmethod
+    def save(cls):
+        if not cls.is_dirty:
+            return
+        path = cls.get_cache_path()
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(cls.entries, file)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print("Could not write skeleton cache: ", e)
+            return
+        cls.is_dirty = False
@@ -0,0 +1,132 @@
+# Resampling of live recordings from Motive's capture rate to the scene frame
+# rate.
+#
+# KeyframeResampler places every frame on the scene timeline by its Motive
+# timestamp, in scene frames since Motive started. At the scene rate it emits
+# one key per whole scene frame, interpolated between the two Motive frames
+# around it: positions linearly, rotations with quaternion slerp. With
+# subframes it emits every Motive frame at its fractional scene frame instead.
+#
+# Frames are lists of the value tuples ConnectionSetup.receive_data_frame
+# builds. Positions may be sequences of floats or mathutils.Vector, rotations
+# have to provide slerp() like mathutils.Quaternion, which interpolates along
+# the shorter arc.
+#
+# This module must not import bpy or mathutils.
+
+import math
+from dataclasses import replace
+
+
+def lerp(start, end, factor):
+    if hasattr(start, "lerp"):
+        return start.lerp(end, factor)
+    return [a + (b - a) * factor for a, b in zip(start, end)]
+
+
+def interpolate_frame_data(start_frame_data, end_frame_data, factor):
+    """interpolates the {bone name: FrameData} of two skeleton frames"""
+    frame_data = {}
+    for bone_name, end in end_frame_data.items():
+        start = start_frame_data.get(bone_name)
+        if start is None:
+            frame_data[bone_name] = end
+            continue
+        frame_data[bone_name] = replace(
+            end,
+            location=lerp(start.location, end.location, factor),
+            quaternion_rotation=start.quaternion_rotation.slerp(
+                end.quaternion_rotation, factor
+            ),
+        )
+    return frame_data
+
+
+def interpolate_values(start_values, end_values, factor):
+    """interpolates the assets two frames have in common, others keep end_values"""
+    # (asset type, asset id) -> value tuple
+    start_by_asset = {(value[4], value[0]): value for value in start_values}
+    values = []
+    for value in end_values:
+        start = start_by_asset.get((value[4], value[0]))
+        if start is None:
+            values.append(value)
+        elif value[4] == "rigid_body":
+            values.append(
+                (
+                    value[0],
+                    lerp(start[1], value[1], factor),
+                    start[2].slerp(value[2], factor),
+                )
+                + value[3:]
+            )
+        elif value[4] == "skeleton":
+            values.append(
+                value[:5] + (interpolate_frame_data(start[5], value[5], factor),)
+            )
+        else:
+            # markers are display only
+            values.append(value)
+    return values
+
+
+class KeyframeResampler:
+    """turns frames at Motive's rate into keys at the scene frame rate"""
+
+    def __init__(self, scene_fps=24.0, subframes=False, max_gap=1.0):
+        self.scene_fps = scene_fps
+        # key every Motive frame on its fractional scene frame instead
+        self.subframes = subframes
+        # seconds without frames that are not interpolated across
+        self.max_gap = max_gap
+        # (scene frame, values) of the last frame added
+        self.previous = None
+        self.next_key_frame = None
+        self.frame_count = 0
+        self.key_count = 0
+
+    def set_scene_fps(self, scene_fps):
+        if scene_fps != self.scene_fps:
+            self.scene_fps = scene_fps
+            self.reset()
+
+    def reset(self):
+        self.previous = None
+        self.next_key_frame = None
+
+    def add(self, timestamp, values):
+        """returns the (scene frame, values) keys due up to this frame.
+
+        The scene frame is None for frames without a Motive timestamp.
+        """
+        self.frame_count += 1
+        if timestamp is None or timestamp < 0:
+            return [(None, values)]
+        frame = timestamp * self.scene_fps
+        previous = self.previous
+        if previous is not None and frame <= previous[0]:
+            # a paused Motive timeline repeating its current frame
+            return []
+        self.previous = (frame, values)
+        if self.subframes:
+            self.key_count += 1
+            return [(frame, values)]
+
+        if previous is None or frame - previous[0] > self.max_gap * self.scene_fps:
+            # nothing to interpolate from, key the next whole frame reached
+            self.next_key_frame = math.ceil(frame)
+            previous = (frame, values)
+        start_frame, start_values = previous
+        keys = []
+        while self.next_key_frame <= frame:
+            key_frame = self.next_key_frame
+            if key_frame == frame:
+                keys.append((key_frame, values))
+            else:
+                factor = (key_frame - start_frame) / (frame - start_frame)
+                keys.append(
+                    (key_frame, interpolate_values(start_values, values, factor))
+                )
+            self.next_key_frame += 1
+        self.key_count += len(keys)
+        return keys
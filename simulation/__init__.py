@@ -0,0 +1,4 @@
+# Offline stand-ins for Motive, see packets.py and benchmark.py.
+#
+# The packet generator only needs the standard library, so it can be used
+# outside of Blender to produce NatNet traffic.
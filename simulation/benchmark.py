@@ -0,0 +1,176 @@
+# NAT_FRAMEOFDATA decode benchmark.
+#
+# Feeds packets from simulation.packets.PacketGenerator through
+# NatNetClient's message handler for every decode path and NatNet version and
+# reports frames/sec, microseconds per frame and the peak memory allocated
+# while decoding a frame. NatNetClient imports bpy, so run it with Blender's
+# Python, e.g.
+#
+#   blender --background --python-expr \
+#       "from optitrack.simulation import benchmark; benchmark.main()"
+#
+# where optitrack is the name the addon is installed under.
+
+import argparse
+import time
+import tracemalloc
+
+from ..frame import FramePool
+from ..Modified_NatNetClient import NatNetClient
+from .packets import PacketGenerator
+
+NATNET_VERSIONS = ((2, 11), (3, 1), (4, 0), (4, 1), (4, 2))
+# legacy: nested __unpack_* path building MoCapData and frame dicts
+# fast: frame_decoder.FrameDecoder into a new Frame per packet
+# pooled: frame_decoder.FrameDecoder into Frames recycled by a FramePool
+DECODE_PATHS = ("legacy", "fast", "pooled")
+
+
+def create_client(generator, decode_path):
+    """returns a NatNetClient configured for decode_path and its message handler"""
+    client = NatNetClient()
+    client.decoder_mode = "legacy" if decode_path == "legacy" else "fast"
+    if decode_path == "pooled":
+        client.set_frame_pool(FramePool())
+    # the same handler the socket threads and capture.PacketReplay use
+    process_message = client.feed_packet
+    # NAT_SERVERINFO sets the bitstream version the frames are decoded with
+    process_message(generator.build_server_info())
+    return client, process_message
+
+
+def check_decoders(generator, frame_count=10):
+    """returns the frame numbers where the fast and legacy paths disagree"""
+    frame_dicts = {}
+    for decode_path in ("legacy", "fast"):
+        client, process_message = create_client(generator, decode_path)
+        received = frame_dicts[decode_path] = []
+        client.data_listener = lambda frame: received.append(frame.to_dict())
+        for packet in generator.build_frames(frame_count):
+            process_message(packet)
+    # the legacy frame dicts carry no suffix data
+    keys = ("frame_number", "rb_data", "ske_data")
+    return [
+        legacy_dict["frame_number"]
+        for legacy_dict, fast_dict in zip(frame_dicts["legacy"], frame_dicts["fast"])
+        if any(legacy_dict[key] != fast_dict[key] for key in keys)
+    ]
+
+
+def measure_peak_bytes(process_message, packets):
+    """returns the mean and max bytes allocated at peak while decoding a packet"""
+    peaks = []
+    tracemalloc.start()
+    try:
+        for packet in packets:
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            process_message(packet)
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    finally:
+        tracemalloc.stop()
+    return sum(peaks) / len(peaks), max(peaks)
+
+
+def run_benchmark(generator, decode_path, frame_count=2400, repeat=5):
+    client, process_message = create_client(generator, decode_path)
+    # two seconds of distinct 120 Hz frames, cycled up to frame_count
+    distinct_packets = generator.build_frames(min(frame_count, 240))
+    packets = [distinct_packets[i % len(distinct_packets)] for i in range(frame_count)]
+
+    # warm up buffers and caches before timing
+    for packet in distinct_packets:
+        process_message(packet)
+
+    best_seconds = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for packet in packets:
+            process_message(packet)
+        seconds = time.perf_counter() - start
+        if best_seconds is None or seconds < best_seconds:
+            best_seconds = seconds
+
+    mean_peak_bytes, max_peak_bytes = measure_peak_bytes(
+        process_message, distinct_packets
+    )
+    return {
+        "version": "%d.%d" % generator.get_version(),
+        "decode_path": decode_path,
+        "packet_bytes": len(distinct_packets[0]),
+        "frames_per_sec": frame_count / best_seconds,
+        "us_per_frame": best_seconds / frame_count * 1e6,
+        "mean_peak_bytes": mean_peak_bytes,
+        "max_peak_bytes": max_peak_bytes,
+    }
+
+
+def format_results(results):
+    lines = [
+        "%-7s %-8s %8s %12s %10s %12s %12s"
+        % (
+            "version",
+            "path",
+            "bytes",
+            "frames/sec",
+            "us/frame",
+            "peak B mean",
+            "peak B max",
+        )
+    ]
+    for result in results:
+        lines.append(
+            "%-7s %-8s %8d %12.0f %10.1f %12.0f %12d"
+            % (
+                result["version"],
+                result["decode_path"],
+                result["packet_bytes"],
+                result["frames_per_sec"],
+                result["us_per_frame"],
+                result["mean_peak_bytes"],
+                result["max_peak_bytes"],
+            )
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="NatNet frame decode benchmark")
+    parser.add_argument(
+        "--versions",
+        nargs="+",
+        default=["%d.%d" % version for version in NATNET_VERSIONS],
+        help="NatNet bitstream versions, e.g. 3.1 4.1",
+    )
+    parser.add_argument("--paths", nargs="+", default=list(DECODE_PATHS))
+    parser.add_argument("--frames", type=int, default=2400)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--rigid-bodies", type=int, default=10)
+    parser.add_argument("--skeletons", type=int, default=1)
+    parser.add_argument("--bones", type=int, default=21)
+    parser.add_argument("--markers", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    results = []
+    for version in args.versions:
+        major, minor = (int(part) for part in version.split("."))
+        generator = PacketGenerator(
+            major=major,
+            minor=minor,
+            rigid_body_count=args.rigid_bodies,
+            skeleton_count=args.skeletons,
+            bone_count=args.bones,
+            marker_count=args.markers,
+        )
+        mismatches = check_decoders(generator)
+        if mismatches:
+            print(
+                "WARNING: NatNet %s fast and legacy decoders disagree on frames %s"
+                % (version, mismatches)
+            )
+        for decode_path in args.paths:
+            results.append(
+                run_benchmark(generator, decode_path, args.frames, args.repeat)
+            )
+    print(format_results(results))
+    return results
@@ -0,0 +1,329 @@
+# Synthetic NatNet packets.
+#
+# PacketGenerator builds byte-exact NAT_SERVERINFO, NAT_MODELDEF and
+# NAT_FRAMEOFDATA packets for NatNet 2.x through 4.2, laid out the way
+# NatNetClient and frame_decoder.FrameDecoder read them. Poses move along
+# smooth curves of the frame number, so consecutive frames differ without
+# needing a random generator per value.
+#
+# This module must only use the standard library.
+
+import math
+import struct
+
+# message ids, mirrored from NatNetClient so that no bpy import is needed
+NAT_SERVERINFO = 1
+NAT_RESPONSE = 3
+NAT_MODELDEF = 5
+NAT_FRAMEOFDATA = 7
+
+# data description types
+DESC_RIGID_BODY = 1
+DESC_SKELETON = 2
+
+MessageHeader = struct.Struct("<hh")
+Int16Value = struct.Struct("<h")
+Int32Value = struct.Struct("<i")
+FloatValue = struct.Struct("<f")
+DoubleValue = struct.Struct("<d")
+Vector3 = struct.Struct("<fff")
+# ID, position (x, y, z), orientation (qx, qy, qz, qw)
+RigidBodyPose = struct.Struct("<i3f4f")
+# ID, position, size
+LabeledMarker = struct.Struct("<i3ff")
+# ID, position, orientation, mean error, params
+AssetRigidBody = struct.Struct("<i3f4ffh")
+# ID, position, size, params, residual
+AssetMarker = struct.Struct("<i3ffhf")
+
+# the client reads packet sizes as signed 16 bit values
+MAX_PACKET_SIZE = 0x7FFF
+
+
+def pack_message(message_id, payload):
+    """prefixes payload with the NatNet message id and packet size"""
+    if len(payload) > MAX_PACKET_SIZE:
+        raise ValueError(
+            "packet payload of %d bytes exceeds %d" % (len(payload), MAX_PACKET_SIZE)
+        )
+    return MessageHeader.pack(message_id, len(payload)) + payload
+
+
+class PacketGenerator:
+    def __init__(
+        self,
+        major=4,
+        minor=1,
+        rigid_body_count=10,
+        skeleton_count=1,
+        bone_count=21,
+        marker_count=0,
+        unlabeled_marker_count=0,
+        asset_count=0,
+        force_plate_count=0,
+        device_count=0,
+        analog_channel_count=4,
+        analog_samples_per_frame=4,
+    ):
+        self.major = major
+        self.minor = minor
+        self.rigid_body_count = rigid_body_count
+        self.skeleton_count = skeleton_count
+        self.bone_count = bone_count
+        self.marker_count = marker_count
+        self.unlabeled_marker_count = unlabeled_marker_count
+        self.asset_count = asset_count
+        self.force_plate_count = force_plate_count
+        self.device_count = device_count
+        self.analog_channel_count = analog_channel_count
+        self.analog_samples_per_frame = analog_samples_per_frame
+
+        major_minor = (major, minor)
+        self.has_data_size = major_minor >= (4, 1)
+        self.has_skeletons = major_minor >= (2, 1)
+        self.has_labeled_markers = major_minor >= (2, 4)
+        self.has_force_plates = major_minor >= (2, 9)
+        self.has_devices = major_minor >= (2, 11)
+        self.has_params = major_minor >= (2, 6)
+
+    def get_version(self):
+        return self.major, self.minor
+
+    def get_skeleton_name(self, skeleton_index):
+        return "Skeleton%d" % (skeleton_index + 1)
+
+    def get_bone_name(self, bone_id):
+        return "Bone%d" % bone_id
+
+    # -- frames -------------------------------------------------------------
+
+    def __count_block(self, count, body):
+        # count, sizeInBytes (4.1+), payload
+        block = Int32Value.pack(count)
+        if self.has_data_size:
+            block += Int32Value.pack(len(body))
+        return block + body
+
+    def __pose(self, asset_id, frame_number):
+        t = frame_number / 120.0 + asset_id
+        half_angle = 0.5 * math.sin(t)
+        return (
+            asset_id,
+            math.sin(t),
+            1.0 + 0.1 * math.cos(t),
+            math.cos(t),
+            0.0,
+            math.sin(half_angle),
+            0.0,
+            math.cos(half_angle),
+        )
+
+    def __rigid_body(self, asset_id, frame_number):
+        record = RigidBodyPose.pack(*self.__pose(asset_id, frame_number))
+        if self.major < 3:
+            # marker positions, then ID's and sizes from 2.0
+            marker_count = 3
+            record += Int32Value.pack(marker_count)
+            record += Vector3.pack(0.1, 0.2, 0.3) * marker_count
+            if self.major >= 2:
+                record += struct.pack("<%di" % marker_count, *range(marker_count))
+                record += struct.pack("<%df" % marker_count, *[0.01] * marker_count)
+        if self.major >= 2:
+            # mean marker error
+            record += FloatValue.pack(0.001)
+        if self.has_params:
+            # tracking valid
+            record += Int16Value.pack(0x01)
+        return record
+
+    def __marker_sets(self):
+        marker = Vector3.pack(1.0, 2.0, 3.0)
+        body = (
+            b"all\0" + Int32Value.pack(self.marker_count) + marker * self.marker_count
+        )
+        return self.__count_block(1, body)
+
+    def __labeled_marker(self, marker_id, frame_number):
+        t = frame_number / 120.0 + marker_id
+        record = LabeledMarker.pack(marker_id, math.sin(t), 1.0, math.cos(t), 0.014)
+        if self.has_params:
+            record += Int16Value.pack(0)
+        if self.major >= 3:
+            # residual
+            record += FloatValue.pack(0.0002)
+        return record
+
+    def __assets(self):
+        body = b""
+        for asset_index in range(self.asset_count):
+            asset_id = 1000 + asset_index
+            body += struct.pack("<ii", asset_id, 1)
+            body += AssetRigidBody.pack(asset_id, 0, 0, 0, 0, 0, 0, 1, 0.001, 1)
+            body += Int32Value.pack(1)
+            body += AssetMarker.pack(1, 0, 0, 0, 0.014, 0, 0.0002)
+        return self.__count_block(self.asset_count, body)
+
+    def __channel_devices(self, device_count, frame_number):
+        sample_count = self.analog_samples_per_frame
+        body = b""
+        for device_index in range(device_count):
+            body += struct.pack("<ii", device_index + 1, self.analog_channel_count)
+            for channel_index in range(self.analog_channel_count):
+                body += Int32Value.pack(sample_count)
+                body += struct.pack(
+                    "<%df" % sample_count,
+                    *[
+                        math.sin((frame_number + k / sample_count) / 10 + channel_index)
+                        for k in range(sample_count)
+                    ],
+                )
+        return self.__count_block(device_count, body)
+
+    def __frame_suffix(self, frame_number, timestamp):
+        # timecode, timecode sub
+        suffix = struct.pack("<ii", 0, 0)
+        if timestamp is None:
+            timestamp = frame_number / 120.0
+        if (self.major, self.minor) >= (2, 7):
+            suffix += DoubleValue.pack(timestamp)
+        else:
+            suffix += FloatValue.pack(timestamp)
+        if self.major >= 3:
+            # camera mid exposure, data received, transmit timestamps
+            suffix += struct.pack("<qqq", frame_number, frame_number, frame_number)
+        if self.major >= 4:
+            # precision timestamp seconds, fractional seconds
+            suffix += struct.pack("<ii", 0, 0)
+        # params: not recording, models unchanged, live mode
+        suffix += Int16Value.pack(0)
+        return suffix
+
+    def build_frame_payload(self, frame_number, timestamp=None):
+        payload = Int32Value.pack(frame_number)
+        payload += self.__marker_sets()
+        unlabeled_marker = Vector3.pack(1.0, 2.0, 3.0)
+        payload += self.__count_block(
+            self.unlabeled_marker_count,
+            unlabeled_marker * self.unlabeled_marker_count,
+        )
+        payload += self.__count_block(
+            self.rigid_body_count,
+            b"".join(
+                self.__rigid_body(rb_id, frame_number)
+                for rb_id in range(1, self.rigid_body_count + 1)
+            ),
+        )
+        if self.has_skeletons:
+            body = b""
+            for skeleton_index in range(self.skeleton_count):
+                skeleton_id = skeleton_index + 1
+                body += struct.pack("<ii", skeleton_id, self.bone_count)
+                for bone_id in range(1, self.bone_count + 1):
+                    # bones are sent as (skeleton ID << 16) | bone ID
+                    body += self.__rigid_body(
+                        (skeleton_id << 16) | bone_id, frame_number
+                    )
+            payload += self.__count_block(self.skeleton_count, body)
+        if self.has_data_size:
+            payload += self.__assets()
+        if self.has_labeled_markers:
+            payload += self.__count_block(
+                self.marker_count,
+                b"".join(
+                    self.__labeled_marker(marker_id, frame_number)
+                    for marker_id in range(1, self.marker_count + 1)
+                ),
+            )
+        if self.has_force_plates:
+            payload += self.__channel_devices(self.force_plate_count, frame_number)
+        if self.has_devices:
+            payload += self.__channel_devices(self.device_count, frame_number)
+        payload += self.__frame_suffix(frame_number, timestamp)
+        return payload
+
+    def build_frame(self, frame_number, timestamp=None):
+        """returns a complete NAT_FRAMEOFDATA packet.
+
+        timestamp defaults to frame_number at 120 Hz. Before NatNet 2.7 it is
+        sent as a float and loses precision.
+        """
+        return pack_message(
+            NAT_FRAMEOFDATA, self.build_frame_payload(frame_number, timestamp)
+        )
+
+    def build_frames(self, frame_count, first_frame_number=0):
+        return [
+            self.build_frame(frame_number)
+            for frame_number in range(
+                first_frame_number, first_frame_number + frame_count
+            )
+        ]
+
+    # -- descriptions -------------------------------------------------------
+
+    def __rigid_body_description(self, name, rb_id, parent_id, pos):
+        description = name.encode("utf-8") + b"\0"
+        description += struct.pack("<ii", rb_id, parent_id)
+        description += Vector3.pack(*pos)
+        if (self.major, self.minor) >= (4, 2):
+            # rotation offset
+            description += struct.pack("<4f", 0, 0, 0, 1)
+        if self.major >= 3:
+            # no markers
+            description += Int32Value.pack(0)
+        return description
+
+    def __skeleton_description(self, skeleton_index):
+        skeleton_name = self.get_skeleton_name(skeleton_index)
+        description = skeleton_name.encode("utf-8") + b"\0"
+        description += struct.pack("<ii", skeleton_index + 1, self.bone_count)
+        for bone_id in range(1, self.bone_count + 1):
+            # bones form a chain, offsets are relative to the parent bone
+            pos = (0.0, 0.9, 0.0) if bone_id == 1 else (0.0, 0.1, 0.0)
+            description += self.__rigid_body_description(
+                "%s_%s" % (skeleton_name, self.get_bone_name(bone_id)),
+                bone_id,
+                bone_id - 1,
+                pos,
+            )
+        return description
+
+    def __data_description(self, data_type, description):
+        header = Int32Value.pack(data_type)
+        if self.has_data_size:
+            header += Int32Value.pack(len(description))
+        return header + description
+
+    def build_modeldef(self):
+        """returns a NAT_MODELDEF packet describing the generated assets"""
+        descriptions = [
+            self.__data_description(
+                DESC_RIGID_BODY,
+                self.__rigid_body_description(
+                    "RigidBody%d" % rb_id, rb_id, -1, (0.0, 0.0, 0.0)
+                ),
+            )
+            for rb_id in range(1, self.rigid_body_count + 1)
+        ]
+        if self.has_skeletons:
+            descriptions += [
+                self.__data_description(
+                    DESC_SKELETON, self.__skeleton_description(skeleton_index)
+                )
+                for skeleton_index in range(self.skeleton_count)
+            ]
+        payload = Int32Value.pack(len(descriptions)) + b"".join(descriptions)
+        return pack_message(NAT_MODELDEF, payload)
+
+    def build_response(self, response):
+        """returns a NAT_RESPONSE packet, an int return code or a string"""
+        if isinstance(response, str):
+            return pack_message(NAT_RESPONSE, response.encode("utf-8") + b"\0")
+        return pack_message(NAT_RESPONSE, Int32Value.pack(response))
+
+    def build_server_info(self, application_name="Motive", server_version=(3, 1, 0, 0)):
+        """returns a NAT_SERVERINFO packet announcing the generator's version"""
+        payload = application_name.encode("utf-8")[:255].ljust(256, b"\0")
+        payload += bytes(server_version)
+        payload += bytes((self.major, self.minor, 0, 0))
+        return pack_message(NAT_SERVERINFO, payload)
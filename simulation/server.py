@@ -0,0 +1,296 @@
+# Local stand-in for Motive's NatNet server.
+#
+# MotiveServer answers the command port requests NatNetClient sends
+# (NAT_CONNECT, NAT_REQUEST_MODELDEF, NAT_REQUEST commands such as SetProperty
+# and Bitstream, keep alives) and streams PacketGenerator frames on the data
+# port at a fixed rate. Frames carry the server's time.perf_counter() as
+# their timestamp, so a StreamStats listener in the same machine can measure
+# socket-to-listener latency next to throughput and dropped frames.
+#
+# Only the standard library is used, the server also runs outside Blender:
+#
+#   python simulation/server.py --rate 240 --rigid-bodies 20 --skeletons 4
+#
+# On Linux, multicast only reaches sockets bound to the group or to INADDR_ANY.
+# Pass --data-address 127.0.0.1 to send frames straight to a client data
+# socket bound to 127.0.0.1 instead.
+
+import argparse
+import socket
+import struct
+import threading
+import time
+
+try:
+    from .packets import PacketGenerator
+except ImportError:
+    # started as a script, outside of the addon package
+    from packets import PacketGenerator
+
+NAT_CONNECT = 0
+NAT_REQUEST = 2
+NAT_REQUEST_MODELDEF = 4
+NAT_REQUEST_FRAMEOFDATA = 6
+NAT_KEEPALIVE = 10
+
+MessageHeader = struct.Struct("<hh")
+
+
+class MotiveServer:
+    def __init__(
+        self,
+        generator=None,
+        local_address="127.0.0.1",
+        command_port=1510,
+        data_port=1511,
+        multicast_address="239.255.42.99",
+        use_multicast=True,
+        frame_rate=120.0,
+        data_address=None,
+    ):
+        self.generator = PacketGenerator() if generator is None else generator
+        self.local_address = local_address
+        self.command_port = command_port
+        self.data_port = data_port
+        self.multicast_address = multicast_address
+        self.use_multicast = use_multicast
+        self.frame_rate = frame_rate
+        # multicast frames go to the group unless an explicit address is given
+        self.data_address = data_address
+
+        self.command_socket = None
+        self.data_socket = None
+        self.command_thread = None
+        self.data_thread = None
+        self.stop_threads = False
+
+        # unicast clients receive frames on the socket they connected from
+        self.client_addresses = []
+        self.frame_number = 0
+        self.sent_frame_count = 0
+        self.late_frame_count = 0
+        self.received_commands = []
+
+    def __create_command_socket(self):
+        result = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        result.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        result.bind((self.local_address, self.command_port))
+        # wake up regularly to check stop_threads
+        result.settimeout(0.5)
+        return result
+
+    def __create_data_socket(self):
+        result = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        if self.use_multicast:
+            result.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+            # deliver to clients on this machine as well
+            result.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+            result.setsockopt(
+                socket.IPPROTO_IP,
+                socket.IP_MULTICAST_IF,
+                socket.inet_aton(self.local_address),
+            )
+        return result
+
+    def get_data_targets(self):
+        if self.use_multicast:
+            address = self.data_address or self.multicast_address
+            return [(address, self.data_port)]
+        return list(self.client_addresses)
+
+    def handle_command(self, command_str):
+        """returns the NAT_RESPONSE payload for a NAT_REQUEST command string"""
+        self.received_commands.append(command_str)
+        if command_str == "Bitstream":
+            return "Bitstream,%d.%d.0.0" % self.generator.get_version()
+        # SetProperty, TimelinePlay, ... are accepted and ignored
+        return 0
+
+    def __handle_request(self, data, address):
+        message_id, packet_size = MessageHeader.unpack_from(data)
+        generator = self.generator
+        if message_id == NAT_CONNECT:
+            if address not in self.client_addresses:
+                self.client_addresses.append(address)
+            return generator.build_server_info()
+        elif message_id == NAT_REQUEST_MODELDEF:
+            return generator.build_modeldef()
+        elif message_id == NAT_REQUEST_FRAMEOFDATA:
+            return generator.build_frame(self.frame_number, time.perf_counter())
+        elif message_id == NAT_REQUEST:
+            command_str = bytes(data[4:]).partition(b"\0")[0].decode("utf-8")
+            return generator.build_response(self.handle_command(command_str))
+        elif message_id == NAT_KEEPALIVE:
+            return None
+        print("MotiveServer: unrecognized request %d" % message_id)
+        return None
+
+    def __command_thread_function(self):
+        while not self.stop_threads:
+            try:
+                data, address = self.command_socket.recvfrom(64 * 1024)
+            except socket.timeout:
+                continue
+            except OSError:
+                # socket closed by shutdown()
+                break
+            if len(data) < MessageHeader.size:
+                continue
+            response = self.__handle_request(data, address)
+            if response is not None:
+                self.command_socket.sendto(response, address)
+
+    def __data_thread_function(self):
+        frame_interval = 1.0 / self.frame_rate
+        next_send_time = time.perf_counter()
+        while not self.stop_threads:
+            delay = next_send_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -frame_interval:
+                # fell behind by more than a frame, do not burst to catch up
+                self.late_frame_count += 1
+                next_send_time = time.perf_counter()
+            next_send_time += frame_interval
+
+            packet = self.generator.build_frame(self.frame_number, time.perf_counter())
+            for target in self.get_data_targets():
+                if self.use_multicast:
+                    self.data_socket.sendto(packet, target)
+                else:
+                    self.command_socket.sendto(packet, target)
+            self.frame_number += 1
+            self.sent_frame_count += 1
+
+    def run(self):
+        self.stop_threads = False
+        self.command_socket = self.__create_command_socket()
+        self.data_socket = self.__create_data_socket()
+
+        self.command_thread = threading.Thread(
+            target=self.__command_thread_function, daemon=True
+        )
+        self.command_thread.start()
+        self.data_thread = threading.Thread(
+            target=self.__data_thread_function, daemon=True
+        )
+        self.data_thread.start()
+        return True
+
+    def shutdown(self):
+        self.stop_threads = True
+        for thread in (self.data_thread, self.command_thread):
+            if thread is not None:
+                thread.join()
+        for sock in (self.command_socket, self.data_socket):
+            if sock is not None:
+                sock.close()
+        self.command_socket = None
+        self.data_socket = None
+
+
+class StreamStats:
+    """data_listener that counts frames, dropped frames and latency"""
+
+    def __init__(self):
+        self.frame_count = 0
+        self.dropped_frame_count = 0
+        self.out_of_order_count = 0
+        self.last_frame_number = None
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.start_time = None
+
+    def __call__(self, frame):
+        now = time.perf_counter()
+        if self.start_time is None:
+            self.start_time = now
+        self.frame_count += 1
+
+        last_frame_number = self.last_frame_number
+        if last_frame_number is not None:
+            gap = frame.frame_number - last_frame_number
+            if gap > 1:
+                self.dropped_frame_count += gap - 1
+            elif gap < 1:
+                self.out_of_order_count += 1
+        self.last_frame_number = frame.frame_number
+
+        # MotiveServer stamps frames with its perf_counter()
+        latency = now - frame.timestamp
+        self.latency_sum += latency
+        if latency > self.latency_max:
+            self.latency_max = latency
+
+    def get_summary(self):
+        elapsed = 0.0
+        if self.start_time is not None:
+            elapsed = time.perf_counter() - self.start_time
+        expected = self.frame_count + self.dropped_frame_count
+        return {
+            "frames": self.frame_count,
+            "frames_per_sec": self.frame_count / elapsed if elapsed > 0 else 0.0,
+            "dropped": self.dropped_frame_count,
+            "drop_rate": self.dropped_frame_count / expected if expected else 0.0,
+            "out_of_order": self.out_of_order_count,
+            "latency_mean_ms": (
+                1e3 * self.latency_sum / self.frame_count if self.frame_count else 0.0
+            ),
+            "latency_max_ms": 1e3 * self.latency_max,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local Motive NatNet stand-in")
+    parser.add_argument("--local-address", default="127.0.0.1")
+    parser.add_argument("--command-port", type=int, default=1510)
+    parser.add_argument("--data-port", type=int, default=1511)
+    parser.add_argument("--multicast-address", default="239.255.42.99")
+    parser.add_argument("--unicast", action="store_true")
+    parser.add_argument("--data-address", default=None)
+    parser.add_argument("--rate", type=float, default=120.0)
+    parser.add_argument("--version", default="4.1")
+    parser.add_argument("--rigid-bodies", type=int, default=10)
+    parser.add_argument("--skeletons", type=int, default=1)
+    parser.add_argument("--bones", type=int, default=21)
+    parser.add_argument("--markers", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    major, minor = (int(part) for part in args.version.split("."))
+    server = MotiveServer(
+        generator=PacketGenerator(
+            major=major,
+            minor=minor,
+            rigid_body_count=args.rigid_bodies,
+            skeleton_count=args.skeletons,
+            bone_count=args.bones,
+            marker_count=args.markers,
+        ),
+        local_address=args.local_address,
+        command_port=args.command_port,
+        data_port=args.data_port,
+        multicast_address=args.multicast_address,
+        use_multicast=not args.unicast,
+        frame_rate=args.rate,
+        data_address=args.data_address,
+    )
+    server.run()
+    print(
+        "Serving NatNet %s on %s:%d at %.0f Hz, Ctrl+C to stop"
+        % (args.version, args.local_address, args.command_port, args.rate)
+    )
+    try:
+        while True:
+            time.sleep(1.0)
+            print(
+                "sent %d frames, %d late"
+                % (server.sent_frame_count, server.late_frame_count)
+            )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()